@@ -0,0 +1,125 @@
+from array import array
+
+# Filter stage names used in a filter specification, e.g.
+#   [('MEDIAN', 5), ('BOXCAR', 4), ('IIR', 3)]
+FILTER_BOXCAR = 'BOXCAR'    # Average and decimate by N
+FILTER_MEDIAN = 'MEDIAN'    # Running median over an odd window of N samples
+FILTER_IIR    = 'IIR'       # First-order low-pass, y += (x - y) / 2**N
+
+filter_types = [
+    FILTER_BOXCAR,
+    FILTER_MEDIAN,
+    FILTER_IIR
+]
+
+IIR_FRAC_BITS = 8           # Fractional bits kept in the IIR state
+
+# Every stage works on integer counts with storage allocated up front. update(x)
+# feeds one sample and returns True when a new output is available in .value.
+
+
+class Boxcar_Filter:
+    def __init__(self, n):
+        self.n     = n
+        self.value = 0
+        self._sum  = 0
+        self._count = 0
+
+    def update(self, x):
+        self._sum += x
+        self._count += 1
+        if self._count < self.n:
+            return False
+        self.value = self._sum // self.n
+        self._sum = 0
+        self._count = 0
+        return True
+
+
+class Median_Filter:
+    def __init__(self, n):
+        if n % 2 == 0:
+            n += 1                          # Keep the window odd so the median is a sample
+        self.n       = n
+        self.value   = 0
+        self._window = array('l', [0] * n)    # Samples in arrival order (circular)
+        self._sorted = array('l', [0] * n)    # Same samples kept in ascending order
+        self._pos    = 0
+        self._count  = 0
+
+    def update(self, x):
+        s = self._sorted
+        count = self._count
+
+        if count == self.n:
+            # Remove the oldest sample from the sorted view
+            old = self._window[self._pos]
+            i = 0
+            while s[i] != old:
+                i += 1
+            while i < count - 1:
+                s[i] = s[i + 1]
+                i += 1
+            count -= 1
+
+        # Insertion into the sorted view
+        i = count
+        while i > 0 and s[i - 1] > x:
+            s[i] = s[i - 1]
+            i -= 1
+        s[i] = x
+        count += 1
+
+        self._window[self._pos] = x
+        self._pos += 1
+        if self._pos == self.n:
+            self._pos = 0
+        self._count = count
+
+        self.value = s[count >> 1]
+        return True
+
+
+class IIR_Filter:
+    def __init__(self, shift):
+        self.shift  = shift
+        self.value  = 0
+        self._state = -1            # Scaled by 2**IIR_FRAC_BITS, -1 until the first sample
+
+    def update(self, x):
+        x <<= IIR_FRAC_BITS
+        if self._state < 0:
+            self._state = x         # Start from the first sample instead of ramping up from 0
+        else:
+            self._state += (x - self._state) >> self.shift
+        self.value = self._state >> IIR_FRAC_BITS
+        return True
+
+
+class Filter_Chain:
+    def __init__(self, spec):
+        """
+        Build a chain of filter stages.
+        Arguments:
+        - spec: list of (filter_type, parameter) tuples applied in order. An empty
+          list passes samples straight through.
+        """
+        self.stages = []
+        for kind, param in spec:
+            if kind == FILTER_BOXCAR:
+                self.stages.append(Boxcar_Filter(param))
+            elif kind == FILTER_MEDIAN:
+                self.stages.append(Median_Filter(param))
+            elif kind == FILTER_IIR:
+                self.stages.append(IIR_Filter(param))
+            else:
+                print('Wrong filter type inputted %s' % (kind))
+        self.value = 0
+
+    def update(self, x):
+        for stage in self.stages:
+            if not stage.update(x):
+                return False        # A decimating stage is still accumulating
+            x = stage.value
+        self.value = x
+        return True
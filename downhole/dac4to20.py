@@ -1,6 +1,10 @@
 import machine
 import time
 
+from dacTransport import TRANSPORT_BITBANG, TRANSPORT_HARDWARE, TRANSPORT_PIO
+from dacTransport import BitBang_Transport, HardwareI2C_Transport, PIO_Transport
+from dacTransport import GP8302_PIO_PROGRAM, PIO_CYCLES_PER_BIT, rp2
+
 # Default I2C address and register for the GP8302 DAC
 GP8302_DEF_I2C_ADDR       = 0x58
 GP8302_CONFIG_CURRENT_REG = 0x02           # Register to write current output value
@@ -14,22 +18,44 @@ GP8302_STORE_TIMING_CMD1  = 0x03
 GP8302_STORE_TIMING_CMD2  = 0x00
 GP8302_STORE_TIMING_DELAY = 0.01           # Delay after issuing store command
 
-# Bit-banged I2C timing constants (in seconds)
-I2C_CYCLE_TOTAL           = 0.000005
-I2C_CYCLE_BEFORE          = 0.000002
-I2C_CYCLE_AFTER           = 0.000003
+# Transport backend used by default (see dacTransport.dac_transports)
+DEFAULT_TRANSPORT         = TRANSPORT_BITBANG
 
 class DAC_4to20:
-    def __init__(self, scl_pin, sda_pin, freq, id):
-        # Initialize standard hardware I2C for device detection
-        self.i2c = machine.I2C(id,
-                  sda=machine.Pin(sda_pin),
-                  scl=machine.Pin(scl_pin),
-                  freq=freq)
-
-        # Also configure pins manually for bit-banging I2C
-        self._scl = machine.Pin(scl_pin, machine.Pin.OUT, value=1)
-        self._sda = machine.Pin(sda_pin, machine.Pin.OUT, value=1)
+    def __init__(self, scl_pin, sda_pin, freq, id, transport=DEFAULT_TRANSPORT, deadband=None):
+        """
+        Arguments:
+        - scl_pin, sda_pin: GPIO pins wired to the GP8302
+        - freq: bus frequency in Hz (hardware and PIO transports)
+        - id: I2C bus ID for the hardware transport, state machine ID for PIO
+        - transport: one of dac_transports, or an object with write()/probe()
+        - deadband: None to write every frame; otherwise skip the bus write when the
+          12-bit code is within this many codes of the last written one (0 = dedup)
+        """
+        if transport == TRANSPORT_BITBANG:
+            # Configure pins manually for bit-banging I2C
+            scl = machine.Pin(scl_pin, machine.Pin.OUT, value=1)
+            sda = machine.Pin(sda_pin, machine.Pin.OUT, value=1)
+            self._bus = BitBang_Transport(scl, sda)
+        elif transport == TRANSPORT_HARDWARE:
+            self._bus = HardwareI2C_Transport(machine.I2C(id,
+                                                          sda=machine.Pin(sda_pin),
+                                                          scl=machine.Pin(scl_pin),
+                                                          freq=freq))
+        elif transport == TRANSPORT_PIO:
+            if GP8302_PIO_PROGRAM is None:
+                raise OSError('PIO transport needs the rp2 port')
+            sda = machine.Pin(sda_pin)
+            sm = rp2.StateMachine(id, GP8302_PIO_PROGRAM,
+                                  freq=freq * PIO_CYCLES_PER_BIT,
+                                  sideset_base=machine.Pin(scl_pin),
+                                  out_base=sda,
+                                  set_base=sda)
+            sm.active(1)
+            self._bus = PIO_Transport(sm)
+        else:
+            # Already-built transport, e.g. one of the host-side mocks in dacMocks
+            self._bus = transport
 
         self._addr = GP8302_DEF_I2C_ADDR
 
@@ -40,51 +66,21 @@ class DAC_4to20:
         self._calibration = False   # Flag to determine if custom calibration is enabled
         self._digital = 0           # Current digital DAC value being output
 
-    # Delay to match I2C timing spec
-    def _i2c_delay(self):
-        time.sleep(I2C_CYCLE_TOTAL)
-
-    # Send I2C start condition
-    def _start_signal(self):
-        self._sda.value(1)
-        self._scl.value(1)
-        time.sleep(I2C_CYCLE_BEFORE)
-        self._sda.value(0)
-        time.sleep(I2C_CYCLE_AFTER)
-        self._scl.value(0)
-
-    # Send I2C stop condition
-    def _stop_signal(self):
-        self._sda.value(0)
-        self._scl.value(1)
-        time.sleep(I2C_CYCLE_BEFORE)
-        self._sda.value(1)
-        time.sleep(I2C_CYCLE_AFTER)
-
-    # Send a byte over I2C manually (bit-banged)
-    def _send_byte(self, data, delay=True):
-        for i in range(8):
-            self._sda.value((data >> (7 - i)) & 0x01)
-            self._scl.value(1)
-            if delay:
-                time.sleep(I2C_CYCLE_TOTAL)
-            self._scl.value(0)
-        
-        # Read ACK bit from slave
-        self._sda.init(machine.Pin.IN)
-        self._scl.value(1)
-        ack = self._sda.value()
-        self._scl.value(0)
-        self._sda.init(machine.Pin.OUT)
-        return ack
+        # Preallocated current frame: register, low nibble, upper 8 bits
+        self._frame = bytearray(3)
+        self._frame[0] = GP8302_CONFIG_CURRENT_REG
+
+        # Skip-unchanged state
+        self._deadband = deadband
+        self._written = -1          # Last code actually sent on the bus (-1 = none yet)
+        self.skipped_writes = 0     # Frames suppressed by the deadband
+
+        self.prof = None            # profiler.Section_Stats timing output_mA(), if profiling
 
     # Check if device is reachable over I2C
     def begin(self):
-        self._start_signal()
-        if self._send_byte(self._addr << 1):  # Write address
-            self._stop_signal()
+        if self._bus.probe(self._addr):  # Write address
             return 2  # Device not found
-        self._stop_signal()
         return 0  # Success
 
     # Apply custom 4–20mA calibration values
@@ -97,17 +93,24 @@ class DAC_4to20:
 
     # Output raw DAC value and return actual current in mA
     def output_mA(self, dac):
+        if self.prof is not None:
+            t0 = time.ticks_us()
+
         self._digital = dac & GP8302_CURRENT_RESOLUTION
 
-        self._start_signal()
-        self._send_byte(self._addr << 1)  # Device address
-        self._send_byte(GP8302_CONFIG_CURRENT_REG)  # Register to configure current
-        
-        # Send lower and upper parts of the 12-bit value in two bytes
-        self._send_byte((self._digital << 4) & 0xF0)  # Lower nibble is shifted
-        self._send_byte((self._digital >> 4) & 0xFF)  # Upper bits
+        # Skip the bus transaction if the code is within the deadband of the last write
+        if self._deadband is not None and self._written >= 0 \
+                and abs(self._digital - self._written) <= self._deadband:
+            self.skipped_writes += 1
+        else:
+            # Send lower and upper parts of the 12-bit value in two bytes
+            self._frame[1] = (self._digital << 4) & 0xF0  # Lower nibble is shifted
+            self._frame[2] = (self._digital >> 4) & 0xFF  # Upper bits
+            self._bus.write(self._addr, self._frame)
+            self._written = self._digital
 
-        self._stop_signal()
+        if self.prof is not None:
+            self.prof.add(time.ticks_diff(time.ticks_us(), t0))
 
         # Return corresponding current output in mA
         return (self._digital / GP8302_CURRENT_RESOLUTION) * GP8302_MAX_CURRENT
@@ -129,21 +132,11 @@ class DAC_4to20:
 
     # Store current DAC setting into EEPROM
     def store(self):
-        # Store command sequence required by GP8302
-        self._start_signal()
-        self._send_byte(GP8302_STORE_TIMING_HEAD)
-        self._stop_signal()
-
-        self._start_signal()
-        self._send_byte(GP8302_STORE_TIMING_ADDR)
-        self._send_byte(GP8302_STORE_TIMING_CMD1)
-        self._stop_signal()
-
-        self._start_signal()
-        self._send_byte(self._addr << 1)
-        for _ in range(8):
-            self._send_byte(GP8302_STORE_TIMING_CMD2)
-        self._stop_signal()
+        # Store command sequence required by GP8302. The head and address bytes are
+        # sent as 7-bit addresses so every transport produces the same frames.
+        self._bus.write(GP8302_STORE_TIMING_HEAD >> 1, b'')
+        self._bus.write(GP8302_STORE_TIMING_ADDR >> 1, bytes((GP8302_STORE_TIMING_CMD1,)))
+        self._bus.write(self._addr, bytes(8 * (GP8302_STORE_TIMING_CMD2,)))
 
         # Wait for write cycle to complete
         time.sleep(GP8302_STORE_TIMING_DELAY)
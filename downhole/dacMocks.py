@@ -0,0 +1,114 @@
+# Host-side stand-ins for the three GP8302 transports in dacTransport.
+#
+# Each mock records the frames it sees as bytes objects (address byte first, then
+# payload) in its .frames list, so the same DAC operation can be compared
+# byte-for-byte across the bit-bang, hardware I2C and PIO backends without a probe.
+#
+# Not meant to be copied to the Pico.
+
+from dacTransport import BitBang_Transport, HardwareI2C_Transport, PIO_Transport
+from dacTransport import TRANSPORT_BITBANG, TRANSPORT_HARDWARE, TRANSPORT_PIO
+
+
+class Mock_Bitbang_Bus:
+    """Decodes the SCL/SDA pin activity of BitBang_Transport back into frames."""
+
+    def __init__(self):
+        self.frames = []
+        self.scl = Mock_Pin(self)
+        self.sda = Mock_Pin(self)
+        self._bits = []
+
+    def _pin_changed(self, pin, old):
+        scl, sda = self.scl, self.sda
+        if pin is scl and old == 0 and scl.level == 1:
+            # Rising clock edge: sample the data line (a released SDA reads as ACK)
+            self._bits.append(sda.level if sda.mode == Mock_Pin.OUT else 0)
+        elif pin is sda and scl.level == 1 and sda.mode == Mock_Pin.OUT:
+            if old == 1 and sda.level == 0:
+                self._bits = []  # START
+            elif old == 0 and sda.level == 1:
+                self._end_frame()  # STOP
+
+    def _end_frame(self):
+        bits = self._bits
+        frame = bytearray()
+        for i in range(len(bits) // 9):
+            byte = 0
+            for bit in bits[9 * i:9 * i + 8]:  # 9th bit of each group is the ACK
+                byte = (byte << 1) | bit
+            frame.append(byte)
+        self.frames.append(bytes(frame))
+        self._bits = []
+
+
+class Mock_Pin:
+    IN  = 0
+    OUT = 1
+
+    def __init__(self, bus):
+        self._bus = bus
+        self.level = 1
+        self.mode = Mock_Pin.OUT
+
+    def init(self, mode):
+        self.mode = mode
+
+    def value(self, v=None):
+        if v is None:
+            # Device always ACKs while the master has released the line
+            return 0 if self.mode == Mock_Pin.IN else self.level
+        old = self.level
+        self.level = 1 if v else 0
+        if old != self.level:
+            self._bus._pin_changed(self, old)
+
+
+class Mock_I2C:
+    """Records machine.I2C.writeto() calls."""
+
+    def __init__(self):
+        self.frames = []
+
+    def writeto(self, addr, buf):
+        self.frames.append(bytes((addr << 1,)) + bytes(buf))
+        return len(buf) + 1
+
+
+class Mock_StateMachine:
+    """Replays the TX FIFO words the GP8302 PIO program would consume."""
+
+    def __init__(self):
+        self.frames = []
+        self._remaining = 0
+        self._frame = bytearray()
+
+    def put(self, value, shift=0):
+        word = (value << shift) & 0xFFFFFFFF
+        if self._remaining == 0:
+            self._remaining = word + 1  # Byte count word
+            self._frame = bytearray()
+            return
+        self._frame.append(word >> 24)
+        self._remaining -= 1
+        if self._remaining == 0:
+            self.frames.append(bytes(self._frame))
+
+
+def mock_transport(kind):
+    """
+    Build a transport of the given kind wired to a recording mock.
+
+    Returns:
+    - (transport, recorder) where recorder.frames collects the frames sent
+    """
+    if kind == TRANSPORT_BITBANG:
+        bus = Mock_Bitbang_Bus()
+        return BitBang_Transport(bus.scl, bus.sda, delay=False), bus
+    elif kind == TRANSPORT_HARDWARE:
+        i2c = Mock_I2C()
+        return HardwareI2C_Transport(i2c), i2c
+    elif kind == TRANSPORT_PIO:
+        sm = Mock_StateMachine()
+        return PIO_Transport(sm), sm
+    raise ValueError('Unknown transport %s' % kind)
@@ -0,0 +1,156 @@
+import time
+
+# rp2 only exists on the RP2040/RP2350 port; the PIO backend is unavailable elsewhere
+try:
+    import rp2
+except ImportError:
+    rp2 = None
+
+# Bit-banged I2C timing constants (in seconds)
+I2C_CYCLE_TOTAL           = 0.000005
+I2C_CYCLE_BEFORE          = 0.000002
+I2C_CYCLE_AFTER           = 0.000003
+
+# PIO clock cycles spent on each SCL period (see _gp8302_pio below)
+PIO_CYCLES_PER_BIT        = 5
+
+# Names used to select a transport backend in DAC_4to20
+TRANSPORT_BITBANG         = 'BITBANG'
+TRANSPORT_HARDWARE        = 'HARDWARE'
+TRANSPORT_PIO             = 'PIO'
+
+dac_transports = [
+    TRANSPORT_BITBANG,     # Python bit-banged pins (original behaviour)
+    TRANSPORT_HARDWARE,    # machine.I2C peripheral
+    TRANSPORT_PIO          # RP2 PIO state machine
+]
+
+# Every transport exposes the same two methods:
+#   write(addr, payload) - START, address byte (write), payload bytes, STOP.
+#                          Returns 0 if the address was acknowledged.
+#   probe(addr)          - Address-only write used by DAC_4to20.begin().
+#                          Returns 0 if the device answered.
+
+
+class BitBang_Transport:
+    def __init__(self, scl, sda, delay=True):
+        # scl/sda are already-configured output Pin objects
+        self._scl = scl
+        self._sda = sda
+        self._delay = delay
+
+    # Send I2C start condition
+    def _start_signal(self):
+        self._sda.value(1)
+        self._scl.value(1)
+        time.sleep(I2C_CYCLE_BEFORE)
+        self._sda.value(0)
+        time.sleep(I2C_CYCLE_AFTER)
+        self._scl.value(0)
+
+    # Send I2C stop condition
+    def _stop_signal(self):
+        self._sda.value(0)
+        self._scl.value(1)
+        time.sleep(I2C_CYCLE_BEFORE)
+        self._sda.value(1)
+        time.sleep(I2C_CYCLE_AFTER)
+
+    # Send a byte over I2C manually (bit-banged)
+    def _send_byte(self, data):
+        for i in range(8):
+            self._sda.value((data >> (7 - i)) & 0x01)
+            self._scl.value(1)
+            if self._delay:
+                time.sleep(I2C_CYCLE_TOTAL)
+            self._scl.value(0)
+
+        # Read ACK bit from slave
+        self._sda.init(self._sda.IN)
+        self._scl.value(1)
+        ack = self._sda.value()
+        self._scl.value(0)
+        self._sda.init(self._sda.OUT)
+        return ack
+
+    def write(self, addr, payload):
+        self._start_signal()
+        ack = self._send_byte(addr << 1)
+        for b in payload:
+            self._send_byte(b)
+        self._stop_signal()
+        return ack
+
+    def probe(self, addr):
+        self._start_signal()
+        ack = self._send_byte(addr << 1)
+        self._stop_signal()
+        return ack
+
+
+class HardwareI2C_Transport:
+    def __init__(self, i2c):
+        # i2c is a machine.I2C (or anything with the same writeto() signature)
+        self._i2c = i2c
+
+    def write(self, addr, payload):
+        try:
+            self._i2c.writeto(addr, payload)
+        except OSError:
+            return 1  # Address not acknowledged
+        return 0
+
+    def probe(self, addr):
+        return self.write(addr, b'')
+
+
+# Write-only I2C master for the GP8302. SDA is driven push-pull, exactly like the
+# bit-banged path, and only released during each ACK clock. Each frame is pushed
+# to the TX FIFO as a byte count (minus one) followed by one word per byte with
+# the byte in bits 31..24.
+if rp2 is not None:
+    @rp2.asm_pio(sideset_init=rp2.PIO.OUT_HIGH,
+                 set_init=rp2.PIO.OUT_HIGH,
+                 out_init=rp2.PIO.OUT_HIGH,
+                 out_shiftdir=rp2.PIO.SHIFT_LEFT)
+    def _gp8302_pio():
+        wrap_target()
+        pull(block)             .side(1)        # Byte count - 1, bus idle
+        mov(x, osr)             .side(1)
+        set(pins, 0)            .side(1) [1]    # START: SDA falls while SCL high
+        label("byte")
+        pull(block)             .side(0)
+        set(y, 7)               .side(0)
+        label("bit")
+        out(pins, 1)            .side(0) [1]    # Data changes while SCL low
+        nop()                   .side(1) [1]    # Clock the bit
+        jmp(y_dec, "bit")       .side(0)
+        set(pindirs, 0)         .side(0) [1]    # Release SDA for the ACK
+        nop()                   .side(1) [1]    # ACK clock (not checked)
+        set(pindirs, 1)         .side(0)
+        jmp(x_dec, "byte")      .side(0)
+        set(pins, 0)            .side(0) [1]    # STOP: SDA rises while SCL high
+        nop()                   .side(1) [1]
+        set(pins, 1)            .side(1) [1]
+        wrap()
+
+    GP8302_PIO_PROGRAM = _gp8302_pio
+else:
+    GP8302_PIO_PROGRAM = None
+
+
+class PIO_Transport:
+    def __init__(self, sm):
+        # sm is an active rp2.StateMachine running GP8302_PIO_PROGRAM
+        self._sm = sm
+
+    def write(self, addr, payload):
+        sm = self._sm
+        sm.put(len(payload))            # Byte count - 1 (address byte included)
+        sm.put(addr << 1, 24)
+        for b in payload:
+            sm.put(b, 24)
+        return 0  # The PIO program does not sample the ACK bit
+
+    def probe(self, addr):
+        return self.write(addr, b'')
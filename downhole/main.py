@@ -1,7 +1,12 @@
 from rgb import RGB_Sensor           # Import RGB sensor class
 from dac4to20 import DAC_4to20     # Import DAC class for 4–20 mA output
+from ringBuffer import Ring_Buffer   # Sample buffer between acquisition and output
+from sampler import Sampler          # Timer-driven fixed-rate acquisition
+from colourFilter import Filter_Chain  # Integer filtering between acquisition and DAC
+from profiler import Profiler        # Optional loop/DAC timing and heap statistics
 
 import time
+import _thread
 
 # === CONSTANTS ===
 
@@ -13,10 +18,42 @@ RGB_SENSOR_SCL_PIN = 17              # SCL pin for RGB sensor
 DAC_SDA_PIN        = 18              # SDA pin for DAC
 DAC_SCL_PIN        = 19              # SCL pin for DAC
 
+# DAC write path
+DAC_TRANSPORT      = 'BITBANG'       # 'BITBANG', 'HARDWARE' or 'PIO' (see dacTransport)
+DAC_DEADBAND       = None            # None = write every frame, 0 = skip unchanged codes
+
+# Filter stages applied to GREEN before the DAC, in order (see colourFilter).
+# A BOXCAR stage decimates, so the DAC is updated once every N samples.
+# Example: [('MEDIAN', 5), ('BOXCAR', 4), ('IIR', 3)]; [] disables filtering.
+FILTER_SPEC        = []
+
+# Sensor auto-ranging (see rgb.SENSOR_RANGES). When enabled, integration time and
+# gain follow the signal and readings are normalised so the DAC output stays continuous.
+AUTO_RANGE         = False
+
 # Timing constants
 INIT_WAIT_SECS         = 2           # Delay before main logic starts (to allow peripherals to power up)
 MEASUREMENT_LATENCY_MS = 10          # Delay between measurements (in milliseconds)
 
+# Sampled mode (timer-driven acquisition). Note the VEML3328 only refreshes its
+# registers once per integration time (50 ms at the default configuration).
+SAMPLE_RATE_HZ         = 100         # Acquisition rate set by machine.Timer
+RING_SIZE              = 64          # Samples buffered between acquisition and output
+PRINT_INTERVAL_MS      = 1000        # Console print interval (0 disables printing)
+
+# Run modes
+RUN_LOOP               = 'LOOP'      # Original sleep-paced loop
+RUN_SAMPLED            = 'SAMPLED'   # Timer-driven acquisition into a ring buffer
+RUN_PIPELINED          = 'PIPELINED' # Core 0 reads the sensor, core 1 drives the DAC
+RUN_BENCHMARK          = 'BENCHMARK' # Compare LOOP and PIPELINED loop rates, then stop
+RUN_MODE               = RUN_LOOP
+
+BENCHMARK_SECS         = 5           # Duration of each benchmark run
+
+# Instrumentation. When enabled, send 's' over the USB serial console to print
+# timing histograms and heap statistics.
+PROFILE                = False
+
 # Color channel identifiers
 RED   = 1
 GREEN = 2
@@ -31,8 +68,31 @@ class Chalk_Detector:
         - 4-20 mA DAC output via I2C
         - LED for illumination or indication via PWM
         """
-        self.rgbSensor = RGB_Sensor(RGB_SENSOR_SCL_PIN, RGB_SENSOR_SDA_PIN, PERIPHERAL_FREQ, 0)
-        self.dac       = DAC_4to20(DAC_SCL_PIN, DAC_SDA_PIN, PERIPHERAL_FREQ, 1)
+        self.rgbSensor = RGB_Sensor(RGB_SENSOR_SCL_PIN, RGB_SENSOR_SDA_PIN, PERIPHERAL_FREQ, 0,
+                                    autorange=AUTO_RANGE)
+        self.ranges_reported = 0
+        self.dac       = DAC_4to20(DAC_SCL_PIN, DAC_SDA_PIN, PERIPHERAL_FREQ, 1,
+                                   transport=DAC_TRANSPORT, deadband=DAC_DEADBAND)
+        self.filter    = Filter_Chain(FILTER_SPEC)
+
+        self.profiler  = Profiler(PROFILE)
+        self.prof_loop = self.profiler.section('main_loop')
+        self.dac.prof  = self.profiler.section('dac_output_mA')
+
+    def output_green(self, g):
+        """
+        Feed one raw GREEN reading through the filter chain and update the DAC
+        whenever the chain produces an output.
+        """
+        if self.filter.update(g):
+            self.dac.output(self.rgbSensor.read_colour_mA(GREEN, self.filter.value))
+
+    def report_range_change(self):
+        """Print a line for each sensor range change since the last call."""
+        sensor = self.rgbSensor
+        while self.ranges_reported < sensor.range_changes:
+            self.ranges_reported += 1
+            print('Sensor range change %d, now range %d' % (self.ranges_reported, sensor.range))
 
     def main(self):
         """
@@ -43,18 +103,151 @@ class Chalk_Detector:
         """
         self.dac.begin()       # Initialize communication with DAC
 
+        prof = self.prof_loop
         while True:
-            # Read BLUE intensity in mA from RGB sensor and output via DAC
-            r = self.rgbSensor.read_colour_raw(RED)
-            g = self.rgbSensor.read_colour_raw(GREEN)
-            b = self.rgbSensor.read_colour_raw(BLUE)
-            print(f'R: {r}\tG: {g}\tB: {b}\n')
-            self.dac.output(self.rgbSensor.read_colour_mA(GREEN))
+            if prof is not None:
+                t0 = time.ticks_us()
+
+            # Take one R/G/B snapshot, then output the GREEN reading from it via DAC
+            rgb = self.rgbSensor.read_all()
+            print(f'R: {rgb[RED]}\tG: {rgb[GREEN]}\tB: {rgb[BLUE]}\n')
+            self.output_green(rgb[GREEN])
+            self.report_range_change()
+
+            if prof is not None:
+                prof.add(time.ticks_diff(time.ticks_us(), t0))
+                self.profiler.sample_heap()
+                self.profiler.poll_command()
+
             time.sleep_ms(MEASUREMENT_LATENCY_MS)  # Small delay to limit sampling rate
 
+    def run_sampled(self):
+        """
+        Fixed-rate variant of main():
+        - A machine.Timer takes an R/G/B snapshot every 1/SAMPLE_RATE_HZ seconds
+          into a preallocated ring buffer
+        - This loop drains the buffer, sending GREEN to the DAC
+        - Printing is limited to once per PRINT_INTERVAL_MS, together with
+          the sampler's late/overrun counters
+        """
+        self.dac.begin()       # Initialize communication with DAC
+
+        ring = self.ring = Ring_Buffer(RING_SIZE)
+        self.sampler = Sampler(self.rgbSensor, ring, SAMPLE_RATE_HZ)
+        self.sampler.start()
+        last_print = time.ticks_ms()
+
+        while True:
+            if ring.available() == 0:
+                if self.profiler.enabled:
+                    self.profiler.sample_heap()
+                    self.profiler.poll_command()
+                time.sleep_ms(1)
+                continue
+
+            i = ring.read_index()
+            self.output_green(ring.g[i])
+
+            if PRINT_INTERVAL_MS:
+                now = time.ticks_ms()
+                if time.ticks_diff(now, last_print) >= PRINT_INTERVAL_MS:
+                    last_print = now
+                    print('R: %d\tG: %d\tB: %d' % (ring.r[i], ring.g[i], ring.b[i]))
+                    self.sampler.print_stats()
+                    self.report_range_change()
+
+            ring.advance()
+
+
+    def run_pipelined(self, duration_ms=0):
+        """
+        Dual-core variant of main():
+        - Core 0 (this thread) owns the RGB sensor and pushes R/G/B snapshots
+          into a lock-free single-producer/single-consumer ring buffer as fast
+          as the bus allows, waiting only when core 1 falls a full buffer behind
+        - Core 1 drains the buffer, drives the DAC and prints diagnostics
+        Runs forever, or for duration_ms milliseconds when given (used by benchmark()).
+        """
+        self.dac.begin()       # Initialize communication with DAC
+
+        ring = self.ring = Ring_Buffer(RING_SIZE)
+        self.cycles = 0
+        self._running = True
+        self._worker_done = False
+        _thread.start_new_thread(self._output_worker, ())
+
+        start = time.ticks_ms()
+        while self._running:
+            if ring.full():
+                continue       # Core 1 is behind; wait for a free slot rather than drop
+            rgb = self.rgbSensor.read_all()
+            ring.put(rgb[RED], rgb[GREEN], rgb[BLUE], time.ticks_us())
+            if duration_ms and time.ticks_diff(time.ticks_ms(), start) >= duration_ms:
+                self._running = False
+
+        while not self._worker_done:
+            time.sleep_ms(1)   # Let core 1 finish before returning
+
+    def _output_worker(self):
+        """Core 1 side of run_pipelined(): DAC output and rate-limited printing."""
+        ring = self.ring
+        last_print = time.ticks_ms()
+
+        while self._running:
+            if ring.available() == 0:
+                continue
+
+            i = ring.read_index()
+            self.output_green(ring.g[i])
+            self.cycles += 1
+
+            if PRINT_INTERVAL_MS:
+                now = time.ticks_ms()
+                if time.ticks_diff(now, last_print) >= PRINT_INTERVAL_MS:
+                    last_print = now
+                    print('R: %d\tG: %d\tB: %d\t(%d samples)' % (ring.r[i], ring.g[i], ring.b[i], self.cycles))
+                    self.report_range_change()
+
+            ring.advance()
+
+        self._worker_done = True
+
+    def benchmark(self, seconds=BENCHMARK_SECS):
+        """
+        Measure loop rates with pacing and printing removed:
+        - single-core: read_all() followed by DAC output, back to back
+        - pipelined: the same work split across both cores
+        Prints and returns (single_core_hz, pipelined_hz).
+        """
+        self.dac.begin()
+        duration_ms = seconds * 1000
+
+        n = 0
+        start = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(), start) < duration_ms:
+            rgb = self.rgbSensor.read_all()
+            self.output_green(rgb[GREEN])
+            n += 1
+        single_hz = n / seconds
+
+        start = time.ticks_ms()
+        self.run_pipelined(duration_ms)
+        pipelined_hz = self.cycles * 1000 / time.ticks_diff(time.ticks_ms(), start)
+
+        print('Single-core loop: %.1f Hz' % single_hz)
+        print('Pipelined loop:   %.1f Hz (x%.2f)' % (pipelined_hz, pipelined_hz / single_hz))
+        return single_hz, pipelined_hz
+
 
 if __name__ == "__main__":
     # Wait for devices to settle before starting main logic
     time.sleep(INIT_WAIT_SECS)
     chalkDetector = Chalk_Detector()
-    chalkDetector.main()
+    if RUN_MODE == RUN_SAMPLED:
+        chalkDetector.run_sampled()
+    elif RUN_MODE == RUN_PIPELINED:
+        chalkDetector.run_pipelined()
+    elif RUN_MODE == RUN_BENCHMARK:
+        chalkDetector.benchmark()
+    else:
+        chalkDetector.main()
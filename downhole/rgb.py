@@ -1,5 +1,6 @@
 import machine
 import time
+from array import array
 
 # === CONSTANTS ===
 
@@ -18,6 +19,39 @@ REG_CONTROL          = 0x00                          # Control register
 CONFIG_VALUE         = b'\x00\x00'                   # Default configuration (power on / normal mode)
 VEML3328_MAX_READING = 65536                         # Max value for 16-bit register (used for normalization)
 
+# Control register fields
+CONF_IT_SHIFT        = 4                             # Integration time: 0=50, 1=100, 2=200, 3=400 ms
+CONF_GAIN_SHIFT      = 10                            # Analog gain: 0=x1, 1=x2, 2=x4, 3=x1/2
+CONF_DG_SHIFT        = 12                            # Digital gain: 0=x1, 1=x2, 2=x4
+
+# Auto-ranging settings from least to most sensitive, as (IT, GAIN, DG, integration ms).
+# Each step doubles the sensitivity. Gain is raised before integration time, so the
+# sensor stays at the shortest integration time (fastest refresh) that keeps the
+# signal well clear of the noise floor.
+SENSOR_RANGES = (
+    (0, 3, 0,  50),                                  # x1/2, 50 ms
+    (0, 0, 0,  50),                                  # x1,   50 ms (CONFIG_VALUE)
+    (0, 1, 0,  50),                                  # x2,   50 ms
+    (0, 2, 0,  50),                                  # x4,   50 ms
+    (1, 2, 0, 100),                                  # x4,  100 ms
+    (2, 2, 0, 200),                                  # x4,  200 ms
+    (3, 2, 0, 400),                                  # x4,  400 ms
+    (3, 2, 1, 400),                                  # x4,  400 ms, digital x2
+    (3, 2, 2, 400),                                  # x4,  400 ms, digital x4
+)
+DEFAULT_RANGE        = 1                             # Range matching CONFIG_VALUE
+
+# With auto-ranging on, readings are reported in counts of DEFAULT_RANGE with
+# NORM_FRAC_BITS fractional bits, so the output stays continuous across range changes.
+# Full scale (65535 << 5) leaves room for the IIR filter's fractional bits in a small int.
+NORM_FRAC_BITS       = 4
+
+AUTORANGE_HIGH       = 0xC000                        # Raw reading that forces a less sensitive range
+AUTORANGE_LOW        = 0x1000                        # Raw reading below which a more sensitive range is tried
+AUTORANGE_TARGET     = 0x4000                        # Raw reading aimed for after a range change
+AUTORANGE_HOLD       = 4                             # Consecutive low readings before sensitivity is raised
+RANGE_LOG_SIZE       = 16                            # Range changes kept for print_range_log()
+
 # Color codes for function input
 RED   = 1
 GREEN = 2
@@ -26,15 +60,23 @@ BLUE  = 3
 # Custom scaling for green channel (empirical or expected max reading)
 GREEN_MAX_READING = 150
 
+# Byte offsets of each colour word inside the burst-read buffer
+R_OFFSET = 0
+G_OFFSET = 2
+B_OFFSET = 4
+
 
 class RGB_Sensor:
-    def __init__(self, scl_pin, sda_pin, freq, id):
+    def __init__(self, scl_pin, sda_pin, freq, id, autorange=False, autorange_channel=GREEN):
         """
         Initialize the RGB sensor over I2C.
         Arguments:
         - scl_pin, sda_pin: GPIO pins for I2C
         - freq: I2C communication frequency
         - id: I2C bus ID (0 or 1 depending on board)
+        - autorange: adjust integration time and gain from recent readings and
+          report normalised values (see set_autorange())
+        - autorange_channel: colour whose raw reading drives the range decisions
         """
         self.i2c = machine.I2C(id,
                                sda=machine.Pin(sda_pin),
@@ -45,6 +87,88 @@ class RGB_Sensor:
         self.i2c.writeto_mem(VEML3328_ADDR, REG_CONTROL, CONFIG_VALUE)
         time.sleep(0.1)  # Short delay to allow sensor to stabilize
 
+        # Preallocated buffers for read_all() so the hot loop never touches the heap.
+        # The VEML3328 uses one command code per register (no auto-increment), so the
+        # three words are read back-to-back into fixed slices of a single buffer.
+        self._buf  = bytearray(6)
+        mv         = memoryview(self._buf)
+        self._r_mv = mv[R_OFFSET:R_OFFSET + 2]
+        self._g_mv = mv[G_OFFSET:G_OFFSET + 2]
+        self._b_mv = mv[B_OFFSET:B_OFFSET + 2]
+
+        # Latest R/G/B snapshot, indexed by colour code (index 0 is unused)
+        self.rgb = array('I', [0, 0, 0, 0])
+
+        # Auto-ranging state
+        self.range             = DEFAULT_RANGE
+        self.range_changes     = 0
+        self.autorange_channel = autorange_channel
+        self._conf             = bytearray(2)
+        self._low_count        = 0
+        self._settle_ms        = 0          # ticks_ms() after which readings reflect the current range
+        self._norm_bits        = 0          # Fractional bits of the reported values
+        self._range_log_ms     = array('I', [0] * RANGE_LOG_SIZE)
+        self._range_log_range  = bytearray(RANGE_LOG_SIZE)
+        self.set_autorange(autorange)
+
+    def set_autorange(self, enabled):
+        """
+        Turn auto-ranging on or off. While on, read_all() and read_colour_mA()
+        work in normalised counts: counts of DEFAULT_RANGE << NORM_FRAC_BITS.
+        Turning it off returns the sensor to the fixed default configuration.
+        """
+        self.autorange  = enabled
+        self._norm_bits = NORM_FRAC_BITS if enabled else 0
+        self._low_count = 0
+        if self.range != DEFAULT_RANGE:
+            self.set_range(DEFAULT_RANGE)
+
+    def set_range(self, index):
+        """Write the integration time and gain of SENSOR_RANGES[index] to the control register."""
+        it, gain, dg, it_ms = SENSOR_RANGES[index]
+        conf = (it << CONF_IT_SHIFT) | (gain << CONF_GAIN_SHIFT) | (dg << CONF_DG_SHIFT)
+        self._conf[0] = conf & 0xFF
+        self._conf[1] = conf >> 8
+        self.i2c.writeto_mem(VEML3328_ADDR, REG_CONTROL, self._conf)
+
+        # The data registers hold the old range's result until a full new integration completes
+        self._settle_ms = time.ticks_add(time.ticks_ms(), 2 * it_ms)
+        self._low_count = 0
+
+        slot = self.range_changes % RANGE_LOG_SIZE
+        self._range_log_ms[slot] = time.ticks_ms()
+        self._range_log_range[slot] = index
+        self.range_changes += 1
+        self.range = index
+
+    def _update_range(self, raw):
+        # Pick the next range from the raw reading of autorange_channel. Called by read_all().
+        if raw >= AUTORANGE_HIGH:
+            if self.range > 0:
+                steps = 1
+                while (raw >> steps) >= AUTORANGE_TARGET and self.range - steps > 0:
+                    steps += 1
+                self.set_range(self.range - steps)
+        elif raw < AUTORANGE_LOW:
+            self._low_count += 1
+            if self._low_count >= AUTORANGE_HOLD and self.range < len(SENSOR_RANGES) - 1:
+                steps = 1
+                while ((raw << (steps + 1)) < AUTORANGE_TARGET
+                       and self.range + steps < len(SENSOR_RANGES) - 1):
+                    steps += 1
+                self.set_range(self.range + steps)
+        else:
+            self._low_count = 0
+
+    def print_range_log(self):
+        """Print the most recent range changes with their time stamps (ticks_ms)."""
+        first = max(0, self.range_changes - RANGE_LOG_SIZE)
+        for n in range(first, self.range_changes):
+            slot = n % RANGE_LOG_SIZE
+            index = self._range_log_range[slot]
+            print('Range change %d at %d ms: range %d (%d ms integration, x%d sensitivity of range 0)' %
+                  (n + 1, self._range_log_ms[slot], index, SENSOR_RANGES[index][3], 1 << index))
+
     def reg_readword_from(self, colour_reg):
         """
         Read 2 bytes (16 bits) from a given color register and return as an integer.
@@ -72,19 +196,66 @@ class RGB_Sensor:
 
         return self.reg_readword_from(colour_addr)
 
-    def read_colour_mA(self, colour):
+    def read_all(self):
+        """
+        Read the red, green and blue registers into the preallocated buffer
+        and return a consistent snapshot without allocating.
+
+        With auto-ranging on, the values are normalised (see set_autorange()), the
+        range is adjusted from this reading, and for one new integration time after
+        a range change the previous snapshot is returned unchanged.
+
+        Returns:
+        - array('I') indexed by RED, GREEN or BLUE. The same array is reused and
+          overwritten on every call, so copy values out if they must be kept.
+        """
+        if self.autorange and time.ticks_diff(self._settle_ms, time.ticks_ms()) > 0:
+            return self.rgb
+
+        self.i2c.readfrom_mem_into(VEML3328_ADDR, VEML3328_R_ADDR, self._r_mv)
+        self.i2c.readfrom_mem_into(VEML3328_ADDR, VEML3328_G_ADDR, self._g_mv)
+        self.i2c.readfrom_mem_into(VEML3328_ADDR, VEML3328_B_ADDR, self._b_mv)
+
+        buf = self._buf
+        rgb = self.rgb
+        rgb[RED]   = buf[R_OFFSET] | (buf[R_OFFSET + 1] << 8)  # Little-endian conversion
+        rgb[GREEN] = buf[G_OFFSET] | (buf[G_OFFSET + 1] << 8)
+        rgb[BLUE]  = buf[B_OFFSET] | (buf[B_OFFSET + 1] << 8)
+
+        if self.autorange:
+            raw = rgb[self.autorange_channel]
+            rgb[RED]   = self.normalise(rgb[RED])
+            rgb[GREEN] = self.normalise(rgb[GREEN])
+            rgb[BLUE]  = self.normalise(rgb[BLUE])
+            self._update_range(raw)
+        return rgb
+
+    def normalise(self, raw):
+        """Scale a raw reading taken at the current range to normalised counts."""
+        shift = NORM_FRAC_BITS + DEFAULT_RANGE - self.range
+        if shift >= 0:
+            return raw << shift
+        return raw >> -shift
+
+    def read_colour_mA(self, colour, raw_reading=None):
         """
         Convert raw sensor reading to a 4–20 mA current value.
         Arguments:
         - colour: use RED, GREEN, or BLUE constants
+        - raw_reading: an existing reading (e.g. from read_all()) to convert.
+          If omitted, a fresh reading is taken from the sensor. With auto-ranging
+          on, readings are normalised counts.
 
         Returns:
         - float current in mA proportional to the light intensity
         """
-        raw_reading = self.read_colour_raw(colour)
+        if raw_reading is None:
+            raw_reading = self.read_colour_raw(colour)
+            if self.autorange:
+                raw_reading = self.normalise(raw_reading)
 
-        # Blue channel uses a different expected maximum for scaling
+        # Green channel uses a different expected maximum for scaling
         if colour == GREEN:
-            return raw_reading / GREEN_MAX_READING * CURRENT_RANGE_mA + CURRENT_MIN_mA
+            return raw_reading / (GREEN_MAX_READING << self._norm_bits) * CURRENT_RANGE_mA + CURRENT_MIN_mA
         else:
-            return raw_reading / VEML3328_MAX_READING * CURRENT_RANGE_mA + CURRENT_MIN_mA
+            return raw_reading / (VEML3328_MAX_READING << self._norm_bits) * CURRENT_RANGE_mA + CURRENT_MIN_mA
@@ -0,0 +1,68 @@
+from array import array
+
+# Slots of the shared index array
+_HEAD = 0   # Next slot to write (producer)
+_TAIL = 1   # Next slot to read (consumer)
+
+
+class Ring_Buffer:
+    """
+    Fixed-size single-producer / single-consumer buffer of R/G/B samples.
+
+    All storage is allocated up front in typed arrays, so put() and the consumer
+    side never touch the heap. Only the producer moves the head index and only
+    the consumer moves the tail index, so no lock is needed between a timer
+    callback (or the second core) and the consumer loop. Both indices live in
+    one array so each side only ever writes its own word of memory.
+    """
+
+    def __init__(self, size):
+        self.size  = size
+        self.r     = array('I', bytes(4 * size))   # 32-bit so normalised (auto-ranged) readings fit
+        self.g     = array('I', bytes(4 * size))
+        self.b     = array('I', bytes(4 * size))
+        self.t_us  = array('I', bytes(4 * size))   # time.ticks_us() of each sample
+        self._idx  = array('I', [0, 0])             # Head and tail indices
+
+        self.produced  = 0                          # Samples stored
+        self.overruns  = 0                          # Samples dropped because the buffer was full
+
+    def put(self, r, g, b, t_us):
+        """Store one sample. Returns False (and counts an overrun) if the buffer is full."""
+        idx = self._idx
+        head = idx[_HEAD]
+        nxt = head + 1
+        if nxt == self.size:
+            nxt = 0
+        if nxt == idx[_TAIL]:
+            self.overruns += 1
+            return False
+        self.r[head] = r
+        self.g[head] = g
+        self.b[head] = b
+        self.t_us[head] = t_us
+        idx[_HEAD] = nxt           # Publish only after the slot is fully written
+        self.produced += 1
+        return True
+
+    def available(self):
+        """Number of samples waiting to be consumed."""
+        n = self._idx[_HEAD] - self._idx[_TAIL]
+        if n < 0:
+            n += self.size
+        return n
+
+    def read_index(self):
+        """Index of the oldest unread sample (only valid when available() > 0)."""
+        return self._idx[_TAIL]
+
+    def full(self):
+        """True if the next put() would overrun."""
+        return self.available() == self.size - 1
+
+    def advance(self):
+        """Release the oldest sample back to the producer."""
+        nxt = self._idx[_TAIL] + 1
+        if nxt == self.size:
+            nxt = 0
+        self._idx[_TAIL] = nxt
@@ -0,0 +1,51 @@
+import machine
+import time
+
+from rgb import RED, GREEN, BLUE
+
+
+class Sampler:
+    """
+    Fixed-rate acquisition driven by a periodic machine.Timer.
+
+    Each tick takes one R/G/B snapshot from the sensor and stores it with its
+    timestamp in a Ring_Buffer, which the output stage drains at its own pace.
+    Nothing in the tick allocates, so the sample period does not depend on how
+    long the consumer spends writing the DAC or printing.
+    """
+
+    def __init__(self, rgb_sensor, ring, rate_hz):
+        self.rgb_sensor = rgb_sensor
+        self.ring       = ring
+        self.rate_hz    = rate_hz
+        self.period_us  = 1000000 // rate_hz
+        self.timer      = machine.Timer()
+
+        self.ticks          = 0       # Timer ticks handled
+        self.late_ticks     = 0       # Ticks that arrived more than half a period late
+        self.missed_periods = 0       # Whole periods skipped between two ticks
+        self._last_us       = 0
+
+    def start(self):
+        self._last_us = time.ticks_us()
+        self.timer.init(mode=machine.Timer.PERIODIC, freq=self.rate_hz, callback=self._tick)
+
+    def stop(self):
+        self.timer.deinit()
+
+    def _tick(self, t):
+        now = time.ticks_us()
+        if self.ticks:
+            gap = time.ticks_diff(now, self._last_us)
+            if gap > self.period_us + (self.period_us >> 1):
+                self.late_ticks += 1
+                self.missed_periods += gap // self.period_us - 1
+        self._last_us = now
+        self.ticks += 1
+
+        rgb = self.rgb_sensor.read_all()
+        self.ring.put(rgb[RED], rgb[GREEN], rgb[BLUE], now)
+
+    def print_stats(self):
+        print('Sampler: %d ticks, %d late, %d missed periods, %d overruns' %
+              (self.ticks, self.late_ticks, self.missed_periods, self.ring.overruns))
@@ -0,0 +1,199 @@
+"""
+Headless batch rendering of depth logs.
+
+Renders the Counts-vs-Depth chart of every log (same styling as the viewer)
+to PNG or SVG and writes a summary and a zone table (ChromeZones) per log,
+plus one summary.csv for the whole batch. Logs are processed in parallel on
+all cores.
+
+    python ChromeBatch.py campaign/ -o charts/
+    python ChromeBatch.py "field/**/*.csv" -o charts/ --format svg --jobs 8
+    python ChromeBatch.py campaign/ --threshold 28000 --hysteresis 800 --min-thickness 0.1
+
+Arguments may be log files, directories (every .csv and .bin inside) or glob
+patterns. The segments of a segmented run are processed as one log. Parsed
+logs go through the same cache as the viewer unless --no-cache is given.
+"""
+import argparse
+import concurrent.futures
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from ChromeLog import load_depth_counts, run_path
+from ChromePlot import FIGURE_SIZE, draw_counts, finish_layout, style_axes
+from ChromeZones import (DEFAULT_HYSTERESIS, DEFAULT_MIN_THICKNESS_M, DEFAULT_THRESHOLD, ZoneDetector,
+                         export_zones)
+from DepthPyramid import DepthPyramid
+from LogCache import LogCache
+
+LOG_EXTENSIONS = ('.csv', '.bin')
+DEFAULT_DPI = 150
+SUMMARY_FILE = 'summary.csv'
+SUMMARY_FIELDS = ['log', 'records', 'depth_min_m', 'depth_max_m', 'counts_min', 'counts_mean',
+                  'counts_max', 'below_threshold_fraction', 'zones', 'zone_thickness_m', 'chart', 'seconds']
+
+
+def find_logs(patterns, recursive=False):
+    """
+    Expand files, directories and glob patterns into a sorted list of log paths.
+    Segments of one run are collapsed into the run's path (ChromeLog.run_path()).
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                walk = (os.path.join(root, f) for root, _, files in os.walk(pattern) for f in files)
+            else:
+                walk = (os.path.join(pattern, f) for f in os.listdir(pattern))
+            found.update(p for p in walk if p.lower().endswith(LOG_EXTENSIONS) and os.path.isfile(p))
+        elif os.path.isfile(pattern):
+            found.add(pattern)
+        else:
+            found.update(p for p in glob.glob(pattern, recursive=True)
+                         if p.lower().endswith(LOG_EXTENSIONS) and os.path.isfile(p))
+    return sorted({run_path(p) for p in found})
+
+
+def output_names(paths):
+    """Chart base names: the file stem, prefixed with its directory when stems collide."""
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    names = []
+    for path, stem in zip(paths, stems):
+        if stems.count(stem) > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            stem = '%s_%s' % (parent, stem)
+        names.append(stem)
+    return names
+
+
+def summarise(depth, counts, zones, threshold):
+    return {
+        'records': int(len(depth)),
+        'depth_min_m': float(depth.min()),
+        'depth_max_m': float(depth.max()),
+        'counts_min': float(counts.min()),
+        'counts_mean': float(counts.mean(dtype=np.float64)),
+        'counts_max': float(counts.max()),
+        'below_threshold_fraction': float((counts < threshold).mean()),
+        'zones': len(zones),
+        'zone_thickness_m': float(zones['thickness_m'].sum()),
+        'zone_list': zones.to_dict('records'),
+    }
+
+
+def render_chart(depth, counts, zones, path, dpi=DEFAULT_DPI):
+    # Plain Figure + Agg canvas: no GUI backend and no pyplot state in the workers
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGURE_SIZE)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    style_axes(ax, depth.min(), depth.max(), counts.max())
+    x, y = DepthPyramid(depth, counts).view(max_buckets=int(FIGURE_SIZE[1] * dpi))
+    draw_counts(ax, x, y, zones=zones)
+    finish_layout(fig)
+    fig.savefig(path, dpi=dpi)
+
+
+def process_log(path, name, outdir, fmt, dpi, use_cache, detector):
+    """Worker: load one log, find its zones, render its chart and write its summary and zone table."""
+    start = time.perf_counter()
+    result = {'log': path}
+    try:
+        if use_cache:
+            depth, counts = LogCache().load(path)
+        else:
+            depth, counts = load_depth_counts(path)
+        if len(depth) == 0:
+            raise ValueError('log contains no records')
+
+        zones = detector.detect(depth, counts)
+        export_zones(zones, os.path.join(outdir, name + '.zones.csv'))
+        chart = os.path.join(outdir, '%s.%s' % (name, fmt))
+        render_chart(depth, counts, zones, chart, dpi)
+        result.update(summarise(depth, counts, zones, detector.threshold))
+        result['chart'] = chart
+        result['seconds'] = time.perf_counter() - start
+        with open(os.path.join(outdir, name + '.summary.json'), 'w') as f:
+            json.dump(result, f, indent=2)
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def write_summary(results, outdir):
+    path = os.path.join(outdir, SUMMARY_FILE)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result in sorted(results, key=lambda r: r['log']):
+            if 'error' not in result:
+                writer.writerow(result)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='log files, directories or glob patterns')
+    parser.add_argument('-o', '--outdir', default='charts', help='output directory (default: charts)')
+    parser.add_argument('--format', choices=['png', 'svg'], default='png')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='search directories recursively')
+    parser.add_argument('--no-cache', action='store_true', help='always parse logs instead of using the cache')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='counts below this open a zone (default: %(default)g)')
+    parser.add_argument('--hysteresis', type=float, default=DEFAULT_HYSTERESIS,
+                        help='counts must rise this far above the threshold to close a zone (default: %(default)g)')
+    parser.add_argument('--min-thickness', type=float, default=DEFAULT_MIN_THICKNESS_M,
+                        help='drop zones thinner than this, in m (default: %(default)g)')
+    args = parser.parse_args()
+    try:
+        detector = ZoneDetector(args.threshold, args.hysteresis, args.min_thickness)
+    except ValueError as e:
+        parser.error(str(e))
+
+    paths = find_logs(args.inputs, args.recursive)
+    if not paths:
+        print('No logs found', file=sys.stderr)
+        sys.exit(1)
+    os.makedirs(args.outdir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(process_log, path, name, args.outdir, args.format, args.dpi, not args.no_cache,
+                               detector)
+                   for path, name in zip(paths, output_names(paths))]
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            if 'error' in result:
+                status = 'FAILED %s' % result['error']
+            else:
+                status = '%d records, %d zones' % (result['records'], result['zones'])
+            print('[%d/%d] %s: %s (%.2f s)' % (done, len(paths), result['log'], status, result['seconds']),
+                  file=sys.stderr)
+
+    wall = time.perf_counter() - start
+    summary = write_summary(results, args.outdir)
+    failed = [r for r in results if 'error' in r]
+    records = sum(r.get('records', 0) for r in results)
+    print('%d logs (%d failed), %d records in %.1f s: %.1f logs/s, %.0f records/s' %
+          (len(results), len(failed), records, wall, len(results) / wall, records / wall), file=sys.stderr)
+    print('Zones: %s' % detector.describe(), file=sys.stderr)
+    print('Summary: %s' % summary, file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
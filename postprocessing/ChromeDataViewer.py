@@ -1,88 +1,421 @@
+import time
+START_TIME = time.perf_counter()
+
+import importlib
+import os
+import sys
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-import matplotlib.ticker as ticker  # Add this to your imports
+
+# NumPy, pandas and matplotlib take about a second to import (much longer from a
+# cold frozen build), so they are only imported inside the functions that plot.
+# The window opens first and WARM_MODULES are imported in a background thread
+# while the user picks a file; the first plot then finds them loaded.
+WARM_MODULES = ['numpy', 'pandas', 'matplotlib.pyplot', 'matplotlib.backends.backend_tkagg',
+                'ChromeLog', 'ChromeZones', 'ChromePlot', 'DepthPyramid', 'LogCache', 'RunIndex']
+
+# Startup timing, printed to stderr when CHROMEBOX_TIMING is set
+TIMING_ENV = 'CHROMEBOX_TIMING'
+
+# Zone settings shown at startup; must match the ChromeZones defaults (repeated
+# here so the window does not wait for ChromeZones, NumPy and pandas to import)
+DEFAULT_THRESHOLD = 30000
+DEFAULT_HYSTERESIS = 500
+DEFAULT_MIN_THICKNESS_M = 0.0
+
+LOG_FILETYPES = [("Depth logs", "*.csv *.bin"), ("CSV files", "*.csv"), ("Binary logs", "*.bin")]
+ZONE_FILETYPES = [("CSV files", "*.csv"), ("JSON files", "*.json")]
+
+# Follow mode
+FOLLOW_POLL_MS = 250         # How often the followed log is checked for new records
+FOLLOW_MAX_FPS = 5           # Upper bound on redraws per second
+FOLLOW_HEADROOM = 0.25       # Fraction of the depth span added below the data when rescaling
+
+# Overlay of indexed runs
+OVERLAY_MAX_RUNS = 12        # Most runs drawn in one overlay (beyond this the plot is unreadable)
+
+
+def log_timing(event):
+    # Windowed (frozen) builds have no stderr
+    if os.environ.get(TIMING_ENV) and sys.stderr is not None:
+        print(f"[{(time.perf_counter() - START_TIME) * 1000:8.1f} ms] {event}", file=sys.stderr)
+
+
+def warm_imports():
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    log_timing("heavy modules imported")
 
 
 class DepthPlotterApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Counts vs. Depth Plotter")
-        self.root.geometry("300x150")
+        self.root.geometry("300x330")
 
-        self.label = tk.Label(root, text="Select a CSV file:")
+        self.label = tk.Label(root, text="Select a CSV or binary log file:")
         self.label.pack(pady=10)
 
         self.open_button = tk.Button(root, text="Open CSV", command=self.open_csv)
         self.open_button.pack()
 
+        self.follow_button = tk.Button(root, text="Follow growing log", command=self.follow_log)
+        self.follow_button.pack(pady=5)
+
+        self.overlay_button = tk.Button(root, text="Overlay indexed runs", command=self.overlay_runs)
+        self.overlay_button.pack()
+
+        # Zone detection settings, applied to the next plotted log
+        zone_frame = tk.LabelFrame(root, text="Zones")
+        zone_frame.pack(pady=10, padx=10, fill=tk.X)
+        self.zone_entries = {}
+        for row, (key, label, default) in enumerate([
+                ('threshold', "Threshold (counts)", DEFAULT_THRESHOLD),
+                ('hysteresis', "Hysteresis (counts)", DEFAULT_HYSTERESIS),
+                ('min_thickness_m', "Min thickness (m)", DEFAULT_MIN_THICKNESS_M)]):
+            tk.Label(zone_frame, text=label).grid(row=row, column=0, sticky=tk.W)
+            entry = tk.Entry(zone_frame, width=10)
+            entry.insert(0, f"{default:g}")
+            entry.grid(row=row, column=1)
+            self.zone_entries[key] = entry
+        tk.Label(zone_frame, text="Export from each plot's toolbar").grid(row=3, column=0, columnspan=2, pady=5)
+
+        # Parsed logs are cached, so reopening a log memory-maps it instead of parsing
+        self.cache = None   # LogCache, created with the first plot
+        self.first_plot_logged = False
+
     def open_csv(self):
-        filepath = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        filepath = filedialog.askopenfilename(filetypes=LOG_FILETYPES)
         if not filepath:
             return
+        opened = time.perf_counter()
+        log_timing("file chosen")
 
+        from ChromeLog import MissingColumnsError
+        from LogCache import LogCache
+        if self.cache is None:
+            self.cache = LogCache()
+
+        # Only depth and counts are loaded, as typed arrays read in chunks (or from the cache)
         try:
-            df = pd.read_csv(filepath)
+            depth, counts = self.cache.load(filepath)
+        except MissingColumnsError as e:
+            messagebox.showerror("Error", f"Log must contain 'Depth(m)' and '# Counts' columns.\n{e}")
+            return
         except Exception as e:
             messagebox.showerror("Error", f"Failed to read file:\n{e}")
             return
 
-        # Ensure required columns exist
-        if 'Depth(m)' not in df.columns or '# Counts' not in df.columns:
-            messagebox.showerror("Error", "CSV must contain 'Depth(m)' and '# Counts' columns.")
+        if len(depth) == 0:
+            messagebox.showerror("Error", "The log contains no records.")
             return
 
-        self.plot_data(df)
+        detector = self.zone_detector()
+        if detector is None:
+            return
+        zones = detector.detect(depth, counts)
+        log_timing(f"log loaded ({(time.perf_counter() - opened) * 1000:.0f} ms after choosing it)")
+        self.plot_data(depth, counts, zones)
 
-    def plot_data(self, df):
-        plt.figure(figsize=(4, 8))
+    def zone_detector(self):
+        from ChromeZones import ZoneDetector
+        try:
+            return ZoneDetector(**{key: float(entry.get()) for key, entry in self.zone_entries.items()})
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid zone settings:\n{e}")
+            return None
 
-        x = df['# Counts']
-        y = df['Depth(m)']
+    def follow_log(self):
+        filepath = filedialog.askopenfilename(filetypes=LOG_FILETYPES)
+        if not filepath:
+            return
+        detector = self.zone_detector()
+        if detector is not None:
+            FollowView(self.root, filepath, detector.threshold)
 
-        plt.plot(x, y, color='blue', label='Counts vs. Depth')
+    def overlay_runs(self):
+        from RunIndex import RunIndex
+        try:
+            index = RunIndex()
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to open the run index:\n{e}")
+            return
+        OverlayPicker(self.root, index)
+
+    def plot_data(self, depth, counts, zones):
+        import matplotlib.pyplot as plt
 
-        # Fill beneath the curve conditionally
-        # Create masks for below and above threshold
-        below_mask = x < 30000
-        above_mask = x >= 30000
+        figure = LogFigure(depth, counts, zones)
+        figure.fig.canvas.mpl_connect('draw_event', self.first_draw)
+        plt.show()
 
-        # Fill where counts < 30000 (brown)
-        plt.fill_betweenx(y, 0, x, where=below_mask, color='saddlebrown', alpha=0.5)
+    def first_draw(self, event):
+        if not self.first_plot_logged:
+            self.first_plot_logged = True
+            log_timing("first plot drawn")
 
-        # Fill where counts >= 30000 (white) - white fill is basically no fill,
-        # but we can fill with white to "overwrite" if needed
-        plt.fill_betweenx(y, 0, x, where=above_mask, color='white', alpha=0.5)
 
-        plt.xlabel("ADC Counts")
-        plt.ylabel("Depth (m)")
-        plt.title("Counts vs. Depth")
-        plt.grid(True)
+class LogFigure:
+    """
+    One plotted log. The plot never holds the full log: it shows a min/max
+    envelope from the log's pyramid, re-decimated to the axes' pixel height
+    whenever the view changes. All drawing state and the zone table live
+    here, so several figures can be open at once (plt.show() nests the Tk
+    main loop, and the main window stays usable while a figure is open).
+    The "Export zones" button on the figure's toolbar writes its own table.
+    """
 
-        plt.gca().invert_yaxis()  # Make depth increase downward
+    def __init__(self, depth, counts, zones):
+        import matplotlib.pyplot as plt
+        from ChromePlot import FIGURE_SIZE, finish_layout, style_axes
+        from DepthPyramid import DepthPyramid
 
-        ax = plt.gca()
-        # ax.invert_yaxis()
+        self.pyramid = DepthPyramid(depth, counts)
+        self.zones = zones
+        self.line, self.fills = None, []
 
-        # Minor ticks every 0.05 m
-        minor_locator = ticker.MultipleLocator(0.10)
-        ax.yaxis.set_minor_locator(minor_locator)
+        self.fig = plt.figure(figsize=FIGURE_SIZE)
+        self.ax = self.fig.gca()
+        style_axes(self.ax, depth.min(), depth.max(), counts.max())
+        self.ax.set_title(f"Counts vs. Depth ({len(zones)} zones)")
+        self.redraw()
+        self.ax.callbacks.connect('ylim_changed', lambda ax: self.redraw())
+        self.fig.canvas.mpl_connect('resize_event', lambda event: self.redraw())
+        finish_layout(self.fig)
 
-        # Major ticks every 0.25 m with labels
-        major_locator = ticker.MultipleLocator(0.20)
-        ax.yaxis.set_major_locator(major_locator)
+        toolbar = getattr(self.fig.canvas.manager, 'toolbar', None)
+        if isinstance(toolbar, tk.Widget):
+            tk.Button(toolbar, text="Export zones", command=self.export_zones).pack(side=tk.LEFT, padx=5)
 
-        # Optional: smaller ticks for minor ones
-        ax.tick_params(axis='y', which='minor', length=4)
-        ax.tick_params(axis='y', which='major', length=8)
+    def redraw(self):
+        from ChromePlot import draw_counts
+
+        # Re-decimate the visible depth range to about one bucket per pixel row
+        lo, hi = self.ax.get_ylim()
+        max_buckets = max(int(self.ax.bbox.height), 100)
+        x, y = self.pyramid.view(lo, hi, max_buckets)
+        self.line, self.fills = draw_counts(self.ax, x, y, self.line, self.fills, self.zones)
+
+    def export_zones(self):
+        parent = self.fig.canvas.get_tk_widget()
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=ZONE_FILETYPES, parent=parent)
+        if not path:
+            return
+        from ChromeZones import export_zones
+        try:
+            export_zones(self.zones, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to write zones:\n{e}", parent=parent)
+
+
+class OverlayPicker:
+    """
+    Choose runs from the run index (RunIndex) and plot their depth-gridded mean
+    counts on one axes. Only the index is read, so overlaying many long runs
+    is as quick as overlaying short ones.
+    """
+
+    def __init__(self, root, index):
+        self.index = index
+        self.window = tk.Toplevel(root)
+        self.window.title("Overlay indexed runs")
+
+        range_frame = tk.Frame(self.window)
+        range_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(range_frame, text="Depth from (m):").pack(side=tk.LEFT)
+        self.depth_lo = tk.Entry(range_frame, width=8)
+        self.depth_lo.pack(side=tk.LEFT)
+        tk.Label(range_frame, text="to").pack(side=tk.LEFT)
+        self.depth_hi = tk.Entry(range_frame, width=8)
+        self.depth_hi.pack(side=tk.LEFT)
+        tk.Button(range_frame, text="Filter", command=self.refresh).pack(side=tk.LEFT, padx=5)
+
+        self.listbox = tk.Listbox(self.window, selectmode=tk.EXTENDED, width=80, height=15)
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=5)
+
+        buttons = tk.Frame(self.window)
+        buttons.pack(pady=5)
+        tk.Button(buttons, text="Add logs to index...", command=self.add_logs).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Plot selected", command=self.plot_selected).pack(side=tk.LEFT, padx=5)
+
+        self.paths = []
+        self.refresh()
+
+    def depth_range(self):
+        """(lo, hi) from the entries, or (None, None) if either is empty."""
+        lo, hi = self.depth_lo.get().strip(), self.depth_hi.get().strip()
+        if not lo or not hi:
+            return None, None
+        return float(lo), float(hi)
+
+    def refresh(self):
+        try:
+            lo, hi = self.depth_range()
+        except ValueError:
+            messagebox.showerror("Error", "Depths must be numbers.", parent=self.window)
+            return
+        runs = self.index.runs(lo, hi)
+        self.paths = [r['path'] for r in runs]
+        self.listbox.delete(0, tk.END)
+        for r in runs:
+            self.listbox.insert(tk.END, f"{r['path']}  ({r['depth_min']:.2f} .. {r['depth_max']:.2f} m)")
+        if not runs:
+            self.listbox.insert(tk.END, "No indexed runs here. Add logs, or run RunIndex.py add <dir>.")
+
+    def add_logs(self):
+        paths = filedialog.askopenfilenames(filetypes=LOG_FILETYPES, parent=self.window)
+        if not paths:
+            return
+        errors = self.index.add(paths)
+        if errors:
+            messagebox.showerror("Error", "\n".join(f"{p}: {e}" for p, e in errors.items()), parent=self.window)
+        self.refresh()
+
+    def plot_selected(self):
+        selected = [self.paths[i] for i in self.listbox.curselection() if i < len(self.paths)]
+        if not selected:
+            messagebox.showinfo("Overlay", "Select one or more runs.", parent=self.window)
+            return
+        if len(selected) > OVERLAY_MAX_RUNS:
+            messagebox.showinfo("Overlay", f"Showing the first {OVERLAY_MAX_RUNS} selected runs.", parent=self.window)
+            selected = selected[:OVERLAY_MAX_RUNS]
+        try:
+            lo, hi = self.depth_range()
+        except ValueError:
+            messagebox.showerror("Error", "Depths must be numbers.", parent=self.window)
+            return
+        import matplotlib.pyplot as plt
+        from ChromePlot import FIGURE_SIZE, finish_layout, style_axes
+
+        fig = plt.figure(figsize=FIGURE_SIZE)
+        ax = fig.gca()
+        depth_min, depth_max, counts_max = float('inf'), float('-inf'), 0.0
+        for path in selected:
+            depth, mean, _, _ = self.index.profile(path, lo, hi)
+            if len(depth) == 0:
+                continue
+            ax.plot(mean, depth, label=os.path.basename(path), linewidth=1)
+            depth_min, depth_max = min(depth_min, depth[0]), max(depth_max, depth[-1])
+            counts_max = max(counts_max, float(mean.max()))
+        if depth_min > depth_max:
+            plt.close(fig)
+            messagebox.showinfo("Overlay", "The selected runs have no data in this depth range.", parent=self.window)
+            return
+
+        style_axes(ax, depth_min, depth_max, counts_max)
+        ax.set_title(f"Mean counts per {self.index.step:g} m")
+        ax.legend(fontsize='small')
+        finish_layout(fig)
+        plt.show(block=False)
+
+
+class FollowView:
+    """
+    Live-tail plot of a log that is still being written (e.g. synced from the Pico).
+
+    Only newly appended records are parsed (LogTail) and folded into a
+    fixed-size min/max envelope, and frames are drawn by blitting the curve and
+    fills over a cached background. The axes are only rescaled, with headroom,
+    when the data runs past them, so the per-frame cost stays flat however long
+    the run gets.
+    """
+
+    def __init__(self, root, filepath, threshold=DEFAULT_THRESHOLD):
+        import matplotlib.pyplot as plt
+        from ChromeLog import LogTail
+        from ChromePlot import FIGURE_SIZE
+        from DepthPyramid import StreamingEnvelope
+
+        self.root = root
+        self.threshold = threshold   # Live fills shade plotted counts below this
+        self.tail = LogTail(filepath)
+        self.envelope = StreamingEnvelope()
+        self.counts_max = 0.0
+        self.last_frame = 0.0
+        self.dirty = False
+        self.background = None
+
+        self.fig = plt.figure(figsize=FIGURE_SIZE)
+        self.ax = self.fig.gca()
+        self.line, self.fills = None, []
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+        self.fig.canvas.mpl_connect('close_event', self.on_close)
+        self.closed = False
+        plt.show(block=False)
+        self.poll()
+
+    def poll(self):
+        if self.closed:
+            return
+        try:
+            restarts = self.tail.restarts
+            depth, counts = self.tail.read_new()
+        except (OSError, ValueError) as e:
+            self.fig.suptitle(f"Waiting for log: {e}", fontsize=8)
+            self.fig.canvas.draw_idle()
+            depth = counts = ()
+        else:
+            if self.tail.restarts != restarts:
+                self.envelope.clear()
+                self.counts_max = 0.0
+            if len(depth):
+                self.envelope.append(depth, counts)
+                self.counts_max = max(self.counts_max, float(counts.max()))
+                self.dirty = True
+
+        now = time.monotonic()
+        if self.dirty and now - self.last_frame >= 1.0 / FOLLOW_MAX_FPS:
+            self.last_frame = now
+            self.dirty = False
+            self.update_plot()
+        self.root.after(FOLLOW_POLL_MS, self.poll)
+
+    def update_plot(self):
+        from ChromePlot import draw_counts, finish_layout, style_axes
+
+        x, y = self.envelope.points()
+        self.line, self.fills = draw_counts(self.ax, x, y, self.line, self.fills, threshold=self.threshold)
+        self.line.set_animated(True)
+        for fill in self.fills:
+            fill.set_animated(True)
+
+        # Rescale (full redraw) only when the data leaves the current axes
+        top, bottom = min(self.ax.get_ylim()), max(self.ax.get_ylim())
+        depth_lo, depth_hi = float(y.min()), float(y.max())
+        if self.background is None or depth_hi > bottom or depth_lo < top or self.counts_max > self.ax.get_xlim()[1]:
+            span = max(depth_hi - depth_lo, 1.0)
+            style_axes(self.ax, depth_lo, depth_hi + FOLLOW_HEADROOM * span, self.counts_max * (1 + FOLLOW_HEADROOM))
+            self.ax.set_title(f"Following {os.path.basename(self.tail.filepath)}")
+            finish_layout(self.fig)
+            self.fig.canvas.draw()      # on_draw caches the new background and blits the artists
+        else:
+            self.blit()
+
+    def on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.blit(restore=False)
+
+    def blit(self, restore=True):
+        if self.line is None:
+            return
+        canvas = self.fig.canvas
+        if restore:
+            canvas.restore_region(self.background)
+        for fill in self.fills:
+            self.ax.draw_artist(fill)
+        self.ax.draw_artist(self.line)
+        canvas.blit(self.fig.bbox)
+
+    def on_close(self, event):
+        self.closed = True
 
-        plt.tight_layout()
-        plt.subplots_adjust(left=0.2, right=0.95)  # Adds margin so y-labels aren't cut off
-        plt.show()
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()   # Indexing runs in worker processes, also from a frozen build
     root = tk.Tk()
     app = DepthPlotterApp(root)
+    root.after_idle(log_timing, "window shown")
+    threading.Thread(target=warm_imports, daemon=True).start()
     root.mainloop()
@@ -1,5 +1,19 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# One-folder build: dist/ChromeDataViewer/ChromeDataViewer.exe starts straight
+# from the installed folder instead of unpacking the whole bundle into a
+# temporary directory on every launch, as the one-file build did.
+
+# Not used by the viewer: other GUI toolkits, notebook/test tooling and large
+# optional dependencies that hooks pull in when they are installed. The
+# matplotlib backends other than TkAgg are left out through hooksconfig below.
+excludes = [
+    'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx', 'gi', 'cairo', 'cairocffi',
+    'IPython', 'jupyter', 'notebook', 'ipykernel', 'tornado',
+    'scipy', 'sklearn', 'numba', 'pyarrow', 'sqlalchemy', 'openpyxl', 'xlsxwriter', 'tables', 'bottleneck', 'numexpr',
+    'pytest', 'hypothesis', 'sphinx', 'docutils', 'setuptools', 'pkg_resources', 'lib2to3', 'pydoc_data',
+    'numpy.tests', 'pandas.tests', 'matplotlib.tests', 'tkinter.test',
+]
 
 a = Analysis(
     ['ChromeDataViewer.py'],
@@ -8,9 +22,12 @@ a = Analysis(
     datas=[],
     hiddenimports=[],
     hookspath=[],
-    hooksconfig={},
+    hooksconfig={
+        # Only the Tk backend; stops the matplotlib hook from collecting the others
+        'matplotlib': {'backends': ['TkAgg']},
+    },
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     noarchive=False,
     optimize=0,
 )
@@ -19,16 +36,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='ChromeDataViewer',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,       # UPX-packed DLLs have to be decompressed at every start
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +51,13 @@ exe = EXE(
     entitlements_file=None,
     icon=['chalk_icon.ico'],
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='ChromeDataViewer',
+)
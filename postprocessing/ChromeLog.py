@@ -0,0 +1,453 @@
+"""
+Readers for ChromeBox depth logs.
+
+Two on-disk formats are produced by the uphole firmware:
+- CSV text logs: "Depth(m),Voltage(V),Current(mA),# Counts"
+- Binary logs: a versioned header followed by fixed-width records
+  (layout defined in uphole/logFormat.py and mirrored here)
+
+read_log() returns a DataFrame with the CSV column names for either format, so
+the viewer does not need to care which one it was given. load_depth_counts()
+returns just the two plotted columns as typed arrays, for logs too long to
+hold as a full DataFrame. LogTail follows a log that is still being written.
+
+Binary headers carry the firmware's CALIBRATION_POINTS, if any, and voltage
+and current are then derived from counts through the same piecewise-linear
+calibration the firmware applies to its CSV logs.
+
+Binary logs written in SEGMENTED mode are split into chromeData_0000.bin,
+chromeData_0001.bin, ...; each file is an ordinary binary log whose header
+carries its segment index. Opening any segment opens the whole run:
+read_log(), load_depth_counts() and LogTail join the segments in order, and
+run_path() names the run by its first segment still present.
+"""
+import glob
+import io
+import os
+import re
+import struct
+
+import numpy as np
+import pandas as pd
+
+# Must match uphole/logFormat.py
+LOG_MAGIC = b'CHRB'
+SAMPLE_MAGIC = b'CHRS'       # Continuous sample stream, see ChromeSamples
+LOG_VERSION = 1
+HEADER_FORMAT = '<4sHHHHfffIH2x'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+FLAG_VALID = 0x8000
+
+CALIBRATION_DTYPE = np.dtype([
+    ('counts', '<u4'),   # Raw ADC counts
+    ('volts', '<f4'),    # Measured volts across the load resistor
+])
+
+RECORD_DTYPE = np.dtype([
+    ('tick', '<i4'),     # Depth tick index
+    ('counts', '<u2'),   # Raw ADC counts
+    ('flags', '<u2'),
+])
+
+A_to_mA = 1000.0
+
+DEPTH_COLUMN = 'Depth(m)'
+VOLTAGE_COLUMN = 'Voltage(V)'
+CURRENT_COLUMN = 'Current(mA)'
+COUNTS_COLUMN = '# Counts'
+
+CSV_CHUNK_ROWS = 1_000_000   # Rows parsed per chunk by load_depth_counts()
+TAIL_INITIAL_CAPACITY = 65536  # Records preallocated by LogTail before its buffers first grow
+SEGMENT_NAME = re.compile(r'^(.*)_(\d{4,})\.bin$')  # Must match logSegments.SEGMENT_NAME_FORMAT
+
+
+class MissingColumnsError(ValueError):
+    """A CSV log lacks the depth or counts column."""
+
+
+def pack_header(load_resistor_ohms, adc_max_voltage, depth_increment_m, adc_max_reading, calibration=None):
+    """
+    Binary log header, as written by the firmware (for logs recorded on the host).
+    calibration is an optional list of (counts, volts) points, as CALIBRATION_POINTS.
+    """
+    points = np.array(sorted(calibration or ()), dtype=CALIBRATION_DTYPE)
+    header_size = HEADER_SIZE + points.nbytes
+    return struct.pack(HEADER_FORMAT, LOG_MAGIC, LOG_VERSION, header_size, RECORD_DTYPE.itemsize, 0,
+                       load_resistor_ohms, adc_max_voltage, depth_increment_m, adc_max_reading,
+                       len(points)) + points.tobytes()
+
+
+def is_binary_log(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read(len(LOG_MAGIC)) == LOG_MAGIC
+
+
+def is_sample_stream(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read(len(SAMPLE_MAGIC)) == SAMPLE_MAGIC
+
+
+def _f32(value):
+    # Header constants are stored as float32; drop the representation noise
+    return float(f'{value:.7g}')
+
+
+def read_header(filepath):
+    with open(filepath, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+        if len(raw) < HEADER_SIZE:
+            raise ValueError("File is too short to be a binary log")
+
+        (magic, version, header_size, record_size, segment, load_resistor_ohms, adc_max_voltage,
+         depth_increment_m, adc_max_reading, n_points) = struct.unpack(HEADER_FORMAT, raw)
+
+        if magic not in (LOG_MAGIC, SAMPLE_MAGIC):
+            raise ValueError("Not a binary ChromeBox log")
+        if record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported record size {record_size} (log version {version})")
+        if header_size < HEADER_SIZE + n_points * CALIBRATION_DTYPE.itemsize:
+            raise ValueError(f"Header size {header_size} too small for {n_points} calibration points")
+
+        raw = f.read(n_points * CALIBRATION_DTYPE.itemsize)
+        if len(raw) < n_points * CALIBRATION_DTYPE.itemsize:
+            raise ValueError("File is too short to hold its calibration points")
+        points = np.frombuffer(raw, dtype=CALIBRATION_DTYPE)
+
+    return {
+        'magic': magic,
+        'version': version,
+        'header_size': header_size,
+        'record_size': record_size,
+        'segment': segment,
+        'load_resistor_ohms': _f32(load_resistor_ohms),
+        'adc_max_voltage': _f32(adc_max_voltage),
+        'depth_increment_m': _f32(depth_increment_m),
+        'adc_max_reading': adc_max_reading,
+        'calibration': [(int(c), _f32(v)) for c, v in points] or None,
+    }
+
+
+def counts_to_volts(header, counts):
+    """
+    Volts across the load resistor for raw counts (float64), using the header's
+    calibration points if it has any. Like the firmware's Unit_Converter, the
+    calibration is linear between points and extrapolated past the outer ones.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if not header.get('calibration'):
+        return counts * header['adc_max_voltage'] / header['adc_max_reading']
+    x, y = np.array(header['calibration'], dtype=np.float64).T
+    i = np.clip(np.searchsorted(x, counts, side='right'), 1, len(x) - 1)
+    x0, y0 = x[i - 1], y[i - 1]
+    return y0 + (y[i] - y0) * (counts - x0) / (x[i] - x0)
+
+
+def load_binary(filepath):
+    """
+    Memory-map the records of a binary log.
+
+    Returns (header dict, structured array of RECORD_DTYPE). The array is a
+    read-only view of the file, so even very long runs open without copying.
+    Trailing space that has not been written yet (no FLAG_VALID) is excluded.
+    """
+    header = read_header(filepath)
+    with open(filepath, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+
+    n = (size - header['header_size']) // header['record_size']
+    if n <= 0:
+        return header, np.zeros(0, dtype=RECORD_DTYPE)
+
+    records = np.memmap(filepath, dtype=RECORD_DTYPE, mode='r',
+                        offset=header['header_size'], shape=(n,))
+
+    # Records are written front to back, so the valid ones form a prefix
+    valid = (records['flags'] & FLAG_VALID) != 0
+    if not valid.all():
+        n = int(np.argmin(valid))
+        records = records[:n]
+    return header, records
+
+
+def segment_paths(filepath):
+    """
+    All segment files of the run that filepath belongs to, in segment order.
+    A log that is not part of a segmented run is returned on its own.
+    """
+    match = SEGMENT_NAME.match(filepath)
+    if not match:
+        return [filepath]
+    prefix = match.group(1)
+    found = []
+    for path in glob.glob(glob.escape(prefix) + '_*.bin'):
+        other = SEGMENT_NAME.match(path)
+        if other and other.group(1) == prefix:
+            found.append((int(other.group(2)), path))
+    return [path for _, path in sorted(found)]
+
+
+def run_path(filepath):
+    """The path that stands for the run filepath belongs to: its first segment, or filepath itself."""
+    paths = segment_paths(filepath)
+    return paths[0] if paths else filepath
+
+
+def run_signature(filepath):
+    """(total size in bytes, newest mtime in ns) over every file of the run filepath belongs to."""
+    stats = [os.stat(path) for path in segment_paths(filepath) or [filepath]]
+    return sum(st.st_size for st in stats), max(st.st_mtime_ns for st in stats)
+
+
+def load_segments(filepath):
+    """
+    Join the records of every segment of a run (see segment_paths()).
+
+    Returns (header dict of the first segment, structured array of RECORD_DTYPE).
+    Segments that were rotated away on the Pico are simply missing, so the
+    result starts at the oldest segment still present.
+    """
+    parts = [load_binary(path) for path in segment_paths(filepath)]
+    header = dict(parts[0][0], segments=len(parts))
+    if len(parts) == 1:
+        return header, parts[0][1]
+    return header, np.concatenate([records for _, records in parts])
+
+
+def binary_to_dataframe(filepath):
+    header, records = load_segments(filepath)
+
+    counts = records['counts'].astype(np.int64)
+    voltage = counts_to_volts(header, counts)
+    return pd.DataFrame({
+        DEPTH_COLUMN: records['tick'] * header['depth_increment_m'],
+        VOLTAGE_COLUMN: voltage,
+        CURRENT_COLUMN: voltage * A_to_mA / header['load_resistor_ohms'],
+        COUNTS_COLUMN: counts,
+    })
+
+
+def read_log(filepath):
+    """Read a CSV or binary depth log into a DataFrame with the CSV column names."""
+    if is_binary_log(filepath):
+        return binary_to_dataframe(filepath)
+    return pd.read_csv(filepath)
+
+
+def load_depth_counts(filepath, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Load only depth (float64, m) and counts (float32) from a CSV or binary log.
+
+    CSV logs are parsed in chunks of chunk_rows with fixed column types, so peak
+    memory stays a small multiple of the two output arrays however long the
+    log is. Binary logs are converted straight from the memory-mapped records,
+    all segments of a segmented run together. Sample streams give one point
+    per ADC sample, with interpolated depth. A CSV log without the depth or
+    counts column raises MissingColumnsError.
+    """
+    if is_sample_stream(filepath):
+        from ChromeSamples import load_sample_depth_counts
+        return load_sample_depth_counts(filepath)
+    if is_binary_log(filepath):
+        header, records = load_segments(filepath)
+        depth = records['tick'] * np.float64(header['depth_increment_m'])
+        return depth, records['counts'].astype(np.float32)
+
+    with open(filepath, newline='') as f:
+        names = [n.strip() for n in f.readline().split(',')]
+    missing = [c for c in (DEPTH_COLUMN, COUNTS_COLUMN) if c not in names]
+    if missing:
+        raise MissingColumnsError(f"Missing column(s) {', '.join(missing)}")
+
+    depth_parts, counts_parts = [], []
+    reader = pd.read_csv(filepath, usecols=[DEPTH_COLUMN, COUNTS_COLUMN],
+                         dtype={DEPTH_COLUMN: np.float64, COUNTS_COLUMN: np.float32},
+                         chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            depth_parts.append(chunk[DEPTH_COLUMN].to_numpy())
+            counts_parts.append(chunk[COUNTS_COLUMN].to_numpy())
+    if not depth_parts:
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float32)
+    return np.concatenate(depth_parts), np.concatenate(counts_parts)
+
+
+def _has_records(filepath):
+    """True once the first record of a binary log has been written (FLAG_VALID)."""
+    try:
+        header = read_header(filepath)
+        with open(filepath, 'rb') as f:
+            f.seek(header['header_size'])
+            raw = f.read(RECORD_DTYPE.itemsize)
+    except (OSError, ValueError):
+        return False   # Missing, or its header is still being written
+    if len(raw) < RECORD_DTYPE.itemsize:
+        return False
+    return bool(np.frombuffer(raw, dtype=RECORD_DTYPE)['flags'][0] & FLAG_VALID)
+
+
+class GrowableArray:
+    """Preallocated 1-D array that doubles its capacity when full (amortised O(1) appends)."""
+
+    def __init__(self, dtype, capacity=TAIL_INITIAL_CAPACITY):
+        self._data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, values):
+        n = self.size + len(values)
+        if n > len(self._data):
+            grown = np.empty(max(n, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:n] = values
+        self.size = n
+
+    def clear(self):
+        self.size = 0
+
+    @property
+    def values(self):
+        return self._data[:self.size]
+
+
+class LogTail:
+    """
+    Incremental reader for a CSV or binary log that is still growing.
+
+    read_new() parses only what was appended since the previous call: complete
+    CSV lines, or whole binary records marked FLAG_VALID. The byte offset of the
+    first unparsed byte is kept, so a partially written line or record is
+    picked up once it is complete. All records read so far are kept in the
+    growable `depth` and `counts` buffers.
+
+    Given a segment of a segmented run, the tail starts at the first segment
+    and moves on to each next one once records appear in it; `filepath` is
+    the file being read.
+
+    If the file shrinks (a new run overwrote it) or the segment being read is
+    deleted, the buffers are cleared and reading starts again from the top;
+    `restarts` counts how often that happened.
+    """
+
+    def __init__(self, filepath):
+        self.segmented = SEGMENT_NAME.match(filepath) is not None
+        self.filepath = run_path(filepath) if self.segmented else filepath
+        self.offset = 0
+        self.restarts = 0
+        self.depth = GrowableArray(np.float64)
+        self.counts = GrowableArray(np.float32)
+        self._binary = None
+        self._columns = None
+        self._header = None
+
+    def _restart(self):
+        if self.segmented:
+            self.filepath = run_path(self.filepath)
+        self.offset = 0
+        self._binary = None
+        self._columns = None
+        self.depth.clear()
+        self.counts.clear()
+        self.restarts += 1
+
+    def _empty(self):
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float32)
+
+    def _next_segment(self):
+        """
+        Path of the segment after the one being read, once the writer has moved
+        on to it, else None. The next file existing is not enough: with
+        LOG_PREALLOCATE it is created while the current one is still filling.
+        Its first valid record shows the current segment is complete.
+        """
+        if not self.segmented:
+            return None
+        paths = segment_paths(self.filepath)
+        if self.filepath not in paths:
+            self._restart()   # Deleted: the run was replaced or rotated past this segment
+            return None
+        i = paths.index(self.filepath) + 1
+        if i < len(paths) and _has_records(paths[i]):
+            return paths[i]
+        return None
+
+    def read_new(self):
+        """Return (depth, counts) of the records appended since the last call."""
+        depth_parts, counts_parts = [], []
+        while True:
+            # Checked before reading: once the next segment has records this one is complete
+            restarts = self.restarts
+            following = self._next_segment()
+            depth, counts = self._read_file()
+            if self.restarts != restarts:
+                depth_parts, counts_parts = [], []
+            depth_parts.append(depth)
+            counts_parts.append(counts)
+            if following is None:
+                break
+            self.filepath = following
+            self.offset = 0
+            self._binary = None
+        if len(depth_parts) == 1:
+            return depth_parts[0], counts_parts[0]
+        return np.concatenate(depth_parts), np.concatenate(counts_parts)
+
+    def _read_file(self):
+        size = os.path.getsize(self.filepath)
+        if size < self.offset:
+            self._restart()
+        if size == self.offset:
+            return self._empty()
+
+        with open(self.filepath, 'rb') as f:
+            if self._binary is None:
+                head = f.read(HEADER_SIZE)
+                if len(head) < len(LOG_MAGIC):
+                    return self._empty()
+                if head.startswith(SAMPLE_MAGIC):
+                    raise ValueError("Sample streams can only be opened once recorded (see ChromeSamples)")
+                self._binary = head.startswith(LOG_MAGIC)
+                if self._binary:
+                    if len(head) < HEADER_SIZE or size < struct.unpack(HEADER_FORMAT, head)[2]:
+                        self._binary = None   # Header still being written
+                        return self._empty()
+                    self._header = read_header(self.filepath)
+                    self.offset = self._header['header_size']
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        if self._binary:
+            depth, counts, used = self._parse_binary(data)
+        else:
+            depth, counts, used = self._parse_csv(data)
+        self.offset += used
+        self.depth.append(depth)
+        self.counts.append(counts)
+        return depth, counts
+
+    def _parse_binary(self, data):
+        n = len(data) // RECORD_DTYPE.itemsize
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=n)
+        valid = (records['flags'] & FLAG_VALID) != 0
+        if not valid.all():
+            n = int(np.argmin(valid))   # Zero-filled space that has not been written yet
+            records = records[:n]
+        depth = records['tick'] * np.float64(self._header['depth_increment_m'])
+        return depth, records['counts'].astype(np.float32), n * RECORD_DTYPE.itemsize
+
+    def _parse_csv(self, data):
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return (*self._empty(), 0)
+        chunk = data[:end]
+        if self._columns is None:
+            # First line is the header; remember where the plotted columns are
+            line_end = chunk.index(b'\n') + 1
+            names = [n.strip() for n in chunk[:line_end].decode().split(',')]
+            self._columns = (names.index(DEPTH_COLUMN), names.index(COUNTS_COLUMN))
+            chunk = chunk[line_end:]
+            if not chunk:
+                return (*self._empty(), end)
+        frame = pd.read_csv(io.BytesIO(chunk), header=None, usecols=list(self._columns),
+                            dtype={self._columns[0]: np.float64, self._columns[1]: np.float32})
+        return frame[self._columns[0]].to_numpy(), frame[self._columns[1]].to_numpy(), end
@@ -0,0 +1,77 @@
+"""
+Counts-vs-Depth plot styling shared by the interactive viewer
+(ChromeDataViewer) and headless batch rendering (ChromeBatch).
+
+The functions only take an Axes, so they work both on pyplot figures and on
+plain matplotlib Figure objects rendered without a GUI.
+"""
+import matplotlib.ticker as ticker
+
+from ChromeZones import DEFAULT_THRESHOLD, zone_mask
+
+FIGURE_SIZE = (4, 8)
+FIXED_TICKS_MAX_SPAN_M = 20  # Longest log drawn with the fixed 0.2 m depth ticks
+LINE_COLOR = 'blue'
+BELOW_COLOR = 'saddlebrown'
+
+
+def draw_counts(ax, x, y, line=None, fills=(), zones=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Draw (or update) the counts curve and its zone fills.
+
+    The curve is shaded brown inside the zones of a zone table (ChromeZones).
+    Without one, it is shaded wherever the plotted counts are below threshold.
+    Pass the line and fills returned by a previous call to replace them in
+    place when the view is re-decimated. Returns (line, fills).
+    """
+    if line is None:
+        line, = ax.plot(x, y, color=LINE_COLOR, label='Counts vs. Depth')
+    else:
+        line.set_data(x, y)
+
+    for fill in fills:
+        fill.remove()
+
+    # Fill beneath the curve: brown inside zones; white (no visible fill) elsewhere
+    below_mask = zone_mask(zones, y) if zones is not None else x < threshold
+    fills = [
+        ax.fill_betweenx(y, 0, x, where=below_mask, color=BELOW_COLOR, alpha=0.5),
+        ax.fill_betweenx(y, 0, x, where=~below_mask, color='white', alpha=0.5),
+    ]
+    return line, fills
+
+
+def style_axes(ax, depth_min, depth_max, counts_max):
+    ax.set_xlim(0, max(float(counts_max), 1.0) * 1.05)
+    ax.set_ylim(float(depth_min), float(depth_max))
+
+    ax.set_xlabel("ADC Counts")
+    ax.set_ylabel("Depth (m)")
+    ax.set_title("Counts vs. Depth")
+    ax.grid(True)
+
+    ax.invert_yaxis()  # Make depth increase downward
+
+    # Fixed 0.2 m / 0.1 m ticks for short logs; on long ones they would run into
+    # the thousands, so matplotlib's automatic spacing is used instead
+    if float(depth_max - depth_min) <= FIXED_TICKS_MAX_SPAN_M:
+        # Minor ticks every 0.10 m
+        minor_locator = ticker.MultipleLocator(0.10)
+        ax.yaxis.set_minor_locator(minor_locator)
+
+        # Major ticks every 0.20 m with labels
+        major_locator = ticker.MultipleLocator(0.20)
+        ax.yaxis.set_major_locator(major_locator)
+    else:
+        # Reset both: follow mode restyles the same axes as the run grows past the limit
+        ax.yaxis.set_major_locator(ticker.AutoLocator())
+        ax.yaxis.set_minor_locator(ticker.AutoMinorLocator())
+
+    # Smaller ticks for minor ones
+    ax.tick_params(axis='y', which='minor', length=4)
+    ax.tick_params(axis='y', which='major', length=8)
+
+
+def finish_layout(fig):
+    fig.tight_layout()
+    fig.subplots_adjust(left=0.2, right=0.95)  # Adds margin so y-labels aren't cut off
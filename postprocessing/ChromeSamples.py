@@ -0,0 +1,179 @@
+"""
+Continuous sample streams: depth interpolated onto every ADC sample.
+
+With ACQUISITION = 'CONTINUOUS' the uphole firmware samples the ADC at a
+fixed rate and writes the stream in rotating segments, chromeSamples_0000.bin,
+chromeSamples_0001.bin, ... (any one of them opens the whole run). Its records
+are timestamped with time.ticks_us(). Depth pulses and depth resets appear in
+the same stream as event records carrying the timestamp of the sample they
+arrived with (a reset, of the moment depth went back to 0).
+
+After a power cycle the Pico appends to the same stream behind a start
+event. Ticks of different boots are unrelated, so the time between boots is
+not known: on the host each boot simply continues from the last record of
+the one before, and depth carries on counting the pulses. Depth counts from
+the first record present, so if the Pico already deleted the oldest segments
+it is relative to the start of the oldest one kept.
+
+This module turns the stream into a depth profile at full sample resolution.
+Depth at each pulse is known exactly. Between pulses it is interpolated
+linearly in time, which assumes the cable speed is constant over one depth
+increment. Before the first pulse of a run depth is 0. A reset is a point
+of depth 0 in that interpolation: depth drops to 0 at the reset and ramps
+up from there to the first pulse after it. After the last pulse it holds
+still.
+
+    python ChromeSamples.py chromeSamples_0000.bin                 # summary
+    python ChromeSamples.py chromeSamples_0000.bin -o samples.csv  # per-sample CSV
+
+The viewer and ChromeBatch open sample streams directly through
+ChromeLog.load_depth_counts().
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ChromeLog import COUNTS_COLUMN, DEPTH_COLUMN, SAMPLE_MAGIC, load_segments
+
+# Must match uphole/logFormat.py
+FLAG_DEPTH_PULSE = 0x0001
+FLAG_DEPTH_RESET = 0x0002
+FLAG_STREAM_START = 0x0004
+TICKS_PERIOD = 1 << 30       # MicroPython time.ticks_us() wraps at 2**30
+
+TIME_COLUMN = 'Time(s)'
+
+
+def unwrap_ticks(ticks, breaks=None):
+    """
+    Microseconds since the first record from wrapping ticks_us() values (int64).
+
+    Records are written almost in time order, but an event can be queued after
+    samples taken later than it. Each step is therefore read as the signed
+    difference of less than half a wrap period, like time.ticks_diff(), and
+    the result can step backwards. Records where breaks is True start a new
+    time base (a reboot) and get the time of the record before them.
+    """
+    ticks = np.asarray(ticks, dtype=np.int64)
+    if len(ticks) == 0:
+        return ticks
+    half = TICKS_PERIOD // 2
+    steps = (np.diff(ticks) + half) % TICKS_PERIOD - half
+    if breaks is not None:
+        steps[np.asarray(breaks)[1:]] = 0
+    return np.concatenate(([0], np.cumsum(steps)))
+
+
+def interpolate_depth(sample_t, pulse_t, pulse_n, reset_t, depth_increment_m):
+    """
+    Depth (m) at each sample time.
+
+    sample_t, pulse_t and reset_t are sorted times in one unit. pulse_n is the
+    number of depth pulses counted at each pulse time. A reset at time r sets
+    depth to 0 at r, as the firmware's reset switch does; depth then ramps
+    linearly to the value at the next pulse.
+    """
+    sample_t = np.asarray(sample_t, dtype=np.float64)
+    pulse_t = np.asarray(pulse_t, dtype=np.float64)
+    reset_t = np.asarray(reset_t, dtype=np.float64)
+
+    # Odometer: pulses counted since the start, ignoring resets
+    odometer = np.cumsum(np.asarray(pulse_n, dtype=np.float64))
+
+    # Pulse count at each reset, used as the zero of the depth that follows it
+    before = np.searchsorted(pulse_t, reset_t, side='right')
+    if len(odometer):
+        base = np.where(before > 0, odometer[np.maximum(before - 1, 0)], 0.0)
+    else:
+        base = np.zeros(len(reset_t))
+
+    # Resets are also interpolation knots, so depth ramps up from 0 at the reset
+    # instead of from wherever the odometer had got to between pulses
+    knot_t = np.concatenate((pulse_t, reset_t))
+    knot_v = np.concatenate((odometer, base))
+    order = np.argsort(knot_t, kind='stable')
+    knot_t, knot_v = knot_t[order], knot_v[order]
+
+    if len(knot_t):
+        ticks = np.interp(sample_t, knot_t, knot_v, left=0.0)
+    else:
+        ticks = np.zeros(len(sample_t))
+
+    # Subtract the odometer value at the most recent reset before each sample
+    last_reset = np.searchsorted(reset_t, sample_t, side='right') - 1
+    if len(base):
+        ticks -= np.where(last_reset >= 0, base[np.maximum(last_reset, 0)], 0.0)
+    return ticks * depth_increment_m
+
+
+def load_samples(filepath):
+    """
+    Split a sample stream into its samples and events.
+
+    Returns (header dict, dict of arrays): 't_us' and 'counts' of the samples,
+    'pulse_t_us' and 'pulse_n' of the depth pulse events, and 'reset_t_us'.
+    Times are microseconds since the earliest record, and every array is in
+    time order.
+    """
+    header, records = load_segments(filepath)
+    if header['magic'] != SAMPLE_MAGIC:
+        raise ValueError("Not a ChromeBox sample stream")
+
+    # Stable, so a pulse event stays after the sample it was stamped with
+    t_us = unwrap_ticks(records['tick'], (records['flags'] & FLAG_STREAM_START) != 0)
+    order = np.argsort(t_us, kind='stable')
+    records = records[order]
+    t_us = t_us[order] - (t_us[order[0]] if len(order) else 0)
+
+    flags = records['flags']
+    pulse = (flags & FLAG_DEPTH_PULSE) != 0
+    reset = (flags & FLAG_DEPTH_RESET) != 0
+    sample = ~(pulse | reset | ((flags & FLAG_STREAM_START) != 0))
+    return header, {
+        't_us': t_us[sample],
+        'counts': records['counts'][sample],
+        'pulse_t_us': t_us[pulse],
+        'pulse_n': records['counts'][pulse],
+        'reset_t_us': t_us[reset],
+    }
+
+
+def sample_depth(filepath):
+    """(header, time in s, depth in m, counts) for every sample of a stream."""
+    header, s = load_samples(filepath)
+    depth = interpolate_depth(s['t_us'], s['pulse_t_us'], s['pulse_n'], s['reset_t_us'],
+                              header['depth_increment_m'])
+    return header, s['t_us'] / 1e6, depth, s['counts']
+
+
+def load_sample_depth_counts(filepath):
+    """Depth (float64, m) and counts (float32) of every sample, like ChromeLog.load_depth_counts()."""
+    _, _, depth, counts = sample_depth(filepath)
+    return depth, counts.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('stream', help='a chromeSamples_NNNN.bin segment written in CONTINUOUS mode')
+    parser.add_argument('-o', '--output', help='write Time(s),Depth(m),# Counts per sample to this CSV')
+    args = parser.parse_args()
+
+    header, s = load_samples(args.stream)
+    _, t, depth, counts = sample_depth(args.stream)
+    duration = t[-1] if len(t) else 0.0
+    print('%d samples over %.1f s (%.0f Hz), %d depth pulses, %d resets' %
+          (len(t), duration, (len(t) - 1) / duration if duration else 0.0,
+           int(s['pulse_n'].sum()), len(s['reset_t_us'])))
+    if len(depth):
+        print('Depth %.3f .. %.3f m, %.1f samples per depth increment' %
+              (depth.min(), depth.max(), len(t) / max(int(s['pulse_n'].sum()), 1)))
+
+    if args.output:
+        pd.DataFrame({TIME_COLUMN: t, DEPTH_COLUMN: depth, COUNTS_COLUMN: counts}).to_csv(
+            args.output, index=False, float_format='%.6f')
+        print('Wrote %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,455 @@
+"""
+Live telemetry from the uphole Pico over USB serial.
+
+With TELEMETRY = True in uphole/chromeBox.py the firmware streams every depth
+record as a 15-byte frame (layout defined in uphole/telemetry.py and mirrored
+here). This module decodes that stream incrementally, appends the records to a
+binary depth log in bulk (readable by ChromeLog.read_log and the viewer) and
+feeds a live view.
+
+    python ChromeTelemetry.py receive /dev/ttyACM0 -o run.bin
+    python ChromeTelemetry.py standin --rate 2000       # fake Pico on a pty
+    python ChromeTelemetry.py demo --rate 5000 --seconds 10
+
+Reading is done with asyncio on the raw file descriptor, so this runs on Linux
+and macOS. The reader only ever copies bytes off the port; decoding is
+vectorised with numpy and file writes run on a worker thread, so the port is
+drained promptly even at the highest pulse rates.
+
+The measurement time stamps (Pico ticks_ms) are written next to the log as
+<log>.t_ms, one little-endian uint32 per record.
+
+Frames carry raw counts only. Pass the Pico's CALIBRATION_POINTS with
+--calibration (e.g. --calibration 1000:0.051,60000:3.021) so the recorded log
+converts counts to volts the same way the firmware does.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import pty
+import struct
+import time
+import tty
+
+import numpy as np
+
+from ChromeLog import FLAG_VALID, RECORD_DTYPE, pack_header
+
+# Must match uphole/telemetry.py
+FRAME_SYNC = b'\xa5\x5a'
+FRAME_FORMAT = '<2sBiHIH'
+FRAME_SIZE = struct.calcsize(FRAME_FORMAT)
+PAYLOAD_OFFSET = 2
+CRC_OFFSET = 13
+CRC_POLY = 0x1021
+CRC_INIT = 0xFFFF
+
+FRAME_DTYPE = np.dtype([
+    ('sync', 'V2'),
+    ('seq', 'u1'),
+    ('tick', '<i4'),     # Depth tick index
+    ('counts', '<u2'),   # Raw ADC counts
+    ('t_ms', '<u4'),     # Pico time.ticks_ms() of the measurement
+    ('crc', '<u2'),
+])
+
+# Header constants for logs recorded from the stream (uphole/chromeBox.py defaults)
+LOAD_RESISTOR_OHMS = 150.0
+ADC_MAX_VOLTAGE = 3.3
+DEPTH_INCREMENT_M = 0.025
+ADC_MAX_READING = 0xFFFF
+
+TIMES_SUFFIX = '.t_ms'
+READ_SIZE = 65536
+FLUSH_INTERVAL_S = 0.5
+VIEW_INTERVAL_S = 0.5
+
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC_POLY) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc16(data):
+    crc = CRC_INIT
+    for b in data:
+        crc = ((crc << 8) & 0xFFFF) ^ int(CRC_TABLE[(crc >> 8) ^ b])
+    return crc
+
+
+def crc16_rows(rows):
+    """CRC of the payload of every row of an (n, FRAME_SIZE) uint8 array."""
+    crc = np.full(len(rows), CRC_INIT, dtype=np.uint32)
+    for col in range(PAYLOAD_OFFSET, CRC_OFFSET):
+        crc = ((crc << 8) & 0xFFFF) ^ CRC_TABLE[(crc >> 8) ^ rows[:, col]]
+    return crc
+
+
+def encode_frame(seq, tick, counts, t_ms):
+    payload = struct.pack('<BiHI', seq & 0xFF, tick, counts, t_ms & 0xFFFFFFFF)
+    return FRAME_SYNC + payload + struct.pack('<H', crc16(payload))
+
+
+class FrameDecoder:
+    """
+    Incremental decoder: feed() any chunk of bytes from the port and get back
+    the complete, CRC-checked frames as a FRAME_DTYPE array. Bytes that are not
+    part of a valid frame (console text, line noise) are skipped, and a partial
+    frame at the end of a chunk is kept for the next call.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._last_seq = None
+        self.frames = 0          # Valid frames decoded
+        self.crc_errors = 0      # Sync patterns whose CRC did not match
+        self.lost = 0            # Frames missing according to the sequence numbers
+        self.skipped_bytes = 0   # Bytes outside valid frames
+
+    def feed(self, data):
+        self._buf += data
+        buf = np.frombuffer(self._buf, dtype=np.uint8)
+        n = len(buf)
+        if n < FRAME_SIZE:
+            return np.zeros(0, dtype=FRAME_DTYPE)
+
+        # Every position where a whole frame could start with the sync bytes
+        last_start = n - FRAME_SIZE
+        cand = np.flatnonzero((buf[:last_start + 1] == FRAME_SYNC[0]) &
+                              (buf[1:last_start + 2] == FRAME_SYNC[1]))
+        rows = buf[cand[:, None] + np.arange(FRAME_SIZE)]
+        received = rows[:, CRC_OFFSET].astype(np.uint32) | (rows[:, CRC_OFFSET + 1].astype(np.uint32) << 8)
+        ok = crc16_rows(rows) == received
+        starts = cand[ok]
+
+        # A sync pattern inside a frame can pass the CRC by chance; keep the earlier frame
+        if starts.size > 1 and (np.diff(starts) < FRAME_SIZE).any():
+            keep = [starts[0]]
+            for s in starts[1:]:
+                if s >= keep[-1] + FRAME_SIZE:
+                    keep.append(s)
+            starts = np.array(keep, dtype=cand.dtype)
+
+        if starts.size:
+            inside = np.searchsorted(starts, cand, side='right') - 1
+            in_frame = (inside >= 0) & (cand < starts[np.maximum(inside, 0)] + FRAME_SIZE)
+            consumed = int(starts[-1]) + FRAME_SIZE
+        else:
+            in_frame = np.zeros(len(cand), dtype=bool)
+            consumed = 0
+        self.crc_errors += int((~ok & ~in_frame).sum())
+
+        # Anything past the last frame that could still begin a frame is kept for next time
+        keep_from = max(consumed, last_start + 1)
+        self.skipped_bytes += keep_from - starts.size * FRAME_SIZE
+        frames = np.frombuffer(buf[starts[:, None] + np.arange(FRAME_SIZE)].tobytes(), dtype=FRAME_DTYPE)
+        del buf
+        del self._buf[:keep_from]
+
+        if frames.size:
+            seq = frames['seq'].astype(np.int32)
+            gaps = (np.diff(seq) - 1) % 256
+            if self._last_seq is not None:
+                self.lost += (seq[0] - self._last_seq - 1) % 256
+            self.lost += int(gaps.sum())
+            self._last_seq = int(seq[-1])
+            self.frames += frames.size
+        return frames
+
+
+class LogRecorder:
+    """Appends decoded frames to a binary depth log (plus time stamps) in bulk."""
+
+    def __init__(self, path, load_resistor_ohms=LOAD_RESISTOR_OHMS, adc_max_voltage=ADC_MAX_VOLTAGE,
+                 depth_increment_m=DEPTH_INCREMENT_M, adc_max_reading=ADC_MAX_READING, calibration=None):
+        self.path = path
+        self.written = 0
+        self._log = open(path, 'wb')
+        self._times = open(path + TIMES_SUFFIX, 'wb')
+        self._log.write(pack_header(load_resistor_ohms, adc_max_voltage, depth_increment_m, adc_max_reading,
+                                    calibration))
+
+    def write(self, frames):
+        records = np.empty(len(frames), dtype=RECORD_DTYPE)
+        records['tick'] = frames['tick']
+        records['counts'] = frames['counts']
+        records['flags'] = FLAG_VALID
+        self._log.write(records.tobytes())
+        self._times.write(frames['t_ms'].astype('<u4').tobytes())
+        self._log.flush()
+        self._times.flush()
+        self.written += len(frames)
+
+    def close(self):
+        self._log.close()
+        self._times.close()
+
+
+class ConsoleView:
+    """Live view on the terminal: one status line, refreshed a few times per second."""
+
+    def __init__(self, depth_increment_m=DEPTH_INCREMENT_M, interval_s=VIEW_INTERVAL_S):
+        self.depth_increment_m = depth_increment_m
+        self.interval_s = interval_s
+        self._last = time.monotonic()
+        self._frames_at_last = 0
+        self.latest = None
+
+    def __call__(self, frames, receiver):
+        if frames.size:
+            self.latest = frames[-1]
+        now = time.monotonic()
+        if now - self._last < self.interval_s or self.latest is None:
+            return
+        decoder = receiver.decoder
+        rate = (decoder.frames - self._frames_at_last) / (now - self._last)
+        self._last, self._frames_at_last = now, decoder.frames
+        print('\rdepth %8.3f m  counts %5d  %7.0f frames/s  total %d  lost %d  crc errors %d   ' %
+              (self.latest['tick'] * self.depth_increment_m, self.latest['counts'], rate,
+               decoder.frames, decoder.lost, decoder.crc_errors), end='', flush=True)
+
+
+def open_port(port):
+    """Open a serial device (or pty) for non-blocking raw reads."""
+    fd = os.open(port, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    if os.isatty(fd):
+        tty.setraw(fd)
+    return fd
+
+
+class TelemetryReceiver:
+    """
+    asyncio receiver. The reader callback only moves bytes from the port into a
+    list; a separate task decodes whatever has arrived, hands each batch to
+    on_batch(frames, receiver) and queues it for the recorder, which writes on a
+    worker thread every FLUSH_INTERVAL_S.
+    """
+
+    def __init__(self, port, recorder=None, on_batch=None, flush_interval_s=FLUSH_INTERVAL_S):
+        self.port = port
+        self.recorder = recorder
+        self.on_batch = on_batch
+        self.flush_interval_s = flush_interval_s
+        self.decoder = FrameDecoder()
+        self.bytes_read = 0
+        self._chunks = []
+        self._data_ready = None
+        self._pending = []
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)   # One writer keeps file order
+
+    def _on_readable(self, fd):
+        try:
+            data = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''   # Device went away (EIO on a closed pty)
+        if not data:
+            self._closed = True
+        else:
+            self.bytes_read += len(data)
+            self._chunks.append(data)
+        self._data_ready.set()
+
+    async def _flush(self, loop):
+        if self._pending and self.recorder is not None:
+            frames = np.concatenate(self._pending)
+            self._pending = []
+            await loop.run_in_executor(self._executor, self.recorder.write, frames)
+        else:
+            self._pending = []
+
+    async def run(self, seconds=None):
+        """Receive until the port closes, `seconds` pass, or the task is cancelled."""
+        loop = asyncio.get_running_loop()
+        self._data_ready = asyncio.Event()
+        self._closed = False
+        fd = open_port(self.port)
+        loop.add_reader(fd, self._on_readable, fd)
+        deadline = None if seconds is None else loop.time() + seconds
+        last_flush = loop.time()
+        try:
+            while not self._closed:
+                timeout = self.flush_interval_s
+                if deadline is not None:
+                    timeout = min(timeout, deadline - loop.time())
+                    if timeout <= 0:
+                        break
+                try:
+                    await asyncio.wait_for(self._data_ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._data_ready.clear()
+
+                chunks, self._chunks = self._chunks, []
+                frames = self.decoder.feed(b''.join(chunks)) if chunks else np.zeros(0, dtype=FRAME_DTYPE)
+                if frames.size:
+                    self._pending.append(frames)
+                if self.on_batch is not None:
+                    self.on_batch(frames, self)
+                if loop.time() - last_flush >= self.flush_interval_s:
+                    last_flush = loop.time()
+                    await self._flush(loop)
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+            await self._flush(loop)
+            self._executor.shutdown(wait=True)
+        return self.decoder
+
+
+class PtyStandIn:
+    """
+    Stand-in for the uphole Pico on a pseudo-terminal, for testing the receiver
+    without hardware. Open `.port` like the real /dev/ttyACM device.
+
+    Frames are generated in real time at `rate_hz`, written in batches every
+    `send_interval_s` like the firmware's send timer. Like the firmware, it never
+    blocks: when the pty buffer is full the frames wait, and past `capacity`
+    they are dropped and counted.
+    """
+
+    def __init__(self, rate_hz=1000.0, counts=None, text_every=0, send_interval_s=0.02, capacity=512):
+        """
+        Arguments:
+        - rate_hz: depth pulse rate
+        - counts: function(tick) giving the ADC counts (default: a slow ramp)
+        - text_every: interleave a console text line every N frames (0 = never)
+        """
+        self.rate_hz = rate_hz
+        self.counts = counts or (lambda tick: 20000 + (tick * 7) % 20000)
+        self.text_every = text_every
+        self.send_interval_s = send_interval_s
+        self.capacity = capacity
+        self.master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self._slave)
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.stalls = 0
+        self._backlog = b''
+
+    async def run(self, seconds):
+        start = time.monotonic()
+        tick = 0
+        while True:
+            elapsed = time.monotonic() - start
+            if elapsed >= seconds:
+                break
+            due = int(elapsed * self.rate_hz)
+            parts = []
+            while tick < due:
+                tick += 1
+                parts.append(encode_frame(tick, tick, self.counts(tick), int((start + tick / self.rate_hz) * 1000)))
+                if self.text_every and tick % self.text_every == 0:
+                    parts.append(b'ChromeBox is in action!\r\n')
+            self._send(b''.join(parts))
+            await asyncio.sleep(self.send_interval_s)
+        self._send(b'')
+        return tick
+
+    def _send(self, data):
+        data = self._backlog + data
+        if len(data) > self.capacity * FRAME_SIZE:
+            self.dropped += (len(data) - self.capacity * FRAME_SIZE) // FRAME_SIZE
+            data = data[-self.capacity * FRAME_SIZE:]
+        try:
+            n = os.write(self.master, data) if data else 0
+        except BlockingIOError:
+            n = 0
+        if n < len(data):
+            self.stalls += 1
+        self.bytes_sent += n
+        self._backlog = data[n:]
+
+    def close(self):
+        os.close(self.master)
+        os.close(self._slave)
+
+
+def parse_calibration(text):
+    """'counts:volts,counts:volts,...' -> [(counts, volts), ...] (argparse type)."""
+    try:
+        points = [(int(c), float(v)) for c, v in (p.split(':') for p in text.split(','))]
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected counts:volts,counts:volts,... not %r' % text)
+    if len(points) < 2:
+        raise argparse.ArgumentTypeError('need at least two calibration points')
+    return points
+
+
+async def _demo(args):
+    standin = PtyStandIn(args.rate, text_every=args.text_every)
+    recorder = LogRecorder(args.output) if args.output else None
+    receiver = TelemetryReceiver(standin.port, recorder, ConsoleView())
+    receive = asyncio.ensure_future(receiver.run(args.seconds + 1.0))
+    generated = await standin.run(args.seconds)
+    decoder = await receive
+    standin.close()
+    if recorder is not None:
+        recorder.close()
+    print()
+    print('Generated %d frames, pty stalls %d, dropped %d; received %d, lost %d, crc errors %d' %
+          (generated, standin.stalls, standin.dropped, decoder.frames, decoder.lost, decoder.crc_errors))
+
+
+async def _standin(args):
+    standin = PtyStandIn(args.rate, text_every=args.text_every)
+    print('Stand-in streaming on %s' % standin.port)
+    await standin.run(args.seconds)
+    standin.close()
+
+
+async def _receive(args):
+    recorder = LogRecorder(args.output, depth_increment_m=args.depth_increment,
+                           calibration=args.calibration) if args.output else None
+    receiver = TelemetryReceiver(args.port, recorder, ConsoleView(args.depth_increment))
+    try:
+        decoder = await receiver.run(args.seconds)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    print()
+    print('Received %d frames, lost %d, crc errors %d' % (decoder.frames, decoder.lost, decoder.crc_errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    receive = sub.add_parser('receive', help='record and display the stream from a serial port')
+    receive.add_argument('port')
+    receive.add_argument('-o', '--output', help='binary depth log to write')
+    receive.add_argument('--seconds', type=float, help='stop after this long')
+    receive.add_argument('--depth-increment', type=float, default=DEPTH_INCREMENT_M)
+    receive.add_argument('--calibration', type=parse_calibration,
+                         help="the Pico's CALIBRATION_POINTS as counts:volts,counts:volts,...")
+
+    for name, help_text in (('standin', 'stream fake frames on a pty'),
+                            ('demo', 'stand-in and receiver together, reporting losses')):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('--rate', type=float, default=1000.0, help='depth pulses per second')
+        p.add_argument('--seconds', type=float, default=10.0)
+        p.add_argument('--text-every', type=int, default=0, help='interleave console text every N frames')
+        if name == 'demo':
+            p.add_argument('-o', '--output', help='binary depth log to write')
+
+    args = parser.parse_args()
+    try:
+        asyncio.run({'receive': _receive, 'standin': _standin, 'demo': _demo}[args.command](args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
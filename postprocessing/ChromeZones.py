@@ -0,0 +1,128 @@
+"""
+Detection of UVIF zones (depth intervals of low counts) in depth logs.
+
+A zone opens where the counts drop below `threshold`. It closes only once
+they rise above `threshold + hysteresis`, so noise around the threshold does
+not split one zone into many. Zones thinner than `min_thickness_m` are
+dropped. Use below=False to look for intervals of high counts instead.
+
+    detector = ZoneDetector(threshold=30000, hysteresis=500, min_thickness_m=0.05)
+    zones = detector.detect(depth, counts)      # DataFrame, one row per zone
+    export_zones(zones, 'zones.csv')            # or .json
+
+Detection is a few vectorised passes over the log (hysteresis state by
+forward-filling the last decisive sample, then run-length encoding), so it
+runs in linear time on logs of millions of samples.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_THRESHOLD = 30000    # Counts below this open a zone
+DEFAULT_HYSTERESIS = 500     # Counts above threshold + hysteresis close it
+DEFAULT_MIN_THICKNESS_M = 0.0
+
+ZONE_COLUMNS = ['top_m', 'bottom_m', 'thickness_m', 'mean_counts', 'peak_counts', 'samples',
+                'first_index', 'last_index']
+
+
+class ZoneDetector:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, hysteresis=DEFAULT_HYSTERESIS,
+                 min_thickness_m=DEFAULT_MIN_THICKNESS_M, below=True):
+        if hysteresis < 0:
+            raise ValueError("Hysteresis must not be negative")
+        if min_thickness_m < 0:
+            raise ValueError("Minimum thickness must not be negative")
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.min_thickness_m = min_thickness_m
+        self.below = below
+
+    def state(self, counts):
+        """Boolean array: True for samples inside a zone (before thickness filtering)."""
+        counts = np.asarray(counts)
+        if self.below:
+            enter = counts < self.threshold
+            leave = counts > self.threshold + self.hysteresis
+        else:
+            enter = counts > self.threshold
+            leave = counts < self.threshold - self.hysteresis
+
+        # Each sample takes the state of the last sample that entered or left;
+        # samples inside the hysteresis band carry it forward. Before the
+        # first decisive sample the log is outside any zone.
+        decisive = enter | leave
+        last = np.where(decisive, np.arange(len(counts)), -1)
+        np.maximum.accumulate(last, out=last)
+        inside = enter[np.maximum(last, 0)]
+        inside[last < 0] = False
+        return inside
+
+    def detect(self, depth, counts):
+        """
+        Zones of a log as a DataFrame with ZONE_COLUMNS, in log order.
+
+        peak_counts is the most extreme value in the zone: the minimum for
+        low-count zones (below=True), the maximum otherwise.
+        """
+        depth = np.asarray(depth)
+        counts = np.asarray(counts)
+        inside = self.state(counts).astype(np.int8)
+
+        # Run-length encode the state: zone k covers samples starts[k] .. ends[k]
+        edges = np.diff(np.r_[np.int8(0), inside, np.int8(0)])
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        if len(starts) == 0:
+            return pd.DataFrame({c: np.zeros(0) for c in ZONE_COLUMNS})
+
+        # Per-zone reductions: keep only the zone samples, then each zone is one
+        # contiguous group for reduceat
+        in_zone = inside.astype(bool)
+        d, c = depth[in_zone], counts[in_zone].astype(np.float64)
+        samples = ends - starts + 1
+        bounds = np.r_[0, np.cumsum(samples)[:-1]]
+
+        top = np.minimum.reduceat(d, bounds)
+        bottom = np.maximum.reduceat(d, bounds)
+        mean = np.add.reduceat(c, bounds) / samples
+        peak = (np.minimum if self.below else np.maximum).reduceat(c, bounds)
+
+        zones = pd.DataFrame({
+            'top_m': top,
+            'bottom_m': bottom,
+            'thickness_m': bottom - top,
+            'mean_counts': mean,
+            'peak_counts': peak,
+            'samples': samples,
+            'first_index': starts,
+            'last_index': ends,
+        }, columns=ZONE_COLUMNS)
+        if self.min_thickness_m > 0:
+            zones = zones[zones['thickness_m'] >= self.min_thickness_m].reset_index(drop=True)
+        return zones
+
+    def describe(self):
+        side = 'below' if self.below else 'above'
+        return '%s %g counts (hysteresis %g, min %.3f m)' % (side, self.threshold, self.hysteresis,
+                                                              self.min_thickness_m)
+
+
+def zone_mask(zones, depth):
+    """True where a depth lies inside one of the zones (e.g. plot points to shade)."""
+    depth = np.asarray(depth)
+    if len(zones) == 0:
+        return np.zeros(depth.shape, dtype=bool)
+    order = np.argsort(zones['top_m'].to_numpy(), kind='stable')
+    tops = zones['top_m'].to_numpy()[order]
+    # Running maximum, so a zone that ends deeper than a later-starting one still counts
+    bottoms = np.maximum.accumulate(zones['bottom_m'].to_numpy()[order])
+    k = np.searchsorted(tops, depth, side='right') - 1
+    return (k >= 0) & (depth <= bottoms[np.maximum(k, 0)])
+
+
+def export_zones(zones, path):
+    """Write a zone table as CSV, or as JSON records if path ends in .json."""
+    if path.lower().endswith('.json'):
+        zones.to_json(path, orient='records', indent=2)
+    else:
+        zones.to_csv(path, index=False)   # Full precision, as in JSON; depths past 1000 m need 7+ digits
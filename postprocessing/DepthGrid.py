@@ -0,0 +1,96 @@
+"""
+Resampling of depth logs onto a uniform depth grid.
+
+Grid point k sits at origin + k * step and collects the samples within half a
+step of it. The default step is the firmware's DEPTH_INCREMENT_M, so every
+record of a depth log falls exactly on its own grid point. Full-resolution
+sample streams (ChromeSamples) are averaged down to the same grid, and logs
+of repeat runs can then be compared point by point.
+
+    grid = resample(depth, counts)             # 0.025 m grid
+    grid = resample(depth, counts, step=0.1)   # coarser, user-chosen grid
+    grid.depth, grid.mean, grid.min, grid.max, grid.n
+
+All statistics are computed with NumPy reductions over the whole log at once.
+"""
+import numpy as np
+
+DEFAULT_STEP_M = 0.025       # Must match DEPTH_INCREMENT_M in uphole/chromeBox.py
+
+
+def grid_index(depth, step=DEFAULT_STEP_M, origin=0.0):
+    """Index of the nearest grid point for each depth (int64)."""
+    return np.floor((np.asarray(depth, dtype=np.float64) - origin) / step + 0.5).astype(np.int64)
+
+
+class GriddedLog:
+    """
+    Binned statistics of one log on grid points first .. first + len - 1.
+
+    Grid points without samples have n == 0 and NaN mean, min and max.
+    """
+
+    def __init__(self, step, origin, first, n, mean, cmin, cmax):
+        self.step = step
+        self.origin = origin
+        self.first = first
+        self.n = n
+        self.mean = mean
+        self.min = cmin
+        self.max = cmax
+
+    def __len__(self):
+        return len(self.n)
+
+    @property
+    def index(self):
+        """Grid index of every point."""
+        return np.arange(self.first, self.first + len(self.n), dtype=np.int64)
+
+    @property
+    def depth(self):
+        return self.origin + self.index * self.step
+
+    def occupied(self):
+        """Copy with only the grid points that have samples: (index, n, mean, min, max)."""
+        keep = self.n > 0
+        return self.index[keep], self.n[keep], self.mean[keep], self.min[keep], self.max[keep]
+
+
+def resample(depth, counts, step=DEFAULT_STEP_M, origin=0.0):
+    """
+    Bin a log onto a uniform depth grid.
+
+    Works for any depth order: logs with depth resets or a winch that went
+    back up simply contribute more samples to the grid points they revisit.
+    """
+    if step <= 0:
+        raise ValueError("Grid step must be positive")
+    counts = np.asarray(counts)
+    if len(counts) == 0:
+        empty = np.zeros(0)
+        return GriddedLog(step, origin, 0, np.zeros(0, dtype=np.int64), empty, empty, empty)
+
+    index = grid_index(depth, step, origin)
+    first = int(index.min())
+    local = index - first
+    size = int(local.max()) + 1
+
+    n = np.bincount(local, minlength=size)
+    total = np.bincount(local, weights=counts, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+
+    # Min/max per grid point: group samples by point, then reduce each group
+    order = np.argsort(local, kind='stable') if (np.diff(local) < 0).any() else None
+    grouped = local if order is None else local[order]
+    values = counts if order is None else counts[order]
+    starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    points = grouped[starts]
+
+    cmin = np.full(size, np.nan)
+    cmax = np.full(size, np.nan)
+    cmin[points] = np.minimum.reduceat(values, starts)
+    cmax[points] = np.maximum.reduceat(values, starts)
+    mean[n == 0] = np.nan
+    return GriddedLog(step, origin, first, n, mean, cmin, cmax)
@@ -0,0 +1,169 @@
+"""
+Multi-resolution min/max decimation of a depth log for plotting.
+
+Level 0 is the raw log; each level above it halves the number of buckets,
+keeping the minimum and maximum counts of every bucket together with the
+depths at which the bucket starts and ends. All levels together take about as
+much memory as the log itself.
+
+view() picks the coarsest level that still gives at least one bucket per
+screen pixel for the visible depth range and returns an envelope of at most
+about 2 * max_buckets points. Peaks are therefore never lost however far the
+plot is zoomed out, and the cost of a redraw depends on the screen size, not
+on the length of the log.
+
+StreamingEnvelope builds the same kind of min/max envelope incrementally for
+a log that is still growing, in fixed memory.
+"""
+import numpy as np
+
+MIN_LEVEL_BUCKETS = 1024     # Stop adding levels once a level is this small
+
+
+class DepthPyramid:
+    def __init__(self, depth, counts):
+        self.depth = np.asarray(depth)
+        self.counts = np.asarray(counts)
+        self.size = len(self.depth)
+
+        # Depth resets (reset switch) make the log non-monotonic; views then span the whole log
+        self.monotonic = self.size < 2 or bool((np.diff(self.depth) >= 0).all())
+
+        # levels[k] = (counts_min, counts_max, depth_first, depth_last), each bucket covering 2**k samples
+        self.levels = [(self.counts, self.counts, self.depth, self.depth)]
+        while len(self.levels[-1][0]) > MIN_LEVEL_BUCKETS:
+            self.levels.append(self._halve(*self.levels[-1]))
+
+    @staticmethod
+    def _halve(cmin, cmax, dfirst, dlast):
+        starts = np.arange(0, len(cmin), 2)
+        ends = np.minimum(starts + 1, len(cmin) - 1)
+        return (np.minimum.reduceat(cmin, starts), np.maximum.reduceat(cmax, starts),
+                dfirst[starts], dlast[ends])
+
+    def index_range(self, depth_lo, depth_hi):
+        """Sample index range [i0, i1) covering depths depth_lo..depth_hi."""
+        if not self.monotonic:
+            return 0, self.size
+        if depth_lo > depth_hi:
+            depth_lo, depth_hi = depth_hi, depth_lo
+        i0 = max(int(np.searchsorted(self.depth, depth_lo, side='left')) - 1, 0)
+        i1 = min(int(np.searchsorted(self.depth, depth_hi, side='right')) + 1, self.size)
+        return i0, i1
+
+    def view(self, depth_lo=None, depth_hi=None, max_buckets=2000):
+        """
+        Return (counts, depth) arrays to plot for the given depth range (default:
+        the whole log), decimated to at most about 2 * max_buckets points.
+        """
+        if depth_lo is None or depth_hi is None:
+            i0, i1 = 0, self.size
+        else:
+            i0, i1 = self.index_range(depth_lo, depth_hi)
+        n = i1 - i0
+        if n <= max_buckets:
+            return self.counts[i0:i1], self.depth[i0:i1]
+
+        level = min(int(np.ceil(np.log2(n / max_buckets))), len(self.levels) - 1)
+        cmin, cmax, dfirst, dlast = self.levels[level]
+        b0, b1 = i0 >> level, min((i1 - 1 >> level) + 1, len(cmin))
+
+        # Two points per bucket: its minimum at the start depth and its maximum at the end depth
+        x = np.empty(2 * (b1 - b0), dtype=cmin.dtype)
+        y = np.empty(2 * (b1 - b0), dtype=dfirst.dtype)
+        x[0::2], x[1::2] = cmin[b0:b1], cmax[b0:b1]
+        y[0::2], y[1::2] = dfirst[b0:b1], dlast[b0:b1]
+        return x, y
+
+
+class StreamingEnvelope:
+    """
+    Min/max envelope of a growing log in a fixed number of buckets.
+
+    append() folds new samples into the buckets. When they are all used, pairs
+    of neighbouring buckets are merged and each bucket from then on covers twice
+    as many samples. Ingest cost is proportional to the new samples and
+    points() always returns at most 2 * max_buckets points, so following a log
+    for hours costs the same per frame as following it for minutes.
+    """
+
+    def __init__(self, max_buckets=2048):
+        self.max_buckets = max_buckets
+        self.cmin = np.empty(max_buckets, dtype=np.float32)
+        self.cmax = np.empty(max_buckets, dtype=np.float32)
+        self.dfirst = np.empty(max_buckets, dtype=np.float64)
+        self.dlast = np.empty(max_buckets, dtype=np.float64)
+        self.clear()
+
+    def clear(self):
+        self.buckets = 0          # Buckets in use
+        self.bucket_size = 1      # Samples per complete bucket
+        self.last_count = 0       # Samples in the last bucket so far
+        self.samples = 0
+
+    def _merge_pairs(self):
+        nb = self.buckets
+        pairs = nb // 2
+        self.cmin[:pairs] = self.cmin[:2 * pairs].reshape(pairs, 2).min(axis=1)
+        self.cmax[:pairs] = self.cmax[:2 * pairs].reshape(pairs, 2).max(axis=1)
+        self.dfirst[:pairs] = self.dfirst[:2 * pairs:2]
+        self.dlast[:pairs] = self.dlast[1:2 * pairs:2]
+        if nb % 2:
+            # The odd last bucket carries over on its own and stays partial
+            for arr in (self.cmin, self.cmax, self.dfirst, self.dlast):
+                arr[pairs] = arr[nb - 1]
+        else:
+            self.last_count += self.bucket_size
+        self.buckets = (nb + 1) // 2
+        self.bucket_size *= 2
+
+    def append(self, depth, counts):
+        n = len(depth)
+        self.samples += n
+        i = 0
+        while i < n:
+            size = self.bucket_size
+            b = self.buckets
+            if b and self.last_count < size:
+                # Top up the partial last bucket
+                k = min(size - self.last_count, n - i)
+                self.cmin[b - 1] = min(self.cmin[b - 1], counts[i:i + k].min())
+                self.cmax[b - 1] = max(self.cmax[b - 1], counts[i:i + k].max())
+                self.dlast[b - 1] = depth[i + k - 1]
+                self.last_count += k
+                i += k
+                continue
+            if b == self.max_buckets:
+                self._merge_pairs()
+                continue
+
+            # Whole new buckets, as many as fit
+            m = min((n - i) // size, self.max_buckets - b)
+            if m:
+                c = counts[i:i + m * size].reshape(m, size)
+                d = depth[i:i + m * size].reshape(m, size)
+                self.cmin[b:b + m] = c.min(axis=1)
+                self.cmax[b:b + m] = c.max(axis=1)
+                self.dfirst[b:b + m] = d[:, 0]
+                self.dlast[b:b + m] = d[:, -1]
+                self.buckets += m
+                self.last_count = size
+                i += m * size
+            else:
+                # Less than a bucket left: open a partial one
+                self.cmin[b] = counts[i:].min()
+                self.cmax[b] = counts[i:].max()
+                self.dfirst[b] = depth[i]
+                self.dlast[b] = depth[n - 1]
+                self.buckets += 1
+                self.last_count = n - i
+                i = n
+
+    def points(self):
+        """(counts, depth) envelope points of everything appended so far."""
+        nb = self.buckets
+        x = np.empty(2 * nb, dtype=self.cmin.dtype)
+        y = np.empty(2 * nb, dtype=self.dfirst.dtype)
+        x[0::2], x[1::2] = self.cmin[:nb], self.cmax[:nb]
+        y[0::2], y[1::2] = self.dfirst[:nb], self.dlast[:nb]
+        return x, y
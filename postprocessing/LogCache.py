@@ -0,0 +1,179 @@
+"""
+Sidecar cache of parsed depth logs.
+
+The first time a CSV log is opened, its typed depth and counts columns are
+saved as .npy files in a per-user cache directory. Later opens memory-map
+those files instead of parsing the CSV again.
+
+Entries are keyed by the log's absolute path, size, mtime and a content
+hash. A changed source file therefore misses the cache and replaces its
+stale entry. A segmented run is one entry, keyed by its first segment
+(ChromeLog.run_path()) and the sizes, mtimes and hashes of all its
+segments. The cache is size-bounded: least recently used entries are
+evicted once it grows past max_bytes.
+
+Binary logs are not cached, because ChromeLog already memory-maps them.
+Continuous sample streams are, so their depth interpolation runs only once.
+
+The cache directory and size limit can be set with the CHROMEBOX_CACHE_DIR and
+CHROMEBOX_CACHE_MAX_MB environment variables.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from ChromeLog import is_binary_log, load_depth_counts, segment_paths
+
+CACHE_DIR_ENV = 'CHROMEBOX_CACHE_DIR'
+CACHE_MAX_MB_ENV = 'CHROMEBOX_CACHE_MAX_MB'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# The content hash covers the head, the tail and evenly spaced blocks of the
+# file, so it stays fast on multi-gigabyte logs while still catching edits
+# that keep the size and mtime.
+HASH_BLOCK_SIZE = 1024 * 1024
+HASH_BLOCKS = 16
+
+CACHE_VERSION = 2
+META_FILE = 'meta.json'
+DEPTH_FILE = 'depth.npy'
+COUNTS_FILE = 'counts.npy'
+
+
+def user_cache_base():
+    """Per-user directory for ChromeBox host-side caches (log cache, run index)."""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'chromebox')
+
+
+def default_cache_dir():
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    return os.path.join(user_cache_base(), 'logs')
+
+
+def content_hash(filepath, size):
+    h = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        if size <= HASH_BLOCK_SIZE * HASH_BLOCKS:
+            h.update(f.read())
+        else:
+            step = (size - HASH_BLOCK_SIZE) // (HASH_BLOCKS - 1)
+            for i in range(HASH_BLOCKS):
+                f.seek(i * step)
+                h.update(f.read(HASH_BLOCK_SIZE))
+    return h.hexdigest()
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class LogCache:
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        if max_bytes is None:
+            mb = os.environ.get(CACHE_MAX_MB_ENV)
+            max_bytes = int(float(mb) * 1024 ** 2) if mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_name(self, filepath):
+        """Entry directory name: '<run digest>-<digest of sizes, mtimes and content hashes>'."""
+        paths = segment_paths(os.path.abspath(filepath)) or [os.path.abspath(filepath)]
+        stats = [os.stat(path) for path in paths]
+        key = {
+            'version': CACHE_VERSION,
+            'path': paths[0],
+            'segments': len(paths),
+            'size': sum(st.st_size for st in stats),
+            'mtime_ns': max(st.st_mtime_ns for st in stats),
+            'hash': '-'.join(content_hash(path, st.st_size) for path, st in zip(paths, stats)),
+        }
+        return '%s-%s' % (_digest(paths[0]), _digest(json.dumps(key, sort_keys=True))), key
+
+    def load(self, filepath):
+        """Return (depth, counts) for a log, from the cache when it is current."""
+        if is_binary_log(filepath):
+            return load_depth_counts(filepath)
+
+        name, key = self._entry_name(filepath)
+        entry = os.path.join(self.cache_dir, name)
+        try:
+            depth = np.load(os.path.join(entry, DEPTH_FILE), mmap_mode='r')
+            counts = np.load(os.path.join(entry, COUNTS_FILE), mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+        else:
+            self.hits += 1
+            try:
+                os.utime(os.path.join(entry, META_FILE))   # Mark as recently used
+            except OSError:
+                pass   # Read-only or shared cache: the entry just ages out sooner
+            return depth, counts
+
+        self.misses += 1
+        depth, counts = load_depth_counts(filepath)
+        try:
+            self._store(name, key, depth, counts)
+            self.evict()
+        except OSError:
+            pass   # A read-only or full cache only costs speed
+        return depth, counts
+
+    def _store(self, name, key, depth, counts):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Drop entries for earlier versions of the same file
+        prefix = name.split('-')[0] + '-'
+        for other in os.listdir(self.cache_dir):
+            if other.startswith(prefix) and other != name:
+                shutil.rmtree(os.path.join(self.cache_dir, other), ignore_errors=True)
+
+        # Write into a temporary directory and rename, so readers never see a partial entry
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.cache_dir)
+        try:
+            np.save(os.path.join(tmp, DEPTH_FILE), depth)
+            np.save(os.path.join(tmp, COUNTS_FILE), counts)
+            with open(os.path.join(tmp, META_FILE), 'w') as f:
+                json.dump(dict(key, created=time.time()), f)
+            os.rename(tmp, os.path.join(self.cache_dir, name))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(os.path.join(self.cache_dir, name)):
+                raise
+
+    def entries(self):
+        """List (last used, size in bytes, path) of every cache entry, oldest first."""
+        result = []
+        if not os.path.isdir(self.cache_dir):
+            return result
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            meta = os.path.join(entry, META_FILE)
+            if name.startswith('.') or not os.path.exists(meta):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            result.append((os.path.getmtime(meta), size, entry))
+        result.sort()
+        return result
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        return total
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
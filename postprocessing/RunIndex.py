@@ -0,0 +1,273 @@
+"""
+On-disk index of many depth logs, for queries across runs.
+
+Each log is resampled onto one shared depth grid (DepthGrid) and its per-grid-
+point count, mean, min and max are stored in an SQLite database together with
+the log's depth range. Queries such as "counts between 12.0 and 14.5 m across
+all runs" then read only the index, clustered by grid point, instead of
+parsing any logs:
+
+    python RunIndex.py add campaign/ -r          # index (or refresh) every log
+    python RunIndex.py query 12.0 14.5           # per-run statistics in a range
+    python RunIndex.py list
+    python RunIndex.py prune                     # forget logs that were deleted
+
+A segmented log (chromeData_0000.bin, chromeData_0001.bin, ...) is indexed as
+one run under its first segment (ChromeLog.run_path()), however many of its
+segments are passed. Logs are re-indexed only when their size or mtime
+changed; for a segmented run, the total size and newest mtime of its
+segments.
+
+The database lives in the per-user ChromeBox cache directory unless --index
+or the CHROMEBOX_INDEX environment variable says otherwise. The viewer
+overlays runs from it.
+"""
+import argparse
+import concurrent.futures
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from ChromeLog import load_depth_counts, run_path, run_signature
+from DepthGrid import DEFAULT_STEP_M, resample
+from LogCache import LogCache, user_cache_base
+
+INDEX_ENV = 'CHROMEBOX_INDEX'
+INDEX_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER, mtime_ns INTEGER, indexed_at REAL,
+    records INTEGER, depth_min REAL, depth_max REAL,
+    counts_min REAL, counts_mean REAL, counts_max REAL
+);
+CREATE TABLE IF NOT EXISTS bins (
+    bin INTEGER NOT NULL, run INTEGER NOT NULL,
+    n INTEGER, mean REAL, min REAL, max REAL,
+    PRIMARY KEY (bin, run)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bins_run ON bins (run, bin);
+CREATE INDEX IF NOT EXISTS runs_depth ON runs (depth_min, depth_max);
+"""
+
+
+def default_index_path():
+    return os.environ.get(INDEX_ENV) or os.path.join(user_cache_base(), 'runs.sqlite')
+
+
+def bin_log(path, step, use_cache=True):
+    """Worker: load one log and return its row for the runs table and its binned stats."""
+    depth, counts = LogCache().load(path) if use_cache else load_depth_counts(path)
+    if len(depth) == 0:
+        raise ValueError('log contains no records')
+    index, n, mean, cmin, cmax = resample(depth, counts, step).occupied()
+    run = {
+        'records': int(len(depth)),
+        'depth_min': float(depth.min()),
+        'depth_max': float(depth.max()),
+        'counts_min': float(counts.min()),
+        'counts_mean': float(counts.mean(dtype=np.float64)),
+        'counts_max': float(counts.max()),
+    }
+    return run, (index, n, mean, cmin, cmax)
+
+
+class RunIndex:
+    def __init__(self, path=None, step=None):
+        """
+        Open (or create) an index. step is the grid spacing in metres; an
+        existing index keeps the step it was created with, and asking for a
+        different one raises ValueError.
+        """
+        self.path = path or default_index_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+        stored = dict(self.db.execute('SELECT key, value FROM meta'))
+        if stored:
+            if int(stored['version']) != INDEX_VERSION:
+                raise ValueError(f"Index {self.path} has version {stored['version']}, expected {INDEX_VERSION}")
+            self.step = float(stored['step'])
+            if step is not None and not np.isclose(step, self.step):
+                raise ValueError(f"Index {self.path} uses a {self.step} m grid, not {step} m")
+        else:
+            self.step = DEFAULT_STEP_M if step is None else float(step)
+            with self.db:
+                self.db.executemany('INSERT INTO meta VALUES (?, ?)',
+                                    [('version', str(INDEX_VERSION)), ('step', repr(self.step))])
+
+    def close(self):
+        self.db.close()
+
+    def _bin(self, depth):
+        return int(np.floor(depth / self.step + 0.5))
+
+    def is_current(self, path):
+        """True if the run of path is indexed and has not changed since."""
+        row = self.db.execute('SELECT size, mtime_ns FROM runs WHERE path = ?',
+                              (run_path(os.path.abspath(path)),)).fetchone()
+        return row is not None and tuple(row) == run_signature(path)
+
+    def store(self, path, run, bins):
+        """Insert or replace one run, given the result of bin_log()."""
+        path = run_path(os.path.abspath(path))
+        size, mtime_ns = run_signature(path)
+        index, n, mean, cmin, cmax = bins
+        with self.db:
+            self.db.execute('DELETE FROM bins WHERE run = (SELECT id FROM runs WHERE path = ?)', (path,))
+            self.db.execute('DELETE FROM runs WHERE path = ?', (path,))
+            cur = self.db.execute(
+                'INSERT INTO runs (path, size, mtime_ns, indexed_at, records, depth_min, depth_max, '
+                'counts_min, counts_mean, counts_max) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, size, mtime_ns, time.time(), run['records'], run['depth_min'],
+                 run['depth_max'], run['counts_min'], run['counts_mean'], run['counts_max']))
+            run_id = cur.lastrowid
+            self.db.executemany('INSERT INTO bins VALUES (?, ?, ?, ?, ?, ?)',
+                                zip(index.tolist(), [run_id] * len(index), n.tolist(),
+                                    mean.tolist(), cmin.tolist(), cmax.tolist()))
+
+    def add(self, paths, jobs=None, use_cache=True, force=False, progress=None):
+        """
+        Index logs that are new or changed, binning them in parallel. Several
+        segments of one run are indexed once, under the run's path.
+
+        Returns {path: error message} for the logs that failed. progress, if
+        given, is called as progress(done, total, path, error).
+        """
+        runs = dict.fromkeys(run_path(os.path.abspath(p)) for p in paths)
+        todo = [p for p in runs if force or not self.is_current(p)]
+        errors = {}
+        if not todo:
+            return errors
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(bin_log, p, self.step, use_cache): p for p in todo}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                path = futures[future]
+                error = None
+                try:
+                    self.store(path, *future.result())
+                except Exception as e:
+                    error = errors[path] = '%s: %s' % (type(e).__name__, e)
+                if progress is not None:
+                    progress(done, len(todo), path, error)
+        return errors
+
+    def prune(self):
+        """Remove logs that no longer exist. Returns their paths."""
+        gone = [path for (path,) in self.db.execute('SELECT path FROM runs') if not os.path.exists(path)]
+        with self.db:
+            for path in gone:
+                self.db.execute('DELETE FROM bins WHERE run = (SELECT id FROM runs WHERE path = ?)', (path,))
+                self.db.execute('DELETE FROM runs WHERE path = ?', (path,))
+        return gone
+
+    def runs(self, depth_lo=None, depth_hi=None):
+        """Indexed logs (dicts of the runs table), optionally only those overlapping a depth range."""
+        sql = 'SELECT * FROM runs'
+        args = ()
+        if depth_lo is not None and depth_hi is not None:
+            sql += ' WHERE depth_max >= ? AND depth_min <= ?'
+            args = (min(depth_lo, depth_hi), max(depth_lo, depth_hi))
+        cur = self.db.execute(sql + ' ORDER BY path', args)
+        names = [c[0] for c in cur.description]
+        return [dict(zip(names, row)) for row in cur]
+
+    def query(self, depth_lo, depth_hi):
+        """
+        Per-run counts statistics over a depth range, from the binned index.
+
+        Returns a list of dicts (path, n, mean, min, max, depth_min, depth_max),
+        where depth_min/max are the first and last grid points with data.
+        """
+        lo, hi = self._bin(min(depth_lo, depth_hi)), self._bin(max(depth_lo, depth_hi))
+        cur = self.db.execute(
+            'SELECT runs.path, SUM(bins.n), SUM(bins.n * bins.mean) / SUM(bins.n), MIN(bins.min), '
+            'MAX(bins.max), MIN(bins.bin), MAX(bins.bin) '
+            'FROM bins JOIN runs ON runs.id = bins.run '
+            'WHERE bins.bin BETWEEN ? AND ? GROUP BY bins.run ORDER BY runs.path', (lo, hi))
+        return [{'path': path, 'n': n, 'mean': mean, 'min': cmin, 'max': cmax,
+                 'depth_min': b0 * self.step, 'depth_max': b1 * self.step}
+                for path, n, mean, cmin, cmax, b0, b1 in cur]
+
+    def profile(self, path, depth_lo=None, depth_hi=None):
+        """Binned profile of one indexed log: (depth, mean, min, max) arrays, NaN-free."""
+        sql = 'SELECT bin, mean, min, max FROM bins WHERE run = (SELECT id FROM runs WHERE path = ?)'
+        args = (run_path(os.path.abspath(path)),)
+        if depth_lo is not None and depth_hi is not None:
+            sql += ' AND bin BETWEEN ? AND ?'
+            args += (self._bin(min(depth_lo, depth_hi)), self._bin(max(depth_lo, depth_hi)))
+        rows = np.array(self.db.execute(sql + ' ORDER BY bin', args).fetchall(), dtype=np.float64).reshape(-1, 4)
+        return rows[:, 0] * self.step, rows[:, 1], rows[:, 2], rows[:, 3]
+
+
+def main():
+    from ChromeBatch import find_logs
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', help='index database (default: %s)' % default_index_path())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='index new or changed logs')
+    add.add_argument('inputs', nargs='+', help='log files, directories or glob patterns')
+    add.add_argument('-r', '--recursive', action='store_true', help='search directories recursively')
+    add.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes (default: all cores)')
+    add.add_argument('--step', type=float, help='grid step in m for a new index (default: %g)' % DEFAULT_STEP_M)
+    add.add_argument('--force', action='store_true', help='re-index logs even if unchanged')
+    add.add_argument('--no-cache', action='store_true', help='always parse logs instead of using the cache')
+
+    query = commands.add_parser('query', help='per-run counts statistics over a depth range')
+    query.add_argument('depth_lo', type=float)
+    query.add_argument('depth_hi', type=float)
+
+    commands.add_parser('list', help='list indexed logs')
+    commands.add_parser('prune', help='remove logs that no longer exist')
+    args = parser.parse_args()
+
+    index = RunIndex(args.index, getattr(args, 'step', None))
+    if args.command == 'add':
+        paths = find_logs(args.inputs, args.recursive)
+
+        processed = []
+
+        def progress(done, total, path, error):
+            processed.append(path)
+            print('[%d/%d] %s%s' % (done, total, path, ' FAILED %s' % error if error else ''), file=sys.stderr)
+
+        start = time.perf_counter()
+        errors = index.add(paths, args.jobs, not args.no_cache, args.force, progress)
+        print('%d logs found, %d indexed, %d up to date, %d failed in %.1f s' %
+              (len(paths), len(processed) - len(errors), len(paths) - len(processed), len(errors),
+               time.perf_counter() - start), file=sys.stderr)
+        if errors:
+            sys.exit(1)
+
+    elif args.command == 'query':
+        start = time.perf_counter()
+        rows = index.query(args.depth_lo, args.depth_hi)
+        elapsed = time.perf_counter() - start
+        print('run,depth_min_m,depth_max_m,samples,counts_mean,counts_min,counts_max')
+        for r in rows:
+            print('%s,%.3f,%.3f,%d,%.1f,%.0f,%.0f' % (r['path'], r['depth_min'], r['depth_max'], r['n'],
+                                                      r['mean'], r['min'], r['max']))
+        print('%d runs in %.1f ms' % (len(rows), elapsed * 1000), file=sys.stderr)
+
+    elif args.command == 'list':
+        for r in index.runs():
+            print('%s: %d records, %.3f .. %.3f m' % (r['path'], r['records'], r['depth_min'], r['depth_max']))
+
+    elif args.command == 'prune':
+        for path in index.prune():
+            print('Removed %s' % path)
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
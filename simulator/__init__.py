@@ -0,0 +1,169 @@
+"""
+Host-side simulator for the uphole and downhole firmware.
+
+Runs the unmodified MicroPython sources on Linux against a fake `machine`,
+`time` and `micropython`, all driven by a virtual clock, so a field run can
+be replayed faster than real time:
+
+    from simulator import Simulation
+
+    sim = Simulation.uphole()
+    sim.board.set_adc(28, lambda t: 20000 + 5000 * (t > 30))
+    sim.board.pulse_train(10, start_s=5, period_s=0.05, count=2000)
+    chromeBox = sim.load('chromeBox')
+    sim.run(chromeBox.ChokBaux().main, seconds=120)
+
+Files written by the firmware (e.g. chromeData.csv) land in sim.workdir.
+"""
+import contextlib
+import importlib
+import io
+import os
+import sys
+import tempfile
+import time as _host_time
+
+from simulator.board import Board
+from simulator.clock import SimulationEnd, VirtualClock
+from simulator.devices import GP8302, VEML3328, GP8302_ADDR, VEML3328_ADDR
+from simulator import machine as fake_machine
+from simulator import micropython as fake_micropython
+from simulator import mpgc as fake_gc
+from simulator import utime as fake_time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRMWARE_DIRS = {
+    'uphole': os.path.join(REPO_ROOT, 'uphole'),
+    'downhole': os.path.join(REPO_ROOT, 'downhole'),
+}
+
+# Modules replaced while firmware is imported. rp2 is hidden so the firmware
+# falls back to its non-PIO/non-DMA paths.
+FAKE_MODULES = {
+    'machine': fake_machine,
+    'micropython': fake_micropython,
+    'time': fake_time,
+    'gc': fake_gc,
+    'rp2': None,
+}
+
+# Downhole wiring (downhole/main.py)
+RGB_SENSOR_BUS = 0
+DAC_BUS = 1
+DAC_SCL_PIN = 19
+DAC_SDA_PIN = 18
+
+
+class Simulation:
+    def __init__(self, firmware, workdir=None, quiet=False):
+        """
+        Arguments:
+        - firmware: 'uphole', 'downhole' or a path to a firmware directory
+        - workdir: directory the firmware sees as its filesystem (temporary if None)
+        - quiet: swallow the firmware's console output
+        """
+        self.firmware_dir = FIRMWARE_DIRS.get(firmware, firmware)
+        self.workdir = workdir or tempfile.mkdtemp(prefix='uvif-sim-')
+        os.makedirs(self.workdir, exist_ok=True)
+        self.quiet = quiet
+        self.clock = VirtualClock()
+        self.board = Board(self.clock)
+        self.console = io.StringIO() if quiet else None
+        self.wall_s = 0.0
+
+    # ------------------------------------------------------------ factories
+    @classmethod
+    def uphole(cls, **kwargs):
+        return cls('uphole', **kwargs)
+
+    @classmethod
+    def downhole(cls, red=0, green=0, blue=0, **kwargs):
+        """Downhole board with a VEML3328 on bus 0 and a GP8302 on the DAC pins."""
+        sim = cls('downhole', **kwargs)
+        sim.sensor = sim.board.attach_i2c(RGB_SENSOR_BUS, VEML3328_ADDR,
+                                          VEML3328(sim.clock, r=red, g=green, b=blue))
+        sim.dac = sim.board.attach_i2c(DAC_BUS, GP8302_ADDR, GP8302(sim.clock))
+        sim.dac.watch_pins(sim.board, DAC_SCL_PIN, DAC_SDA_PIN)
+        return sim
+
+    # --------------------------------------------------------------- loading
+    def _firmware_module_names(self):
+        return [f[:-3] for f in os.listdir(self.firmware_dir) if f.endswith('.py')]
+
+    @contextlib.contextmanager
+    def _activated(self):
+        fake_machine._attach(self.board)
+        fake_micropython._attach(self.clock)
+        fake_time._attach(self.clock)
+        saved = {name: sys.modules.get(name) for name in FAKE_MODULES}
+        for name, module in FAKE_MODULES.items():
+            sys.modules[name] = module
+        sys.path.insert(0, self.firmware_dir)
+        try:
+            yield
+        finally:
+            sys.path.remove(self.firmware_dir)
+            for name, module in saved.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+
+    def load(self, name):
+        """Import a firmware module (and whatever it imports) against the fakes."""
+        with self._activated():
+            # Drop modules cached from another firmware directory with the same names
+            for module_name in self._firmware_module_names():
+                sys.modules.pop(module_name, None)
+            return importlib.import_module(name)
+
+    # --------------------------------------------------------------- running
+    def run(self, entry=None, seconds=1.0):
+        """
+        Call entry() (e.g. ChokBaux().main or Chalk_Detector().main) and keep
+        the virtual clock running until `seconds` of simulated time have passed.
+        Endless firmware loops are stopped when the time is up.
+        """
+        self.clock.end_us = self.clock.now_us + int(seconds * 1e6)
+        cwd = os.getcwd()
+        os.chdir(self.workdir)
+        start = _host_time.perf_counter()
+        try:
+            with self._activated(), self._console():
+                try:
+                    if entry is not None:
+                        entry()
+                    self.clock.advance(self.clock.end_us - self.clock.now_us)
+                except SimulationEnd:
+                    pass
+        finally:
+            self.wall_s += _host_time.perf_counter() - start
+            os.chdir(cwd)
+        return self
+
+    def call(self, func, *args):
+        """Call into firmware objects between runs (e.g. print_stats) with the fakes active."""
+        cwd = os.getcwd()
+        os.chdir(self.workdir)
+        try:
+            with self._activated(), self._console():
+                return func(*args)
+        finally:
+            os.chdir(cwd)
+
+    def _console(self):
+        if self.console is not None:
+            return contextlib.redirect_stdout(self.console)
+        return contextlib.nullcontext()
+
+    @property
+    def now_s(self):
+        return self.clock.now_us / 1e6
+
+    @property
+    def speedup(self):
+        """Simulated seconds per wall-clock second over all runs so far."""
+        return self.now_s / self.wall_s if self.wall_s else float('inf')
+
+    def path(self, filename):
+        return os.path.join(self.workdir, filename)
@@ -0,0 +1,98 @@
+"""
+Command-line runner for the firmware simulator.
+
+    python -m simulator uphole --seconds 60 --pulse-hz 20 --counts 20000
+    python -m simulator uphole --replay field/chromeData.csv --pulse-hz 40
+    python -m simulator downhole --seconds 10 --green 120
+"""
+import argparse
+import csv
+import math
+
+from simulator import Simulation
+
+# Uphole wiring (uphole/chromeBox.py, uphole/inputPins.py)
+ADC1_PIN = 28
+ADC2_PIN = 27
+DPT_IN_PIN = 10
+PULSE_START_S = 4.0         # After ChokBaux.main()'s INIT_WAIT_SECS
+
+
+def load_counts(path):
+    with open(path, newline='') as f:
+        return [int(float(row['# Counts'])) for row in csv.DictReader(f)]
+
+
+def run_uphole(args):
+    sim = Simulation.uphole(workdir=args.workdir, quiet=args.quiet)
+    period = 1.0 / args.pulse_hz
+
+    if args.replay:
+        counts = load_counts(args.replay)
+
+        def adc(t):
+            i = int((t - PULSE_START_S) / period)
+            return counts[min(max(i, 0), len(counts) - 1)]
+
+        n_pulses = len(counts)
+    else:
+        def adc(t):
+            return args.counts + args.noise * math.sin(2 * math.pi * 7.3 * t)
+
+        n_pulses = int((args.seconds - PULSE_START_S) * args.pulse_hz)
+
+    sim.board.set_adc(ADC1_PIN, adc)
+    sim.board.set_adc(ADC2_PIN, 0)
+    sim.board.pulse_train(DPT_IN_PIN, PULSE_START_S, period, n_pulses)
+    seconds = max(args.seconds, PULSE_START_S + n_pulses * period + 1.0)
+
+    chromeBox = sim.load('chromeBox')
+    box = sim.call(chromeBox.ChokBaux)
+    sim.run(box.main, seconds=seconds)
+    sim.call(box.log.stop)
+
+    print('Simulated %.1f s in %.2f s wall (x%.0f)' % (sim.now_s, sim.wall_s, sim.speedup))
+    print('Pulses: %d, depth ticks: %d, records written: %d, dropped: %d' %
+          (n_pulses, box.depth_ticks, box.log.written, box.log.dropped))
+    print('Log: %s' % sim.path(box.log.path))
+
+
+def run_downhole(args):
+    sim = Simulation.downhole(red=args.red, green=args.green, blue=args.blue,
+                              workdir=args.workdir, quiet=args.quiet)
+    main = sim.load('main')
+    detector = sim.call(main.Chalk_Detector)
+    sim.run(detector.main, seconds=args.seconds)
+
+    print('Simulated %.1f s in %.2f s wall (x%.0f)' % (sim.now_s, sim.wall_s, sim.speedup))
+    print('DAC updates: %d, last output %.3f mA' % (len(sim.dac.outputs), sim.dac.current_mA))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m simulator', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('firmware', choices=['uphole', 'downhole'])
+    parser.add_argument('--seconds', type=float, default=30.0, help='simulated run time')
+    parser.add_argument('--workdir', help='directory for files written by the firmware')
+    parser.add_argument('--quiet', action='store_true', help='hide firmware console output')
+
+    uphole = parser.add_argument_group('uphole')
+    uphole.add_argument('--pulse-hz', type=float, default=20.0, help='depth pulse rate on DPT_IN')
+    uphole.add_argument('--counts', type=int, default=20000, help='differential ADC counts')
+    uphole.add_argument('--noise', type=int, default=0, help='amplitude of a slow ripple on the counts')
+    uphole.add_argument('--replay', help='replay the counts of a recorded chromeData.csv')
+
+    downhole = parser.add_argument_group('downhole')
+    downhole.add_argument('--red', type=int, default=0)
+    downhole.add_argument('--green', type=int, default=75)
+    downhole.add_argument('--blue', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.firmware == 'uphole':
+        run_uphole(args)
+    else:
+        run_downhole(args)
+
+
+if __name__ == '__main__':
+    main()
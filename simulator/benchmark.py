@@ -0,0 +1,239 @@
+"""
+Latency and throughput benchmark for the probe-to-log chain.
+
+Drives the real firmware through the simulator and reports, as JSON:
+- per-stage cost of the hot paths (VEML3328 read, GP8302 frame, ADC read,
+  log write): modelled on-probe time from the bus model, host wall time,
+  and host heap use per call
+- downhole loop rate and the maximum back-to-back sample rate
+- uphole depth-pulse-to-record latency percentiles and record throughput
+
+    python -m simulator.benchmark                      # print JSON
+    python -m simulator.benchmark -o bench.json        # save it
+    python -m simulator.benchmark --compare bench.json # flag regressions
+
+Heap figures come from tracemalloc on the host, so they are a proxy for
+MicroPython heap churn: a hot path that allocates here allocates on the Pico too.
+heap_peak_bytes_per_call also includes the simulator's own bookkeeping (bus
+decoding, recorded frames), so compare it between versions rather than
+reading it as an absolute number.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from simulator import Simulation
+
+STAGE_ITERATIONS = 2000
+PULSE_START_S = 4.0
+PULSE_HZ = 50.0
+PULSE_COUNT = 2000
+LOOP_SECONDS = 10.0
+
+# Metrics where a larger value is an improvement (everything else: smaller is better)
+HIGHER_IS_BETTER = ('samples_per_s', 'records_per_s', 'max_sample_rate_hz', 'speedup')
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def time_stage(sim, func, iterations=STAGE_ITERATIONS):
+    """Run func() repeatedly with the fakes active and measure it three ways."""
+    firmware_only = [tracemalloc.Filter(True, sim.firmware_dir + '/*')]
+
+    def loop():
+        func()  # Warm up caches and lazily created objects
+        t_virtual = sim.clock.now_us
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot().filter_traces(firmware_only)
+        peak_total = 0
+        t_wall = time.perf_counter()
+        for _ in range(iterations):
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - start
+        wall = time.perf_counter() - t_wall
+        after = tracemalloc.take_snapshot().filter_traces(firmware_only)
+        tracemalloc.stop()
+        retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        return {
+            'probe_us': (sim.clock.now_us - t_virtual) / iterations,
+            'host_us': wall * 1e6 / iterations,
+            'heap_peak_bytes_per_call': peak_total / iterations,
+            'firmware_retained_bytes_per_call': max(0, retained) / iterations,
+        }
+
+    sim.clock.end_us = None
+    return sim.call(loop)
+
+
+def bench_downhole():
+    sim = Simulation.downhole(red=1000, green=lambda t: 60 + int(40 * (t % 1.0)), blue=500, quiet=True)
+    main = sim.load('main')
+    detector = sim.call(main.Chalk_Detector)
+    sim.call(detector.dac.begin)
+
+    stages = {
+        'sensor_read': time_stage(sim, detector.rgbSensor.read_all),
+        'dac_frame': time_stage(sim, lambda: detector.dac.output_mA(1234)),
+    }
+
+    # The shipped loop, paced by MEASUREMENT_LATENCY_MS and printing every cycle
+    outputs_before = len(sim.dac.outputs)
+    t0 = sim.now_s
+    sim.run(detector.main, seconds=LOOP_SECONDS)
+    loop_rate = (len(sim.dac.outputs) - outputs_before) / (sim.now_s - t0)
+
+    cycle_us = stages['sensor_read']['probe_us'] + stages['dac_frame']['probe_us']
+    return {
+        'stages': stages,
+        'samples_per_s': loop_rate,
+        'max_sample_rate_hz': 1e6 / cycle_us if cycle_us else None,
+    }
+
+
+def bench_uphole():
+    sim = Simulation.uphole(quiet=True)
+    sim.board.set_adc(28, lambda t: 20000 + int(3000 * (t % 2.0)))
+    sim.board.set_adc(27, 1000)
+    period = 1.0 / PULSE_HZ
+    sim.board.pulse_train(10, PULSE_START_S, period, PULSE_COUNT)
+
+    chromeBox = sim.load('chromeBox')
+    box = sim.call(chromeBox.ChokBaux)
+
+    # Time stamp every record as it reaches the file. Records carry their depth
+    # tick, and tick n was caused by the n-th scheduled falling edge.
+    log = box.log
+    written_at = {}
+    drain_fn = log._drain_binary if log.log_format == 'BINARY' else log._drain_csv
+
+    def timed_drain():
+        tail, head = log._tail, log._head
+        result = drain_fn()
+        i = tail
+        while i != head:
+            written_at[log.ticks[i]] = sim.clock.now_us
+            i = (i + 1) % log.capacity
+        return result
+
+    if log.log_format == 'BINARY':
+        log._drain_binary = timed_drain
+    else:
+        log._drain_csv = timed_drain
+
+    seconds = PULSE_START_S + PULSE_COUNT * period + 1.0
+    sim.run(box.main, seconds=seconds)
+
+    latencies_ms = []
+    for tick, t_us in written_at.items():
+        edge_us = (PULSE_START_S + (tick - 1) * period) * 1e6
+        latencies_ms.append((t_us - edge_us) / 1000.0)
+
+    stages = {
+        'adc_read': time_stage(sim, box.adc.measure_counts),
+        'log_write': time_stage(sim, lambda: (log.push(1, 20000), log.drain())),
+    }
+    return {
+        'stages': stages,
+        'records': len(written_at),
+        'records_per_s': len(written_at) / (PULSE_COUNT * period),
+        'host_records_per_s': len(written_at) / sim.wall_s if sim.wall_s else None,
+        'speedup': sim.speedup,
+        'isr_to_record_ms': {
+            'p50': percentile(latencies_ms, 50),
+            'p90': percentile(latencies_ms, 90),
+            'p99': percentile(latencies_ms, 99),
+            'max': max(latencies_ms) if latencies_ms else None,
+        },
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run():
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'downhole': bench_downhole(),
+        'uphole': bench_uphole(),
+    }
+
+
+def flatten(result, prefix=''):
+    flat = {}
+    for key, value in result.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(result, baseline, tolerance):
+    """Return (metric, baseline, current, change) for every metric that got worse by more than tolerance."""
+    current, previous = flatten(result), flatten(baseline)
+    regressions = []
+    for name, old in previous.items():
+        new = current.get(name)
+        if new is None or not old:
+            continue
+        change = (new - old) / abs(old)
+        if name.endswith('host_us') or 'host_records' in name or name.endswith('speedup'):
+            continue  # Host speed depends on the machine running the benchmark
+        worse = change < -tolerance if name.split('.')[-1] in HIGHER_IS_BETTER else change > tolerance
+        if worse:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m simulator.benchmark', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='relative change treated as a regression (default 0.10)')
+    args = parser.parse_args()
+
+    result = run()
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for name, old, new, change in regressions:
+            print('REGRESSION %s: %.4g -> %.4g (%+.0f%%)' % (name, old, new, change * 100), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+The simulated Pico: GPIO levels, ADC inputs, I2C buses and attached devices.
+
+Test scripts describe the outside world through a Board (ADC waveforms, pulse
+trains on input pins, sensor register contents) and the fake `machine` module
+routes every peripheral access from the firmware to it.
+"""
+
+# Bus transfer time model: 9 clocks per byte plus start/stop overhead
+I2C_OVERHEAD_BITS = 2
+ADC_CONVERSION_US = 2
+DEFAULT_I2C_FREQ = 100000
+
+# Pin constants (same values as the MicroPython rp2 port)
+PIN_IN = 0
+PIN_OUT = 1
+PULL_UP = 1
+PULL_DOWN = 2
+IRQ_FALLING = 4
+IRQ_RISING = 8
+
+
+class GPIO:
+    """Electrical state of one pin, shared by every machine.Pin built on it."""
+
+    def __init__(self, board, number):
+        self.board = board
+        self.number = number
+        self.mode = None            # PIN_IN / PIN_OUT, None until configured
+        self.pull = None
+        self.driven = None          # Level driven by the firmware (OUT mode)
+        self.external = None        # Level driven by the outside world (scripted)
+        self.irq_handler = None
+        self.irq_trigger = 0
+        self.irq_pin = None         # machine.Pin object passed to the handler
+        self.listeners = []         # Devices watching this line (bit-banged buses)
+
+    def level(self):
+        if self.mode == PIN_OUT and self.driven is not None:
+            return self.driven
+        if self.external is not None:
+            return self.external
+        if self.pull == PULL_UP:
+            return 1
+        return 0
+
+    def changed(self, old):
+        new = self.level()
+        if new == old:
+            return
+        for listener in self.listeners:
+            listener(self, old, new)
+        if self.irq_handler is not None:
+            if (new == 0 and self.irq_trigger & IRQ_FALLING) or \
+               (new == 1 and self.irq_trigger & IRQ_RISING):
+                self.irq_handler(self.irq_pin)
+
+
+class Board:
+    def __init__(self, clock):
+        self.clock = clock
+        self.gpios = {}
+        self.adc_inputs = {}        # GPIO number -> function(t_seconds) returning a u16 reading
+        self.i2c_devices = {}       # (bus id, address) -> device
+        self.adc_reads = 0
+        self.i2c_bytes = 0
+
+    def gpio(self, number):
+        if number not in self.gpios:
+            self.gpios[number] = GPIO(self, number)
+        return self.gpios[number]
+
+    # ------------------------------------------------------------- scripting
+    def set_adc(self, pin, source):
+        """source: constant u16 reading, or function(t_seconds) returning one."""
+        if callable(source):
+            self.adc_inputs[pin] = source
+        else:
+            self.adc_inputs[pin] = lambda t, v=int(source): v
+
+    def set_level(self, pin, level, at_s=None):
+        """Drive an input pin from outside, now or at a given simulated time."""
+        gpio = self.gpio(pin)
+
+        def apply():
+            old = gpio.level()
+            gpio.external = 1 if level else 0
+            gpio.changed(old)
+
+        if at_s is None:
+            apply()
+        else:
+            self.clock.call_at(at_s * 1e6, apply)
+
+    def pulse_train(self, pin, start_s, period_s, count, width_s=None, active_level=0):
+        """
+        Schedule `count` pulses on an input pin. Each pulse drives the pin to
+        active_level for width_s (half the period by default), so the default
+        gives one falling edge per pulse, as the depth encoder does on DPT_IN.
+        """
+        if width_s is None:
+            width_s = period_s / 2
+        idle = 0 if active_level else 1
+        self.set_level(pin, idle, at_s=start_s - min(width_s, period_s / 2))
+        for i in range(count):
+            t = start_s + i * period_s
+            self.set_level(pin, active_level, at_s=t)
+            self.set_level(pin, idle, at_s=t + width_s)
+
+    def pulse_times(self, pin, times_s, width_s=0.001, active_level=0):
+        """Schedule one pulse at each of the given times (e.g. replaying a field run)."""
+        idle = 0 if active_level else 1
+        self.set_level(pin, idle)
+        for t in times_s:
+            self.set_level(pin, active_level, at_s=t)
+            self.set_level(pin, idle, at_s=t + width_s)
+
+    def attach_i2c(self, bus_id, address, device):
+        self.i2c_devices[(bus_id, address)] = device
+        return device
+
+    # ------------------------------------------------------- peripheral access
+    def read_adc(self, pin):
+        self.clock.consume(ADC_CONVERSION_US)
+        self.adc_reads += 1
+        source = self.adc_inputs.get(pin)
+        if source is None:
+            return 0
+        return max(0, min(0xFFFF, int(source(self.clock.now_us / 1e6))))
+
+    def i2c_device(self, bus_id, address):
+        device = self.i2c_devices.get((bus_id, address))
+        if device is None:
+            raise OSError(19, 'ENODEV')     # Same errno MicroPython raises on a NACK
+        return device
+
+    def i2c_transfer(self, freq, nbytes):
+        self.i2c_bytes += nbytes
+        self.clock.consume((nbytes * 9 + I2C_OVERHEAD_BITS) * 1e6 / (freq or DEFAULT_I2C_FREQ))
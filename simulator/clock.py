@@ -0,0 +1,83 @@
+"""
+Virtual time for the simulator.
+
+Firmware never waits for real: sleeping advances the clock and runs every
+event (timer expiries, scripted pin edges, scheduled callbacks) that falls due
+on the way, in time order. That lets a long field run replay in a fraction of
+its real duration while keeping the relative timing of events intact.
+"""
+import heapq
+import itertools
+
+
+class SimulationEnd(Exception):
+    """Raised from inside firmware code when the clock reaches its end time."""
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now_us = 0
+        self.end_us = None
+        self._queue = []
+        self._seq = itertools.count()   # Tie-breaker keeping same-time events in FIFO order
+        self._dispatching = False
+
+    # ------------------------------------------------------------------ events
+    def call_at(self, t_us, callback, *args):
+        """Run callback(*args) once the clock reaches t_us. Returns a handle for cancel()."""
+        entry = [int(t_us), next(self._seq), callback, args, True]
+        heapq.heappush(self._queue, entry)
+        return entry
+
+    def call_later(self, delay_us, callback, *args):
+        return self.call_at(self.now_us + delay_us, callback, *args)
+
+    def cancel(self, entry):
+        entry[4] = False
+
+    def dispatch(self):
+        """Run every event that is due at the current time."""
+        if self._dispatching:
+            return  # Called from inside an event handler: finish that one first
+        self._dispatching = True
+        try:
+            while self._queue and self._queue[0][0] <= self.now_us:
+                _, _, callback, args, live = heapq.heappop(self._queue)
+                if live:
+                    callback(*args)
+        finally:
+            self._dispatching = False
+
+    # ------------------------------------------------------------------- time
+    def consume(self, us):
+        """Account for time spent doing work (bus transfers, conversions) without yielding."""
+        self.now_us += int(us)
+        self._check_end()
+
+    def advance(self, us):
+        """Sleep: move time forward by us, running due events along the way."""
+        target = self.now_us + int(us)
+        if self._dispatching:
+            # A callback that sleeps just burns its own time
+            self.now_us = target
+            self._check_end()
+            return
+        while self._queue and self._queue[0][0] <= target:
+            self.now_us = max(self.now_us, self._queue[0][0])
+            self._check_end()
+            self.dispatch()
+        self.now_us = target
+        self._check_end()
+        self.dispatch()
+
+    def run_until(self, t_us):
+        """Advance to t_us from outside firmware code (e.g. after ChokBaux.main() returns)."""
+        try:
+            self.advance(max(0, t_us - self.now_us))
+        except SimulationEnd:
+            pass
+
+    def _check_end(self):
+        if self.end_us is not None and self.now_us >= self.end_us:
+            self.now_us = self.end_us
+            raise SimulationEnd()
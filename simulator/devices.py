@@ -0,0 +1,144 @@
+"""
+Simulated I2C targets: the VEML3328 colour sensor and the GP8302 4-20 mA DAC.
+"""
+import struct
+
+from simulator.board import PIN_OUT
+
+VEML3328_ADDR = 0x10
+VEML3328_CONF = 0x00
+VEML3328_CHANNELS = {'C': 0x04, 'R': 0x05, 'G': 0x06, 'B': 0x07, 'IR': 0x08}
+VEML3328_ID = 0x0C
+VEML3328_IT_MS = (50, 100, 200, 400)            # CONF bits 5:4
+VEML3328_GAIN = (1.0, 2.0, 4.0, 0.5)            # CONF bits 11:10
+VEML3328_DG = (1.0, 2.0, 4.0, 4.0)              # CONF bits 13:12
+
+GP8302_ADDR = 0x58
+GP8302_CURRENT_REG = 0x02
+GP8302_CURRENT_RESOLUTION = 0x0FFF
+GP8302_MAX_CURRENT = 25
+
+
+class VEML3328:
+    """
+    Register model of the VEML3328. Each colour channel is a constant or a
+    function(t_seconds) giving the count the sensor would report at its
+    power-on configuration (50 ms, gain x1). Writes to the control register
+    scale the reported counts by the new gain and integration time once one
+    full integration has elapsed, and counts saturate at 0xFFFF.
+    """
+
+    def __init__(self, clock, **channels):
+        self.clock = clock
+        self.config = 0
+        self.config_writes = []     # (t_us, value) of every control register write
+        self.sources = {}
+        for name, source in channels.items():
+            self.set_channel(name, source)
+
+    def set_channel(self, name, source):
+        reg = VEML3328_CHANNELS[name.upper()]
+        if callable(source):
+            self.sources[reg] = source
+        else:
+            self.sources[reg] = lambda t, v=int(source): v
+
+    @staticmethod
+    def sensitivity(config):
+        it = (config >> 4) & 3
+        gain = (config >> 10) & 3
+        dg = (config >> 12) & 3
+        return VEML3328_GAIN[gain] * VEML3328_DG[dg] * VEML3328_IT_MS[it] / VEML3328_IT_MS[0]
+
+    def _effective_config(self):
+        # The data registers still hold the previous result until a full integration has run
+        config = 0
+        for t_us, value in self.config_writes:
+            if self.clock.now_us - t_us >= VEML3328_IT_MS[(value >> 4) & 3] * 1000:
+                config = value
+        return config
+
+    def write_mem(self, reg, data):
+        if reg == VEML3328_CONF and len(data) >= 2:
+            self.config = data[0] | (data[1] << 8)
+            self.config_writes.append((self.clock.now_us, self.config))
+
+    def read_mem(self, reg, nbytes):
+        if reg == VEML3328_CONF:
+            value = self.config
+        elif reg == VEML3328_ID:
+            value = 0x28
+        else:
+            source = self.sources.get(reg)
+            light = 0 if source is None else source(self.clock.now_us / 1e6)
+            value = int(light * self.sensitivity(self._effective_config()))
+        value = max(0, min(0xFFFF, value))
+        return struct.pack('<H', value)[:nbytes].ljust(nbytes, b'\0')
+
+    def write(self, data):
+        pass
+
+
+class GP8302:
+    """
+    Recording GP8302. Accepts frames from the hardware I2C path (write()) and
+    decodes bit-banged frames from SCL/SDA activity (watch_pins()). Every
+    current update is appended to `outputs` as (t_us, 12-bit code, mA) and
+    every raw frame (address byte first) to `frames`.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.frames = []
+        self.outputs = []
+        self._bits = []
+        self._scl = None
+        self._sda = None
+
+    @property
+    def current_mA(self):
+        return self.outputs[-1][2] if self.outputs else 0.0
+
+    def _frame(self, frame):
+        self.frames.append(frame)
+        if len(frame) == 4 and frame[0] == GP8302_ADDR << 1 and frame[1] == GP8302_CURRENT_REG:
+            code = (frame[2] >> 4) | (frame[3] << 4)
+            self.outputs.append((self.clock.now_us, code,
+                                 code / GP8302_CURRENT_RESOLUTION * GP8302_MAX_CURRENT))
+
+    # Hardware I2C path (machine.I2C.writeto)
+    def write(self, data):
+        self._frame(bytes((GP8302_ADDR << 1,)) + bytes(data))
+
+    def write_mem(self, reg, data):
+        self.write(bytes((reg,)) + bytes(data))
+
+    def read_mem(self, reg, nbytes):
+        return bytes(nbytes)
+
+    # Bit-banged path
+    def watch_pins(self, board, scl_pin, sda_pin):
+        self._scl = board.gpio(scl_pin)
+        self._sda = board.gpio(sda_pin)
+        self._scl.listeners.append(self._line_changed)
+        self._sda.listeners.append(self._line_changed)
+
+    def _line_changed(self, gpio, old, new):
+        if gpio is self._scl:
+            if new == 1:
+                # Rising clock: sample SDA; a released line is the device's ACK
+                self._bits.append(self._sda.level() if self._sda.mode == PIN_OUT else 0)
+        elif self._scl.level() == 1:
+            if new == 0:
+                self._bits = []                         # START
+            else:
+                bits = self._bits                       # STOP
+                frame = bytearray()
+                for i in range(len(bits) // 9):
+                    byte = 0
+                    for bit in bits[9 * i:9 * i + 8]:
+                        byte = (byte << 1) | bit
+                    frame.append(byte)
+                self._bits = []
+                if frame:
+                    self._frame(bytes(frame))
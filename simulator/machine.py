@@ -0,0 +1,137 @@
+"""
+Stand-in for MicroPython's `machine` module, backed by the active Board.
+
+Only the parts the firmware uses are provided: Pin, ADC, I2C and Timer.
+Installed as sys.modules['machine'] while firmware modules are imported.
+"""
+from simulator import board as _board_module
+
+_board = None
+
+
+def _attach(board):
+    global _board
+    _board = board
+
+
+def idle():
+    _board.clock.advance(1)
+
+
+class Pin:
+    IN = _board_module.PIN_IN
+    OUT = _board_module.PIN_OUT
+    PULL_UP = _board_module.PULL_UP
+    PULL_DOWN = _board_module.PULL_DOWN
+    IRQ_FALLING = _board_module.IRQ_FALLING
+    IRQ_RISING = _board_module.IRQ_RISING
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._gpio = _board.gpio(id)
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        gpio = self._gpio
+        old = gpio.level()
+        if mode != -1:
+            gpio.mode = mode
+        if pull != -1:
+            gpio.pull = pull
+        if value is not None:
+            gpio.driven = 1 if value else 0
+        gpio.changed(old)
+
+    def value(self, v=None):
+        gpio = self._gpio
+        if v is None:
+            return gpio.level()
+        old = gpio.level()
+        gpio.driven = 1 if v else 0
+        gpio.changed(old)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        gpio = self._gpio
+        gpio.irq_handler = handler
+        gpio.irq_trigger = trigger
+        gpio.irq_pin = self
+
+
+class ADC:
+    def __init__(self, pin):
+        self.pin = pin.id if isinstance(pin, Pin) else pin
+
+    def read_u16(self):
+        return _board.read_adc(self.pin)
+
+
+class I2C:
+    def __init__(self, id, scl=None, sda=None, freq=400000):
+        self.id = id
+        self.freq = freq
+
+    def scan(self):
+        return sorted(addr for bus, addr in _board.i2c_devices if bus == self.id)
+
+    def writeto(self, addr, buf, stop=True):
+        device = _board.i2c_device(self.id, addr)
+        _board.i2c_transfer(self.freq, 1 + len(buf))
+        device.write(bytes(buf))
+        return len(buf) + 1
+
+    def writeto_mem(self, addr, memaddr, buf):
+        device = _board.i2c_device(self.id, addr)
+        _board.i2c_transfer(self.freq, 2 + len(buf))
+        device.write_mem(memaddr, bytes(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        device = _board.i2c_device(self.id, addr)
+        _board.i2c_transfer(self.freq, 3 + nbytes)
+        return bytes(device.read_mem(memaddr, nbytes))
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        device = _board.i2c_device(self.id, addr)
+        _board.i2c_transfer(self.freq, 3 + len(buf))
+        buf[:] = device.read_mem(memaddr, len(buf))
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self._entry = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None, tick_hz=1000):
+        self.deinit()
+        if freq != -1:
+            self._period_us = 1e6 / freq
+        else:
+            self._period_us = period * 1e6 / tick_hz
+        self._mode = mode
+        self._callback = callback
+        self._due_us = _board.clock.now_us + self._period_us
+        self._entry = _board.clock.call_at(self._due_us, self._fire)
+
+    def deinit(self):
+        if self._entry is not None:
+            _board.clock.cancel(self._entry)
+            self._entry = None
+
+    def _fire(self):
+        if self._mode == Timer.PERIODIC:
+            # Keep a fixed cadence regardless of how long the callback takes
+            self._due_us += self._period_us
+            self._entry = _board.clock.call_at(self._due_us, self._fire)
+        else:
+            self._entry = None
+        if self._callback is not None:
+            self._callback(self)
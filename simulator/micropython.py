@@ -0,0 +1,41 @@
+"""
+Stand-in for the `micropython` module. schedule() queues the callback on the
+virtual clock so it runs at the next dispatch point, like the real scheduler.
+"""
+_clock = None
+
+SCHEDULE_DEPTH = 8              # Same queue depth as the rp2 port
+
+_pending = 0
+
+
+def _attach(clock):
+    global _clock, _pending
+    _clock = clock
+    _pending = 0
+
+
+def const(value):
+    return value
+
+
+def schedule(func, arg):
+    global _pending
+    if _pending >= SCHEDULE_DEPTH:
+        raise RuntimeError('schedule queue full')
+    _pending += 1
+
+    def run():
+        global _pending
+        _pending -= 1
+        func(arg)
+
+    _clock.call_later(0, run)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    pass
@@ -0,0 +1,39 @@
+"""
+Stand-in for MicroPython's `gc` module (mem_free/mem_alloc are not in CPython's).
+
+Heap use is approximated from the host allocator's block count against a
+fixed Pico-sized heap, which is enough for the firmware's profiler to run.
+"""
+import gc as _host_gc
+import sys
+
+HEAP_SIZE = 192 * 1024          # Roughly the MicroPython heap on an RP2040
+HOST_BLOCKS_PER_KB = 4          # Host objects are far larger; scale the block count down to Pico size
+
+
+def mem_alloc():
+    return min(HEAP_SIZE, sys.getallocatedblocks() * 1024 // (HOST_BLOCKS_PER_KB * 1024))
+
+
+def mem_free():
+    return HEAP_SIZE - mem_alloc()
+
+
+def collect():
+    return _host_gc.collect()
+
+
+def enable():
+    _host_gc.enable()
+
+
+def disable():
+    _host_gc.disable()
+
+
+def isenabled():
+    return _host_gc.isenabled()
+
+
+def threshold(amount=None):
+    return -1
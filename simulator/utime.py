@@ -0,0 +1,57 @@
+"""
+Stand-in for MicroPython's `time` module running on the simulator's virtual clock.
+
+Installed as sys.modules['time'] while firmware modules are imported, so the
+firmware's `import time` binds to this module while the host keeps the real one.
+"""
+_clock = None
+
+TICKS_PERIOD = 1 << 30          # MicroPython ticks wrap at 2**30
+TICKS_HALF = TICKS_PERIOD // 2
+
+
+def _attach(clock):
+    global _clock
+    _clock = clock
+
+
+def sleep(seconds):
+    _clock.advance(seconds * 1e6)
+
+
+def sleep_ms(ms):
+    _clock.advance(ms * 1000)
+
+
+def sleep_us(us):
+    _clock.advance(us)
+
+
+def ticks_us():
+    _clock.dispatch()           # Let timers fire inside busy-wait loops
+    return _clock.now_us % TICKS_PERIOD
+
+
+def ticks_ms():
+    _clock.dispatch()
+    return (_clock.now_us // 1000) % TICKS_PERIOD
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALF) % TICKS_PERIOD) - TICKS_HALF
+
+
+def time():
+    return _clock.now_us // 1000000
+
+
+def time_ns():
+    return _clock.now_us * 1000
@@ -1,23 +1,186 @@
 import machine
+import sys
+import time
+from array import array
+
+# rp2.DMA is only available on the RP2 port (MicroPython 1.21+)
+try:
+    import rp2
+except ImportError:
+    rp2 = None
 
 # Constants for ADC conversion
 ADC_MAX_VOLTAGE = 3.3        # Reference voltage for ADC (typically 3.3V on RP2040)
 ADC_MAX_READING = 0xFFFF     # 16-bit maximum value for ADC (65535)
 
+# Ways of reducing an oversampled block to one count value
+REDUCE_MEAN     = 'MEAN'
+REDUCE_MEDIAN   = 'MEDIAN'
+
+adc_reductions = [
+    REDUCE_MEAN,
+    REDUCE_MEDIAN
+]
+
+# RP2 ADC registers used for round-robin FIFO capture
+ADC_FIRST_GPIO      = 26
+ADC_CS              = 0x00
+ADC_FCS             = 0x08
+ADC_FIFO            = 0x0C
+ADC_DIV             = 0x10
+CS_EN               = 1 << 0
+CS_START_MANY       = 1 << 3
+CS_READY            = 1 << 8
+CS_AINSEL_SHIFT     = 12
+CS_RROBIN_SHIFT     = 16
+FCS_EN              = 1 << 0
+FCS_DREQ_EN         = 1 << 3
+FCS_EMPTY           = 1 << 8
+FCS_THRESH_1        = 1 << 24
+
+# Per-chip register base and DMA request line for the ADC FIFO
+RP2040_ADC_BASE     = 0x4004C000
+RP2040_DREQ_ADC     = 36
+RP2350_ADC_BASE     = 0x400A0000
+RP2350_DREQ_ADC     = 48
+
 class ADC_Reader:
-    def __init__(self, adc1_pin, adc2_pin):
+    def __init__(self, adc1_pin, adc2_pin, oversample=1, reduce=REDUCE_MEAN, use_dma=True):
         # Initialize ADC objects on the specified pins
         self.adc1 = machine.ADC(adc1_pin)
         self.adc2 = machine.ADC(adc2_pin)
-    
+        self.adc1_pin = adc1_pin
+        self.adc2_pin = adc2_pin
+        self._dma = None
+        self.set_oversampling(oversample, reduce, use_dma)
+
+    # Configure how many interleaved sample pairs measure_counts() averages over
+    def set_oversampling(self, oversample, reduce=REDUCE_MEAN, use_dma=True):
+        if reduce not in adc_reductions:
+            print('Wrong reduction inputted %s' % (reduce))
+            reduce = REDUCE_MEAN
+        self.oversample = max(1, oversample)
+        self.reduce = reduce
+
+        # Preallocated sample storage: pairs interleaved as adc1, adc2, adc1, adc2, ...
+        self._samples = array('H', [0] * (2 * self.oversample))
+        self._diffs = array('l', [0] * self.oversample)
+
+        if self._dma is not None:
+            self._dma.close()
+            self._dma = None
+        if use_dma and self.oversample > 1:
+            self._setup_dma()
+
+    # Use the ADC round-robin FIFO and a DMA channel to capture sample pairs
+    def _setup_dma(self):
+        if rp2 is None or not hasattr(rp2, 'DMA'):
+            return
+        if 'RP2350' in sys.implementation._machine:
+            self._adc_base, dreq = RP2350_ADC_BASE, RP2350_DREQ_ADC
+        else:
+            self._adc_base, dreq = RP2040_ADC_BASE, RP2040_DREQ_ADC
+
+        ch1 = self.adc1_pin - ADC_FIRST_GPIO
+        ch2 = self.adc2_pin - ADC_FIRST_GPIO
+        if ch1 == ch2 or not (0 <= ch1 <= 7 and 0 <= ch2 <= 7):
+            return  # Not two distinct ADC GPIOs; stay on read_u16()
+
+        # Round-robin alternates between the two channels starting from the lower one
+        self._cs_run = (CS_EN | (min(ch1, ch2) << CS_AINSEL_SHIFT) |
+                        (((1 << ch1) | (1 << ch2)) << CS_RROBIN_SHIFT) | CS_START_MANY)
+
+        self._dma = rp2.DMA()
+        self._dma_ctrl = self._dma.pack_ctrl(size=1, inc_read=False, inc_write=True, treq_sel=dreq)
+
+    def _drain_fifo(self):
+        m32 = machine.mem32
+        base = self._adc_base
+        while not (m32[base + ADC_CS] & CS_READY):
+            pass  # Let the conversion in flight finish
+        while not (m32[base + ADC_FCS] & FCS_EMPTY):
+            m32[base + ADC_FIFO]
+
+    def _capture_dma(self):
+        m32 = machine.mem32
+        base = self._adc_base
+
+        m32[base + ADC_CS] = CS_EN
+        self._drain_fifo()
+        m32[base + ADC_DIV] = 0                       # Convert back to back (500 kS/s)
+        m32[base + ADC_FCS] = FCS_EN | FCS_DREQ_EN | FCS_THRESH_1
+
+        self._dma.config(read=base + ADC_FIFO, write=self._samples,
+                         count=len(self._samples), ctrl=self._dma_ctrl, trigger=True)
+        m32[base + ADC_CS] = self._cs_run
+        while self._dma.active():
+            pass
+
+        # Back to single conversions so read_u16() keeps working
+        m32[base + ADC_CS] = CS_EN
+        self._drain_fifo()
+        m32[base + ADC_FCS] = 0
+
+        # FIFO results are 12-bit; scale the same way read_u16() does
+        s = self._samples
+        for i in range(len(s)):
+            v = s[i]
+            s[i] = (v << 4) | (v >> 8)
+
+    def _capture_polled(self):
+        s = self._samples
+        adc1 = self.adc1
+        adc2 = self.adc2
+        for i in range(0, len(s), 2):
+            s[i] = adc1.read_u16()
+            s[i + 1] = adc2.read_u16()
+
     def measure_counts(self):
-        # Read raw 16-bit ADC values from both pins
-        adc1_val = self.adc1.read_u16()
-        adc2_val = self.adc2.read_u16()
-        
-        # Compute the absolute voltage difference between the two ADC readings
-        return abs(adc1_val - adc2_val)
+        if self.oversample == 1:
+            # Read raw 16-bit ADC values from both pins
+            adc1_val = self.adc1.read_u16()
+            adc2_val = self.adc2.read_u16()
+
+            # Compute the absolute voltage difference between the two ADC readings
+            return abs(adc1_val - adc2_val)
+
+        if self._dma is not None:
+            self._capture_dma()
+        else:
+            self._capture_polled()
+
+        s = self._samples
+        d = self._diffs
+        n = self.oversample
+        total = 0
+        for i in range(n):
+            diff = abs(s[2 * i] - s[2 * i + 1])
+            d[i] = diff
+            total += diff
+
+        if self.reduce == REDUCE_MEAN:
+            return total // n
+
+        # Insertion sort on the preallocated differences, then take the middle one
+        for i in range(1, n):
+            v = d[i]
+            j = i - 1
+            while j >= 0 and d[j] > v:
+                d[j + 1] = d[j]
+                j -= 1
+            d[j + 1] = v
+        return d[n >> 1]
+
+    # Average time of one measure_counts() call, i.e. the ADC cost per depth tick
+    def time_measurement(self, iterations=100):
+        start = time.ticks_us()
+        for _ in range(iterations):
+            self.measure_counts()
+        per_call_us = time.ticks_diff(time.ticks_us(), start) // iterations
+        print('measure_counts: %d us per call (oversample=%d, %s, %s)' %
+              (per_call_us, self.oversample, self.reduce, 'DMA' if self._dma is not None else 'polled'))
+        return per_call_us
 
     def print_voltage_drop(self):
         # Print the calculated voltage drop to the console
-        print('Current voltage drop is', self.measure_voltage_drop())
+        print('Current voltage drop is', self.measure_counts() * ADC_MAX_VOLTAGE / ADC_MAX_READING, 'V')
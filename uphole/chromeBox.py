@@ -1,5 +1,12 @@
 # Import custom modules and libraries for ADC reading and pin interface handling
 from adcReader import ADC_Reader
+from adcReader import ADC_MAX_VOLTAGE, ADC_MAX_READING
+from logWriter import Log_Writer, LOG_FORMAT_BINARY, LOG_FORMAT_SEGMENTED
+from logFormat import pack_header, SAMPLE_MAGIC, FLAG_DEPTH_PULSE, FLAG_DEPTH_RESET, FLAG_STREAM_START
+from depthCounter import Depth_Counter
+from unitConversion import Unit_Converter, UV_PER_V, UA_PER_MA
+from profiler import Profiler
+from telemetry import Telemetry_Stream
 from pinInterface import Input_Pin_Interface
 from inputPins import input_pins
 
@@ -10,23 +17,49 @@ import machine
 ADC1_PIN                    = 28        # First ADC pin used for voltage measurement
 ADC2_PIN                    = 27        # Second ADC pin, likely unused in this file
 
+ADC_OVERSAMPLE              = 1         # Interleaved sample pairs per measurement (1 = single read)
+ADC_REDUCE                  = 'MEAN'    # 'MEAN' or 'MEDIAN' of the oversampled differences
+ADC_USE_DMA                 = True      # Capture oversampled pairs with the ADC FIFO + DMA when available
+
 INIT_WAIT_SECS              = 3.0       # Delay before starting measurements
 MEASUREMENT_LATENCY_SECS    = 5.0       # Delay between measurements
 
 LOAD_RESISTOR_OHMS          = 150.0     # Resistance used in current calculation
-A_to_mA                     = 1000.0    # Conversion factor from A to mA
+CALIBRATION_POINTS          = None      # [(counts, volts), ...] measured across the load resistor; None = nominal
 
 DEPTH_INCREMENT_M           = 0.025     # Meters added to depth on each depth signal
 CYCLE_LATENCY_MS            = 1         # Not used in this script
+DEPTH_POLL_MS               = 10        # How often counted depth pulses are turned into records
+DEPTH_COUNTER               = 'IRQ'     # 'IRQ' (hard pin IRQ) or 'PIO' (RP2 PIO edge counter)
 DEBOUNCE_MS                 = 200       # Time to avoid repeated button press events
 
+ACQUISITION                 = 'DEPTH'   # 'DEPTH' (one measurement per depth pulse) or 'CONTINUOUS' (fixed-rate samples)
+SAMPLE_RATE_HZ              = 100       # ADC sample rate in CONTINUOUS mode (8 B per sample, see README for flash time)
+SAMPLE_PREFIX               = 'chromeSamples'   # CONTINUOUS mode writes chromeSamples_0000.bin, ... (see logFormat)
+SAMPLE_LOG_CAPACITY         = 2048      # Samples + events buffered in RAM between flushes (> 2 flush intervals)
+
+LOG_FORMAT                  = 'CSV'     # 'CSV' text log, 'BINARY' fixed-width records (see logFormat) or 'SEGMENTED'
+PROFILE                     = False     # Time callbacks/IRQs; print with chokBaux.print_stats() from the REPL
+
 DATA_FILE					= 'chromeData.csv'  # Output data file name
+BINARY_DATA_FILE            = 'chromeData.bin'  # Output data file name in BINARY mode
+SEGMENT_PREFIX              = 'chromeData'      # SEGMENTED mode writes chromeData_0000.bin, chromeData_0001.bin, ...
+DATA_HEADER                 = "Depth(m),Voltage(V),Current(mA),# Counts\n"
+LOG_FLUSH_INTERVAL_MS       = 500       # How often queued records are written to flash
+LOG_CAPACITY                = 256       # Records buffered in RAM between flushes
+LOG_SEGMENT_RECORDS         = 8192      # Records per segment file in SEGMENTED and CONTINUOUS mode (64 KiB)
+LOG_MAX_SEGMENTS            = 16        # Segments kept on flash (1 MiB); the oldest is deleted on rotation
+LOG_PREALLOCATE             = False     # Zero-fill segments ahead of use (FAT/SD only; slow on littlefs)
+PRINT_RECORDS               = True      # Echo the latest record to the console on each flush (off while streaming)
+
+TELEMETRY                   = False     # Stream binary frames over USB serial (see postprocessing/ChromeTelemetry.py)
+TELEMETRY_INTERVAL_MS       = 20        # How often queued frames are sent
 
 # ----------------------------- MAIN CLASS --------------------------------
 class ChokBaux:
     def __init__(self):
         # Initialize ADC reader and input pin interfaces
-        self.adc            = ADC_Reader(ADC1_PIN, ADC2_PIN)
+        self.adc            = ADC_Reader(ADC1_PIN, ADC2_PIN, ADC_OVERSAMPLE, ADC_REDUCE, ADC_USE_DMA)
         self.dpt_rst_in     = Input_Pin_Interface(input_pins['DPT_RST'], 'INTERRUPT')
         self.dpt_in         = Input_Pin_Interface(input_pins['DPT_IN'], 'INTERRUPT')
         self.ena_in         = Input_Pin_Interface(input_pins['ENA_IN'], 'REGULAR')
@@ -38,16 +71,77 @@ class ChokBaux:
         # Track last button press time to debounce
         self.last_trigger_time = 0
         
-        # Initialize depth count
-        self.depth_count    = 0
+        # Initialize depth count (in ticks of DEPTH_INCREMENT_M)
+        self.depth_ticks    = 0
+
+        # Depth pulses are counted by depth_counter (set up in main) and consumed by
+        # depth_timer_callback every DEPTH_POLL_MS
+        self.depth_counter  = None
+        self.consumed_edges = 0     # Counter total already turned into depth ticks
+        self.max_ticks_per_poll = 0 # Most pulses seen in one poll period
+        self.merged_ticks   = 0     # Ticks that shared an ADC measurement with an earlier tick
+
+        # Fixed-point counts to volts/amps conversion, applied when records are formatted
+        self.units          = Unit_Converter(LOAD_RESISTOR_OHMS, ADC_MAX_VOLTAGE, ADC_MAX_READING, CALIBRATION_POINTS)
+
+        # Optional instrumentation of the callbacks and IRQ handlers
+        self.profiler       = Profiler(PROFILE)
+        self.prof_depth_cb  = self.profiler.section('depth_timer_cb')
+        self.prof_reset_irq = self.profiler.section('depth_reset_irq')
+        self.prof_edge_irq  = self.profiler.section('depth_edge_irq')
+
+        # Buffered writer for the depth log. In CONTINUOUS mode it carries the sample
+        # stream instead: timestamped samples plus depth pulse and reset events, in
+        # rotating segments so the stream never outgrows the flash.
+        self.continuous     = ACQUISITION == 'CONTINUOUS'
+        self.prof_sample_cb = self.profiler.section('sample_timer_cb') if self.continuous else None
+        if self.continuous:
+            path   = SAMPLE_PREFIX
+            header = pack_header(LOAD_RESISTOR_OHMS, ADC_MAX_VOLTAGE, DEPTH_INCREMENT_M, ADC_MAX_READING,
+                                 magic=SAMPLE_MAGIC, calibration=self.units.calibration)
+        elif LOG_FORMAT == LOG_FORMAT_BINARY or LOG_FORMAT == LOG_FORMAT_SEGMENTED:
+            path   = BINARY_DATA_FILE if LOG_FORMAT == LOG_FORMAT_BINARY else SEGMENT_PREFIX
+            header = pack_header(LOAD_RESISTOR_OHMS, ADC_MAX_VOLTAGE, DEPTH_INCREMENT_M, ADC_MAX_READING,
+                                 calibration=self.units.calibration)
+        else:
+            path   = DATA_FILE
+            header = DATA_HEADER
+        self.log            = Log_Writer(path, None if self.continuous else self.format_record, header,
+                                         capacity=SAMPLE_LOG_CAPACITY if self.continuous else LOG_CAPACITY,
+                                         flush_interval_ms=LOG_FLUSH_INTERVAL_MS,
+                                         log_format=LOG_FORMAT_SEGMENTED if self.continuous else LOG_FORMAT,
+                                         segment_records=LOG_SEGMENT_RECORDS,
+                                         max_segments=LOG_MAX_SEGMENTS,
+                                         preallocate=LOG_PREALLOCATE)
+        self.log.print_records = PRINT_RECORDS and not TELEMETRY
+
+        # Live binary telemetry of the same records
+        self.telemetry      = Telemetry_Stream(send_interval_ms=TELEMETRY_INTERVAL_MS) if TELEMETRY else None
 
     # Converts ADC counts to voltage (in Volts)
     def counts_to_voltage_drop_V(self, counts):
-        return counts * self.adc.ADC_MAX_VOLTAGE / self.adc.ADC_MAX_READING
+        return self.units.voltage_uV(counts) / UV_PER_V
     
     # Converts ADC counts to current (in milliamps)
     def counts_to_current_consumption_mA(self, counts):
-        return self.counts_to_voltage_drop_V(counts) * A_to_mA / LOAD_RESISTOR_OHMS
+        return self.units.current_uA(counts) / UA_PER_MA
+
+    # Formats one depth record as a CSV line (called when the log is drained, not in the callback).
+    # Voltage and current are printed from integer microvolts/microamps, without float math.
+    def format_record(self, tick, counts):
+        uv = self.units.voltage_uV(counts)
+        ua = self.units.current_uA(counts)
+        return "%.3f,%d.%06d,%d.%03d,%d\n" % (tick * DEPTH_INCREMENT_M,
+                                               uv // UV_PER_V, uv % UV_PER_V,
+                                               ua // UA_PER_MA, ua % UA_PER_MA, counts)
+
+    # Prints the ADC cost per depth tick with and without the configured oversampling
+    def report_adc_timing(self):
+        self.adc.set_oversampling(1)
+        single_us = self.adc.time_measurement()
+        self.adc.set_oversampling(ADC_OVERSAMPLE, ADC_REDUCE, ADC_USE_DMA)
+        oversampled_us = self.adc.time_measurement()
+        print('Oversampling adds %d us per depth tick' % (oversampled_us - single_us))
 
     # Continuously collect voltage and current data and log to file
     def collectData(self):
@@ -76,45 +170,123 @@ class ChokBaux:
 
     # Resets depth count to 0 when reset switch is triggered
     def depth_reset_timer_callback(self, t):
-        self.depth_count = 0
+        self.depth_ticks = 0
+        if self.continuous:
+            # Stamped now, when depth actually goes back to 0, so it sorts among the samples
+            self.log.push(time.ticks_us(), 0, FLAG_DEPTH_RESET)
 
     # Debounced interrupt handler for resetting depth
     def depth_reset_handler(self, pin):
+        if self.prof_reset_irq is not None:
+            t0 = time.ticks_us()
         current_time = time.ticks_ms()
         if time.ticks_diff(current_time, self.last_trigger_time) > DEBOUNCE_MS:
             if self.dpt_rst_in.isHigh():
                 print('Depth reset switch flipped. Setting depth back to 0 m')
                 self.last_trigger_time = current_time
                 self.timer2.init(mode=machine.Timer.ONE_SHOT, period=DEBOUNCE_MS, callback=self.depth_reset_timer_callback)
+        if self.prof_reset_irq is not None:
+            self.prof_reset_irq.add(time.ticks_diff(time.ticks_us(), t0))
 
-    # Timer callback that logs current depth, voltage, and current
+    # Periodic timer callback: turns newly counted depth pulses into depth ticks and
+    # queues one record per tick. Pulses that arrived within the same poll period
+    # share one ADC measurement, but every tick is still logged so depth stays exact.
     def depth_timer_callback(self, t):
-        self.depth_count += DEPTH_INCREMENT_M
+        prof = self.prof_depth_cb
+        if prof is not None:
+            t0 = time.ticks_us()
+            self.profiler.sample_heap()
+
+        total = self.depth_counter.read()
+        new = total - self.consumed_edges
+        if new > 0:
+            self.consumed_edges = total
+            if new > self.max_ticks_per_poll:
+                self.max_ticks_per_poll = new
+            self.merged_ticks += new - 1
+
+            c = self.adc.measure_counts()
+            t_ms = time.ticks_ms()
+            while new:
+                self.depth_ticks += 1
+                self.log.push(self.depth_ticks, c)
+                if self.telemetry is not None:
+                    self.telemetry.push(self.depth_ticks, c, t_ms)
+                new -= 1
+
+        if prof is not None:
+            prof.add(time.ticks_diff(time.ticks_us(), t0))
+
+    # CONTINUOUS mode: sample the ADC at SAMPLE_RATE_HZ and tag new depth pulses as events
+    # with the same timestamp. Depth is interpolated onto the samples on the host
+    # (postprocessing/ChromeSamples.py), so the sample rate is independent of cable speed.
+    def sample_timer_callback(self, t):
+        prof = self.prof_sample_cb
+        if prof is not None:
+            t0 = time.ticks_us()
+            self.profiler.sample_heap()
+
+        t_us = time.ticks_us()
         c = self.adc.measure_counts()
-        v = self.counts_to_voltage_drop_V(c)
-        i = self.counts_to_current_consumption_mA(c)
-        print("Depth = %.3f m\tVoltage = %f V\tCurrent = %f mA\t# Counts = %d\n\n" % (self.depth_count, v, i, c))
-        with open(DATA_FILE, 'a') as file:
-            file.write("%.3f,%f,%f,%d\n" % (self.depth_count, v, i, c))
-            file.flush()
-
-    # Interrupt handler that triggers a timed depth update if enabled
-    def depth_input_handler(self, pin):
-        if self.ena_in.isLow():  # Only log depth if ENA_IN is LOW
-            self.timer1.init(mode=machine.Timer.ONE_SHOT, period=10, callback=self.depth_timer_callback)
+        self.log.push(t_us, c)
+
+        total = self.depth_counter.read()
+        new = total - self.consumed_edges
+        if new > 0:
+            self.consumed_edges = total
+            if new > self.max_ticks_per_poll:
+                self.max_ticks_per_poll = new
+            self.depth_ticks += new
+            self.log.push(t_us, new, FLAG_DEPTH_PULSE)
+            if self.telemetry is not None:
+                self.telemetry.push(self.depth_ticks, c, time.ticks_ms())
+
+        if prof is not None:
+            prof.add(time.ticks_diff(time.ticks_us(), t0))
+
+    # Prints depth counting and logging statistics (call from the REPL)
+    def print_stats(self):
+        self.depth_counter.print_stats()
+        poll_ms = 1000 // SAMPLE_RATE_HZ if self.continuous else DEPTH_POLL_MS
+        print('Depth: %d ticks, max %d Hz per poll, %d merged' %
+              (self.depth_ticks, self.max_ticks_per_poll * 1000 // max(poll_ms, 1), self.merged_ticks))
+        self.log.print_stats()
+        if self.telemetry is not None:
+            self.telemetry.print_stats()
+        if self.profiler.enabled:
+            self.profiler.report()
 
     # Main execution method: sets up interrupts and starts logging
     def main(self):
         time.sleep(INIT_WAIT_SECS)
-        
-        # Write header to data file
-        with open(DATA_FILE, 'w') as file:
-            file.write("Depth(m),Voltage(V),Current(mA),# Counts\n")
-            file.flush()
-        
+
+        if ADC_OVERSAMPLE > 1:
+            self.report_adc_timing()
+
+        # Create the data file with its header and start the periodic flush
+        self.log.start()
+
+        # A segmented log resumes after a power cycle: carry on from the last recovered depth.
+        # A sample stream's ticks are timestamps, so it only marks where this boot starts.
+        if self.continuous:
+            if self.log.store.recovered_records:
+                print('Recovered %d records, appending to the sample stream' % self.log.store.recovered_records)
+            self.log.push(time.ticks_us(), 0, FLAG_STREAM_START)
+        elif self.log.store is not None and self.log.store.recovered_records:
+            self.depth_ticks = self.log.store.recovered_tick
+            print('Recovered %d records, resuming at %.3f m' %
+                  (self.log.store.recovered_records, self.depth_ticks * DEPTH_INCREMENT_M))
+        if self.telemetry is not None:
+            self.telemetry.start()
+
         # Attach interrupt handlers
         self.dpt_rst_in.setUpInterrupt(self.depth_reset_handler, 'RISING')
-        self.dpt_in.setUpInterrupt(self.depth_input_handler, 'FALLING')
+        self.depth_counter = Depth_Counter(self.dpt_in, self.ena_in, DEPTH_COUNTER)
+        self.depth_counter.prof = self.prof_edge_irq
+        if self.continuous:
+            self.timer1.init(mode=machine.Timer.PERIODIC, freq=SAMPLE_RATE_HZ, callback=self.sample_timer_callback)
+        else:
+            self.timer1.init(mode=machine.Timer.PERIODIC, period=DEPTH_POLL_MS, callback=self.depth_timer_callback)
 
         print("ChromeBox is in action!\n")
 
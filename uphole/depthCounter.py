@@ -0,0 +1,113 @@
+import machine
+import time
+
+# rp2 only exists on the RP2040/RP2350 port; the PIO counter is unavailable elsewhere
+try:
+    import rp2
+except ImportError:
+    rp2 = None
+
+# Counting backends
+COUNTER_IRQ = 'IRQ'     # Hard pin IRQ incrementing an integer
+COUNTER_PIO = 'PIO'     # RP2 PIO state machine counting edges in hardware
+
+depth_counters = [
+    COUNTER_IRQ,
+    COUNTER_PIO
+]
+
+PIO_RX_FIFO_DEPTH = 8      # RX and TX FIFOs joined
+
+# Counts falling edges on the `in` pin while the jmp pin (ENA_IN) is low and
+# pushes the running total after every edge. x counts down from 0xFFFFFFFF so
+# the pushed value, ~x, is the number of edges and stays a small int.
+if rp2 is not None:
+    @rp2.asm_pio(fifo_join=rp2.PIO.JOIN_RX)
+    def _edge_counter():
+        mov(x, invert(null))
+        label("loop")
+        wait(1, pin, 0)
+        wait(0, pin, 0)             # Falling edge on DPT_IN
+        jmp(pin, "loop")            # ENA_IN high: edge not counted
+        jmp(x_dec, "count")
+        label("count")
+        mov(isr, invert(x))
+        push(noblock)               # Consumer only needs the latest total
+        jmp("loop")
+else:
+    _edge_counter = None
+
+# ----------------------------- MAIN CLASS --------------------------------
+class Depth_Counter:
+    """
+    Lossless depth pulse counter.
+
+    The edge path only increments an integer (or lets a PIO state machine do
+    it), so edges are never merged or lost however fast they arrive. A consumer
+    calls read() to get the running total and works out depth from the delta.
+    """
+
+    def __init__(self, dpt_in, ena_in, mode=COUNTER_IRQ, sm_id=0):
+        """
+        Arguments:
+        - dpt_in: Input_Pin_Interface for the depth pulse input (falling edges)
+        - ena_in: REGULAR Input_Pin_Interface; edges only count while it is LOW
+        - mode: one of depth_counters
+        - sm_id: state machine used in PIO mode
+        """
+        if mode == COUNTER_PIO and _edge_counter is None:
+            print('PIO depth counter needs the rp2 port, using IRQ')
+            mode = COUNTER_IRQ
+        self.mode   = mode
+        self.ena_in = ena_in
+
+        self.count           = 0    # Edges counted since start
+        self.ignored_edges   = 0    # Edges seen while ENA_IN was HIGH (IRQ mode)
+        self.min_interval_us = 0    # Shortest time between two counted edges (IRQ mode, 0 = none yet)
+        self.fifo_full       = 0    # Reads that found the PIO RX FIFO full (PIO mode). The
+                                    # count is still exact, but may lag until the next edge
+        self._last_edge_us   = 0
+        self.prof            = None # profiler.Section_Stats timing the edge IRQ, if profiling
+
+        if mode == COUNTER_PIO:
+            pin = machine.Pin(dpt_in.gpio_num, machine.Pin.IN, machine.Pin.PULL_UP)
+            self._sm = rp2.StateMachine(sm_id, _edge_counter, in_base=pin, jmp_pin=ena_in.pin)
+            self._sm.active(1)
+        else:
+            dpt_in.setUpInterrupt(self._edge_irq, 'FALLING', hard=True)
+
+    # Hard IRQ handler: integer updates only, nothing is allocated
+    def _edge_irq(self, pin):
+        now = time.ticks_us()
+        if not self.ena_in.isLow():
+            self.ignored_edges += 1
+            return
+        if self.count:
+            interval = time.ticks_diff(now, self._last_edge_us)
+            if self.min_interval_us == 0 or interval < self.min_interval_us:
+                self.min_interval_us = interval
+        self._last_edge_us = now
+        self.count += 1
+
+        if self.prof is not None:
+            self.prof.add(time.ticks_diff(time.ticks_us(), now))
+
+    # Returns the number of edges counted so far
+    def read(self):
+        if self.mode == COUNTER_PIO:
+            sm = self._sm
+            n = sm.rx_fifo()
+            if n == PIO_RX_FIFO_DEPTH:
+                self.fifo_full += 1
+            while n:
+                self.count = sm.get()
+                n -= 1
+        return self.count
+
+    def print_stats(self):
+        if self.min_interval_us:
+            max_rate_hz = 1000000 // self.min_interval_us
+        else:
+            max_rate_hz = 0
+        print('Depth counter (%s): %d edges, %d ignored, max %d Hz, %d FIFO full' %
+              (self.mode, self.count, self.ignored_edges, max_rate_hz, self.fifo_full))
@@ -0,0 +1,58 @@
+import struct
+
+# Binary depth log layout. Must stay in step with postprocessing/ChromeLog.py.
+#
+# File = one header followed by fixed-width little-endian records.
+# Voltage and current are not stored: they are derived on the host from the raw
+# counts and the conversion constants captured in the header.
+#
+# Continuous sample streams (chromeBox ACQUISITION = 'CONTINUOUS') use the same
+# layout under SAMPLE_MAGIC, written in segments like SEGMENTED logs. There the
+# tick field holds time.ticks_us() of the sample, and depth pulses/resets and
+# boots are event records marked by their flags.
+
+LOG_MAGIC       = b'CHRB'
+SAMPLE_MAGIC    = b'CHRS'
+LOG_VERSION     = 1
+
+# magic, version, header size, record size, segment index (0 for single-file logs),
+# load resistor (ohms), ADC reference (V), depth increment (m), ADC max reading,
+# number of calibration points, padding
+HEADER_FORMAT   = '<4sHHHHfffIH2x'
+HEADER_SIZE     = struct.calcsize(HEADER_FORMAT)
+
+# Calibration points (chromeBox CALIBRATION_POINTS) follow the fixed header:
+# raw ADC counts, volts across the load resistor. The header size field covers them.
+CALIBRATION_FORMAT = '<If'
+CALIBRATION_SIZE   = struct.calcsize(CALIBRATION_FORMAT)
+
+# depth tick index, raw ADC counts, flags
+RECORD_FORMAT   = '<iHH'
+RECORD_SIZE     = struct.calcsize(RECORD_FORMAT)
+
+# Record flags
+FLAG_VALID      = 0x8000    # Set on every record written, so zero-filled space reads as empty
+FLAG_DEPTH_PULSE = 0x0001   # Sample stream event: counts field = depth pulses since the last event
+FLAG_DEPTH_RESET = 0x0002   # Sample stream event: depth reset switch, depth back to 0
+FLAG_STREAM_START = 0x0004  # Sample stream event: logging (re)started; earlier ticks are from another boot
+
+# Byte offsets inside a packed header/record
+HEADER_SEGMENT_OFFSET = 10
+RECORD_FLAGS_OFFSET   = 6
+
+def pack_header(load_resistor_ohms, adc_max_voltage, depth_increment_m, adc_max_reading, segment=0,
+                magic=LOG_MAGIC, calibration=None):
+    points = calibration or ()
+    header = bytearray(HEADER_SIZE + len(points) * CALIBRATION_SIZE)
+    struct.pack_into(HEADER_FORMAT, header, 0, magic, LOG_VERSION, len(header), RECORD_SIZE, segment,
+                     load_resistor_ohms, adc_max_voltage, depth_increment_m, adc_max_reading, len(points))
+    for i, (counts, volts) in enumerate(points):
+        struct.pack_into(CALIBRATION_FORMAT, header, HEADER_SIZE + i * CALIBRATION_SIZE, int(counts), volts)
+    return header
+
+def set_header_segment(header, segment):
+    # Stamp the segment index into a header from pack_header() (a bytearray)
+    struct.pack_into('<H', header, HEADER_SEGMENT_OFFSET, segment)
+
+def pack_record_into(buf, offset, tick, counts, flags=0):
+    struct.pack_into(RECORD_FORMAT, buf, offset, tick, counts, flags | FLAG_VALID)
@@ -0,0 +1,204 @@
+import os
+import struct
+
+from logFormat import RECORD_SIZE, RECORD_FORMAT, RECORD_FLAGS_OFFSET, FLAG_VALID
+from logFormat import set_header_segment
+
+# ----------------------------- CONSTANTS ---------------------------------
+DEFAULT_SEGMENT_RECORDS     = 8192      # Records per segment file (64 KiB of records)
+DEFAULT_MAX_SEGMENTS        = 16        # Segments kept; the oldest is deleted on rotation (0 = keep all)
+DEFAULT_BLOCK_SIZE          = 4096      # Bytes of zeros written per preallocation step
+
+SEGMENT_NAME_FORMAT         = '%s_%04d.bin'
+
+# ----------------------------- MAIN CLASS --------------------------------
+class Segment_Store:
+    """
+    Binary depth log split into fixed-size segment files.
+
+    Segment k holds up to segment_records records, record i at byte offset
+    len(header) + i * RECORD_SIZE of '<prefix>_<k>.bin'. Once a segment is full
+    the store rotates to the next one, deleting the oldest beyond max_segments.
+
+    Files never grow past one segment, so the cost of a write does not depend
+    on how long the run has been going. Every write is flushed (a littlefs
+    commit), and on boot open() finds the last valid record and carries on
+    after it instead of truncating. A power cycle therefore loses at most the
+    records that were still queued in RAM.
+
+    With preallocate=True each segment is filled with zeros ahead of use, one
+    block per write, and records then overwrite the zeros in place. Unwritten
+    space reads as records without FLAG_VALID, so recovery still finds the end.
+    This suits FAT (SD card) volumes, where it avoids cluster allocation during
+    the run. On the Pico's littlefs, overwriting the middle of a file rewrites
+    everything after it, so leave preallocation off there: appending into a
+    bounded segment is the constant-cost path.
+    """
+
+    def __init__(self, prefix, header,
+                 segment_records=DEFAULT_SEGMENT_RECORDS,
+                 max_segments=DEFAULT_MAX_SEGMENTS,
+                 preallocate=False,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Arguments:
+        - prefix: segment files are named '<prefix>_0000.bin', '<prefix>_0001.bin', ...
+        - header: binary log header (logFormat.pack_header()); each segment gets a
+          copy stamped with its index
+        - segment_records: records per segment
+        - max_segments: segments kept on flash (0 = unlimited)
+        - preallocate: zero-fill segments ahead of use (for FAT volumes, see above)
+        - block_size: bytes written per preallocation step
+        """
+        self.prefix             = prefix
+        self.header             = bytearray(header)
+        self.segment_records    = segment_records
+        self.max_segments       = max_segments
+        self.preallocate        = preallocate
+        self.header_size        = len(header)   # Fixed header plus calibration points
+        self.segment_bytes      = self.header_size + segment_records * RECORD_SIZE
+
+        self.segment            = 0         # Index of the segment being written
+        self.records            = 0         # Valid records in the current segment
+        self.recovered_records  = 0         # Records found on flash by open()
+        self.recovered_tick     = 0         # Depth tick of the last recovered record
+        self.rotations          = 0
+
+        self._file              = None
+        self._next_file         = None      # Segment being preallocated ahead of use
+        self._next_filled       = 0         # Bytes of it written so far
+        self._zeros             = bytearray(block_size) if preallocate else None
+        self._record            = bytearray(RECORD_SIZE)
+
+    def segment_path(self, index):
+        return SEGMENT_NAME_FORMAT % (self.prefix, index)
+
+    def _segments(self):
+        # Indices of existing segment files, sorted
+        head = self.prefix + '_'
+        found = []
+        for name in os.listdir():
+            if name.startswith(head) and name.endswith('.bin'):
+                try:
+                    found.append(int(name[len(head):-4]))
+                except ValueError:
+                    pass
+        found.sort()
+        return found
+
+    # Find the last valid record on flash and continue after it
+    def open(self):
+        segments = self._segments()
+
+        # Newest segment holding records; a preallocated or interrupted one after it may be empty
+        while segments:
+            self.segment = segments.pop()
+            self._file = open(self.segment_path(self.segment), 'r+b')
+            self.records = self._count_valid()
+            if self.records or not segments:
+                break
+            self._file.close()
+
+        if self._file is None or self.records == 0:
+            if self._file is not None:
+                self._file.close()
+            self._start_segment(self.segment)   # Rewrite the header, it may be torn
+            return 0
+
+        self.recovered_records = len(segments) * self.segment_records + self.records
+        self._file.seek(self.header_size + (self.records - 1) * RECORD_SIZE)
+        self._file.readinto(self._record)
+        self.recovered_tick = struct.unpack(RECORD_FORMAT, self._record)[0]
+        if self.records >= self.segment_records:
+            self._rotate()
+        return self.recovered_records
+
+    def _valid(self, i):
+        self._file.seek(self.header_size + i * RECORD_SIZE)
+        if self._file.readinto(self._record) != RECORD_SIZE:
+            return False
+        flags = self._record[RECORD_FLAGS_OFFSET] | (self._record[RECORD_FLAGS_OFFSET + 1] << 8)
+        return (flags & FLAG_VALID) != 0
+
+    def _count_valid(self):
+        # Valid records form a prefix of the segment, so binary search for its end
+        size = self._file.seek(0, 2)
+        lo, hi = 0, min(max(size - self.header_size, 0) // RECORD_SIZE, self.segment_records)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._valid(mid):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _start_segment(self, index):
+        self.segment = index
+        self.records = 0
+        path = self.segment_path(index)
+        if self._next_file is not None:
+            # Already preallocated ahead of time; finish it if it is not complete yet
+            while self._next_filled < self.segment_bytes:
+                self._prepare_step()
+            self._file = self._next_file
+            self._next_file = None
+            self._next_filled = 0
+        else:
+            set_header_segment(self.header, index)
+            self._file = open(path, 'w+b')
+            self._file.write(self.header)
+            self._file.flush()
+
+        if self.max_segments and index >= self.max_segments:
+            try:
+                os.remove(self.segment_path(index - self.max_segments))
+            except OSError:
+                pass
+
+    def _rotate(self):
+        self._file.close()
+        self.rotations += 1
+        self._start_segment(self.segment + 1)
+
+    def _prepare_step(self):
+        # Write the next block of the upcoming segment (header first, then zeros)
+        if self._next_file is None:
+            set_header_segment(self.header, self.segment + 1)
+            self._next_file = open(self.segment_path(self.segment + 1), 'w+b')
+            self._next_file.write(self.header)
+            self._next_filled = self.header_size
+        n = min(len(self._zeros), self.segment_bytes - self._next_filled)
+        self._next_file.write(memoryview(self._zeros)[:n])
+        self._next_file.flush()
+        self._next_filled += n
+
+    # Write whole records (a multiple of RECORD_SIZE bytes) at the end of the log
+    def write(self, data):
+        offset = 0
+        while offset < len(data):
+            room = (self.segment_records - self.records) * RECORD_SIZE
+            n = min(room, len(data) - offset)
+            self._file.seek(self.header_size + self.records * RECORD_SIZE)
+            self._file.write(data[offset:offset + n])
+            self._file.flush()
+            self.records += n // RECORD_SIZE
+            offset += n
+            if self.records >= self.segment_records:
+                self._rotate()
+
+        # Spread the zero-filling of the next segment over the writes
+        if self.preallocate and self._next_filled < self.segment_bytes:
+            self._prepare_step()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._next_file is not None:
+            self._next_file.close()
+            self._next_file = None
+
+    def print_stats(self):
+        print('Segments: writing %s, %d/%d records, %d rotations, %d records recovered at boot' %
+              (self.segment_path(self.segment), self.records, self.segment_records,
+               self.rotations, self.recovered_records))
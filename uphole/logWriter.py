@@ -0,0 +1,220 @@
+import machine
+import micropython
+from array import array
+
+from logFormat import RECORD_SIZE, pack_record_into
+from logSegments import Segment_Store, DEFAULT_SEGMENT_RECORDS, DEFAULT_MAX_SEGMENTS
+
+# ----------------------------- CONSTANTS ---------------------------------
+DEFAULT_CAPACITY            = 256       # Records held in RAM between drains
+DEFAULT_FLUSH_INTERVAL_MS   = 500       # How often queued records are written to flash
+DEFAULT_BLOCK_SIZE          = 4096      # Bytes collected before each file write (littlefs block)
+
+# Log formats
+LOG_FORMAT_CSV              = 'CSV'     # One formatted text line per record
+LOG_FORMAT_BINARY           = 'BINARY'  # Fixed-width records from logFormat
+LOG_FORMAT_SEGMENTED        = 'SEGMENTED'  # Binary records in rotating segment files (logSegments)
+
+log_formats = [
+    LOG_FORMAT_CSV,
+    LOG_FORMAT_BINARY,
+    LOG_FORMAT_SEGMENTED
+]
+
+# ----------------------------- MAIN CLASS --------------------------------
+class Log_Writer:
+    """
+    Batched, ISR-safe writer for depth records.
+
+    push() only stores integers into preallocated arrays, so it can be called
+    from timer and pin callbacks. A periodic timer schedules drain(), which
+    formats the queued records and writes them to flash in block-sized chunks.
+    """
+
+    def __init__(self, path, formatter, header=None,
+                 capacity=DEFAULT_CAPACITY,
+                 flush_interval_ms=DEFAULT_FLUSH_INTERVAL_MS,
+                 block_size=DEFAULT_BLOCK_SIZE,
+                 log_format=LOG_FORMAT_CSV,
+                 segment_records=DEFAULT_SEGMENT_RECORDS,
+                 max_segments=DEFAULT_MAX_SEGMENTS,
+                 preallocate=False):
+        """
+        Arguments:
+        - path: log file on the Pico filesystem (segment file prefix for SEGMENTED logs)
+        - formatter: function(tick, counts) returning one text line. Required for
+          CSV logs; for binary logs it is only used for console echo (may be None)
+        - header: written when the file is (re)created (str for CSV, bytes for
+          binary, e.g. logFormat.pack_header()), or None
+        - capacity: number of records the RAM ring can hold
+        - flush_interval_ms: period of the drain timer
+        - block_size: approximate number of bytes per file write
+        - log_format: one of log_formats
+        - segment_records, max_segments, preallocate: segment layout of SEGMENTED
+          logs (see logSegments.Segment_Store)
+        """
+        if log_format not in log_formats:
+            print('Wrong log format inputted %s' % (log_format))
+            log_format = LOG_FORMAT_CSV
+        self.log_format         = log_format
+        self.path               = path
+        self.formatter          = formatter
+        self.header             = header
+        self.capacity           = capacity
+        self.flush_interval_ms  = flush_interval_ms
+        self.block_size         = block_size
+        self.segment_records    = segment_records
+        self.max_segments       = max_segments
+        self.preallocate        = preallocate
+        self.store              = None      # Segment_Store of SEGMENTED logs, created by start()
+
+        # RAM ring of fixed-size records
+        self.ticks  = array('l', [0] * capacity)   # Depth tick index
+        self.counts = array('H', [0] * capacity)   # Raw ADC counts
+        self.flags  = array('H', [0] * capacity)   # Record flags (binary logs only)
+        self._head  = 0                             # Next slot written by push()
+        self._tail  = 0                             # Next slot read by drain()
+
+        # Statistics
+        self.queued  = 0   # Records accepted by push()
+        self.written = 0   # Records written to flash
+        self.dropped = 0   # Records lost because the ring was full
+
+        self.print_records = False    # Echo the last record of each drain to the console
+
+        self.timer = machine.Timer()
+        self._file = None
+        self._drain_ref = self._drain_scheduled   # Bound once so scheduling doesn't allocate
+
+        # Binary records are packed into one reusable block buffer
+        if log_format != LOG_FORMAT_CSV:
+            self._block    = bytearray((block_size // RECORD_SIZE) * RECORD_SIZE)
+            self._block_mv = memoryview(self._block)
+
+    def start(self, truncate=True):
+        # Open the log and start the periodic drain. Segmented logs always resume
+        # after the last valid record found on flash.
+        if self.log_format == LOG_FORMAT_SEGMENTED:
+            self.store = Segment_Store(self.path, self.header, self.segment_records,
+                                       self.max_segments, self.preallocate, self.block_size)
+            self.store.open()
+            self._file = self.store
+        else:
+            mode = 'w' if truncate else 'a'
+            if self.log_format == LOG_FORMAT_BINARY:
+                mode += 'b'
+            self._file = open(self.path, mode)
+            if truncate and self.header is not None:
+                self._file.write(self.header)
+                self._file.flush()
+        self.timer.init(mode=machine.Timer.PERIODIC, period=self.flush_interval_ms,
+                        callback=self._flush_timer_callback)
+
+    def stop(self):
+        # Stop the drain timer and write out whatever is still queued
+        self.timer.deinit()
+        self.drain()
+        self._file.close()
+        self._file = None
+
+    # Queue one record. Safe to call from interrupt context: no allocation.
+    def push(self, tick, counts, flags=0):
+        head = self._head
+        nxt = head + 1
+        if nxt == self.capacity:
+            nxt = 0
+        if nxt == self._tail:
+            self.dropped += 1
+            return False
+        self.ticks[head] = tick
+        self.counts[head] = counts
+        self.flags[head] = flags
+        self._head = nxt
+        self.queued += 1
+        return True
+
+    def pending(self):
+        # Number of records waiting to be written
+        n = self._head - self._tail
+        if n < 0:
+            n += self.capacity
+        return n
+
+    def _flush_timer_callback(self, t):
+        try:
+            micropython.schedule(self._drain_ref, 0)
+        except RuntimeError:
+            pass  # Schedule queue full; the next tick will pick the records up
+
+    def _drain_scheduled(self, _):
+        self.drain()
+
+    # Format queued records and write them to flash in block-sized chunks
+    def drain(self):
+        if self._file is None:
+            return
+        if self.log_format != LOG_FORMAT_CSV:
+            last = self._drain_binary()
+        else:
+            last = self._drain_csv()
+        if self.print_records and last >= 0 and self.formatter is not None:
+            print(self.formatter(self.ticks[last], self.counts[last]), end='')
+
+    def _drain_csv(self):
+        lines = []
+        size = 0
+        tail = self._tail
+        last = -1
+        while tail != self._head:
+            line = self.formatter(self.ticks[tail], self.counts[tail])
+            lines.append(line)
+            size += len(line)
+            last = tail
+            tail += 1
+            if tail == self.capacity:
+                tail = 0
+            self._tail = tail
+            if size >= self.block_size:
+                self._write_lines(lines)
+                lines = []
+                size = 0
+        if lines:
+            self._write_lines(lines)
+        return last
+
+    def _drain_binary(self):
+        block = self._block
+        offset = 0
+        tail = self._tail
+        last = -1
+        while tail != self._head:
+            pack_record_into(block, offset, self.ticks[tail], self.counts[tail], self.flags[tail])
+            offset += RECORD_SIZE
+            last = tail
+            tail += 1
+            if tail == self.capacity:
+                tail = 0
+            self._tail = tail
+            if offset == len(block):
+                self._write_block(offset)
+                offset = 0
+        if offset:
+            self._write_block(offset)
+        return last
+
+    def _write_block(self, nbytes):
+        self._file.write(self._block_mv[:nbytes])
+        if self.store is None:
+            self._file.flush()      # Segment_Store flushes its own writes
+        self.written += nbytes // RECORD_SIZE
+
+    def _write_lines(self, lines):
+        self._file.write(''.join(lines))
+        self._file.flush()
+        self.written += len(lines)
+
+    def print_stats(self):
+        print('Log: %d queued, %d written, %d dropped, %d pending' %
+              (self.queued, self.written, self.dropped, self.pending()))
+        if self.store is not None:
+            self.store.print_stats()
@@ -27,17 +27,18 @@ class Input_Pin_Interface:
             print('Wrong input type inputted %s' % (input_type))
             return
         
-    # Method to configure the pin as an interrupt with a specified edge and handler
-    def setUpInterrupt(self, handler, interrupt_type):
+    # Method to configure the pin as an interrupt with a specified edge and handler.
+    # With hard=True the handler runs in hard IRQ context and must not allocate.
+    def setUpInterrupt(self, handler, interrupt_type, hard=False):
         if interrupt_type in interrupt_types:
             if interrupt_type == 'FALLING':
                 # Set up pin with pull-up resistor and falling edge interrupt
                 self.pin = machine.Pin(self.gpio_num, machine.Pin.IN, machine.Pin.PULL_UP)
-                self.pin.irq(trigger=machine.Pin.IRQ_FALLING, handler=handler)
+                self.pin.irq(trigger=machine.Pin.IRQ_FALLING, handler=handler, hard=hard)
             else:
                 # Set up pin with pull-down resistor and rising edge interrupt
                 self.pin = machine.Pin(self.gpio_num, machine.Pin.IN, machine.Pin.PULL_DOWN)
-                self.pin.irq(trigger=machine.Pin.IRQ_RISING, handler=handler)
+                self.pin.irq(trigger=machine.Pin.IRQ_RISING, handler=handler, hard=hard)
         else:
             print('Wrong interrupt type inputted %s' % (interrupt_type))
         
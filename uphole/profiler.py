@@ -0,0 +1,119 @@
+import gc
+from array import array
+
+# Histogram bucket upper bounds in microseconds; one extra bucket catches anything slower
+HIST_EDGES_US = (50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+
+class Section_Stats:
+    """
+    Timing statistics for one instrumented section. add() only does small-int
+    arithmetic on preallocated storage, so it is safe in hard IRQ handlers.
+    """
+
+    def __init__(self, name):
+        self.name     = name
+        self.count    = 0
+        self.total_s  = 0                   # Whole seconds of the running total
+        self.total_us = 0                   # Remaining microseconds (kept below 1 s to stay a small int)
+        self.min_us   = 0
+        self.max_us   = 0
+        self.hist     = array('I', [0] * (len(HIST_EDGES_US) + 1))
+
+    def add(self, us):
+        if self.count == 0 or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+        self.count += 1
+        self.total_us += us
+        while self.total_us >= 1000000:
+            self.total_us -= 1000000
+            self.total_s += 1
+
+        i = 0
+        for edge in HIST_EDGES_US:
+            if us <= edge:
+                break
+            i += 1
+        self.hist[i] += 1
+
+    def mean_us(self):
+        if self.count == 0:
+            return 0
+        return (self.total_s * 1000000 + self.total_us) // self.count
+
+    def reset(self):
+        self.count = self.total_s = self.total_us = self.min_us = self.max_us = 0
+        for i in range(len(self.hist)):
+            self.hist[i] = 0
+
+    def report(self):
+        print('%-16s n=%d min=%d mean=%d max=%d us' %
+              (self.name, self.count, self.min_us, self.mean_us(), self.max_us))
+        buckets = []
+        for i, n in enumerate(self.hist):
+            if n:
+                label = '<=%d' % HIST_EDGES_US[i] if i < len(HIST_EDGES_US) else '>%d' % HIST_EDGES_US[-1]
+                buckets.append('%s:%d' % (label, n))
+        if buckets:
+            print('%-16s %s' % ('', ' '.join(buckets)))
+
+
+class Profiler:
+    """
+    Lightweight on-device instrumentation built on time.ticks_us().
+
+    Instrumented code asks for a section once at start-up and keeps it; when the
+    profiler is disabled it gets None back, so the hot-path cost is a single
+    `is not None` test:
+
+        self.prof = profiler.section('dac_output')      # at init
+        ...
+        if self.prof is not None:
+            t0 = time.ticks_us()
+        ...work...
+        if self.prof is not None:
+            self.prof.add(time.ticks_diff(time.ticks_us(), t0))
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled  = enabled
+        self.sections = []
+
+        # Heap statistics, updated by sample_heap()
+        self.mem_free_min  = 0
+        self.collections   = 0              # GC runs inferred from drops in gc.mem_alloc()
+        self._last_alloc   = 0
+
+    def section(self, name):
+        if not self.enabled:
+            return None
+        stats = Section_Stats(name)
+        self.sections.append(stats)
+        return stats
+
+    def sample_heap(self):
+        # Call periodically (e.g. once per loop); allocation-free
+        free = gc.mem_free()
+        if self.mem_free_min == 0 or free < self.mem_free_min:
+            self.mem_free_min = free
+        alloc = gc.mem_alloc()
+        if alloc < self._last_alloc:
+            self.collections += 1
+        self._last_alloc = alloc
+
+    def reset(self):
+        for stats in self.sections:
+            stats.reset()
+        self.mem_free_min = 0
+        self.collections = 0
+
+    def report(self):
+        if not self.enabled:
+            print('Profiling is disabled')
+            return
+        for stats in self.sections:
+            stats.report()
+        print('heap: free=%d min_free=%d alloc=%d collections=%d' %
+              (gc.mem_free(), self.mem_free_min, gc.mem_alloc(), self.collections))
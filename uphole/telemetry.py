@@ -0,0 +1,171 @@
+import machine
+import micropython
+import select
+import struct
+import sys
+from array import array
+
+# ----------------------------- CONSTANTS ---------------------------------
+# Telemetry frame layout. Must stay in step with postprocessing/ChromeTelemetry.py.
+#
+# sync (A5 5A), sequence number, depth tick index, raw ADC counts,
+# time.ticks_ms() of the measurement, CRC-16/CCITT-FALSE over seq..timestamp
+FRAME_SYNC                  = b'\xa5\x5a'
+FRAME_FORMAT                = '<2sBiHIH'
+FRAME_SIZE                  = struct.calcsize(FRAME_FORMAT)
+PAYLOAD_FORMAT              = '<BiHI'
+PAYLOAD_OFFSET              = 2
+PAYLOAD_SIZE                = struct.calcsize(PAYLOAD_FORMAT)
+CRC_OFFSET                  = PAYLOAD_OFFSET + PAYLOAD_SIZE
+
+CRC_POLY                    = 0x1021
+CRC_INIT                    = 0xFFFF
+
+DEFAULT_CAPACITY            = 512       # Records held in RAM between sends
+DEFAULT_SEND_INTERVAL_MS    = 20        # How often queued records are sent
+FRAMES_PER_WRITE            = 16        # Frames per USB write (fits the CDC TX buffer, so writes don't block)
+
+# CRC-16/CCITT-FALSE lookup table, built once at import
+def _crc_table():
+    table = array('H', [0] * 256)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC_POLY) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+CRC_TABLE = _crc_table()
+
+def crc16(buf, start, end):
+    crc = CRC_INIT
+    table = CRC_TABLE
+    for i in range(start, end):
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ buf[i]]
+    return crc
+
+# ----------------------------- MAIN CLASS --------------------------------
+class Telemetry_Stream:
+    """
+    Live depth records as compact CRC-checked binary frames over USB serial.
+
+    push() only stores integers into preallocated arrays, so it can be called
+    from the depth timer callback next to Log_Writer.push(). A periodic timer
+    schedules send(), which packs frames into a reusable buffer and writes them
+    in small batches. Before each batch the port is polled for space, so a host
+    that is slow or not listening never blocks the firmware: records wait in the
+    ring and, once it is full, new ones are dropped and counted.
+
+    Console prints share the same port. The host receiver resynchronises on the
+    sync bytes and CRC, but PRINT_RECORDS should be off while streaming.
+    """
+
+    def __init__(self, stream=None, capacity=DEFAULT_CAPACITY, send_interval_ms=DEFAULT_SEND_INTERVAL_MS):
+        """
+        Arguments:
+        - stream: binary stream to write frames to (default: the USB serial console)
+        - capacity: number of records the RAM ring can hold
+        - send_interval_ms: period of the send timer
+        """
+        self.stream             = stream
+        self.capacity           = capacity
+        self.send_interval_ms   = send_interval_ms
+
+        # RAM ring of records
+        self.ticks  = array('l', [0] * capacity)   # Depth tick index
+        self.counts = array('H', [0] * capacity)   # Raw ADC counts
+        self.t_ms   = array('I', [0] * capacity)   # time.ticks_ms() of the measurement
+        self._head  = 0
+        self._tail  = 0
+        self._seq   = 0
+
+        # Statistics
+        self.queued  = 0   # Records accepted by push()
+        self.sent    = 0   # Frames written to the port
+        self.dropped = 0   # Records lost because the ring was full
+        self.stalls  = 0   # Sends cut short because the port had no room
+
+        self.timer = machine.Timer()
+        self._poll = None
+        self._send_ref = self._send_scheduled     # Bound once so scheduling doesn't allocate
+
+        self._block    = bytearray(FRAMES_PER_WRITE * FRAME_SIZE)
+        self._block_mv = memoryview(self._block)
+        for off in range(0, len(self._block), FRAME_SIZE):
+            self._block[off:off + PAYLOAD_OFFSET] = FRAME_SYNC
+
+    def start(self):
+        # Resolve the output stream and start the periodic send
+        if self.stream is None:
+            self.stream = getattr(sys.stdout, 'buffer', sys.stdout)
+        try:
+            self._poll = select.poll()
+            self._poll.register(self.stream, select.POLLOUT)
+        except (AttributeError, OSError, ValueError, TypeError):
+            self._poll = None     # Not pollable (e.g. an in-memory stream): always writable
+        self.timer.init(mode=machine.Timer.PERIODIC, period=self.send_interval_ms,
+                        callback=self._send_timer_callback)
+
+    def stop(self):
+        self.timer.deinit()
+        self.send()
+
+    # Queue one record. Safe to call from interrupt context: no allocation.
+    def push(self, tick, counts, t_ms):
+        head = self._head
+        nxt = head + 1
+        if nxt == self.capacity:
+            nxt = 0
+        if nxt == self._tail:
+            self.dropped += 1
+            return False
+        self.ticks[head] = tick
+        self.counts[head] = counts
+        self.t_ms[head] = t_ms
+        self._head = nxt
+        self.queued += 1
+        return True
+
+    def pending(self):
+        # Number of records waiting to be sent
+        n = self._head - self._tail
+        if n < 0:
+            n += self.capacity
+        return n
+
+    def _send_timer_callback(self, t):
+        try:
+            micropython.schedule(self._send_ref, 0)
+        except RuntimeError:
+            pass  # Schedule queue full; the next tick will pick the records up
+
+    def _send_scheduled(self, _):
+        self.send()
+
+    # Pack queued records into frames and write them while the port has room
+    def send(self):
+        block = self._block
+        while self._tail != self._head:
+            if self._poll is not None and not self._poll.poll(0):
+                self.stalls += 1
+                return
+            offset = 0
+            tail = self._tail
+            while tail != self._head and offset < len(block):
+                struct.pack_into(PAYLOAD_FORMAT, block, offset + PAYLOAD_OFFSET,
+                                 self._seq, self.ticks[tail], self.counts[tail], self.t_ms[tail])
+                crc = crc16(block, offset + PAYLOAD_OFFSET, offset + CRC_OFFSET)
+                block[offset + CRC_OFFSET] = crc & 0xFF
+                block[offset + CRC_OFFSET + 1] = crc >> 8
+                self._seq = (self._seq + 1) & 0xFF
+                offset += FRAME_SIZE
+                tail += 1
+                if tail == self.capacity:
+                    tail = 0
+            self.stream.write(self._block_mv[:offset])
+            self._tail = tail
+            self.sent += offset // FRAME_SIZE
+
+    def print_stats(self):
+        print('Telemetry: %d queued, %d sent, %d dropped, %d stalls, %d pending' %
+              (self.queued, self.sent, self.dropped, self.stalls, self.pending()))
@@ -0,0 +1,113 @@
+from array import array
+
+# Fixed-point conversion of raw differential ADC counts to engineering units.
+#
+# Results are integers in microvolts and microamps, computed with a precomputed
+# multiplier and a shift so no floats are created once the converter is built.
+# Every intermediate product is kept below SMALL_INT_LIMIT, so on MicroPython
+# the arithmetic stays in small ints and never allocates on the heap.
+
+UV_PER_V            = 1000000
+UA_PER_MA           = 1000
+SMALL_INT_LIMIT     = 1 << 30   # MicroPython small ints are 31-bit signed on 32-bit ports
+MAX_SHIFT           = 24        # Upper bound on fractional bits of the multipliers
+LUT_SEGMENTS_LOG2   = 5         # Calibration table has 2**5 linear segments over the ADC range
+
+# Returns the largest number of fractional bits for which max_counts * scale
+# still fits in a small int
+def _fraction_bits(max_counts, scale):
+    shift = 0
+    while shift < MAX_SHIFT and max_counts * scale * (1 << (shift + 1)) < SMALL_INT_LIMIT:
+        shift += 1
+    return shift
+
+# Linear interpolation in a sorted list of (x, y) points, extrapolating at both ends
+def _interpolate(points, x):
+    for i in range(1, len(points) - 1):
+        if x < points[i][0]:
+            break
+    else:
+        i = len(points) - 1
+    (x0, y0), (x1, y1) = points[i - 1], points[i]
+    return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+class Unit_Converter:
+    def __init__(self, load_resistor_ohms, adc_max_voltage, adc_max_reading, calibration=None):
+        """
+        Arguments:
+        - load_resistor_ohms: loop resistor the voltage drop is measured across
+        - adc_max_voltage: ADC reference voltage
+        - adc_max_reading: counts at the reference voltage
+        - calibration: optional list of (counts, volts) pairs measured with a reference
+          meter across the loop resistor; corrects ADC gain and nonlinearity
+        """
+        self.load_resistor_ohms = load_resistor_ohms
+        self.adc_max_voltage    = adc_max_voltage
+        self.adc_max_reading    = adc_max_reading
+
+        # Nominal scaling: value = (counts * multiplier) >> shift
+        uv_per_count            = adc_max_voltage * UV_PER_V / adc_max_reading
+        ua_per_count            = uv_per_count / load_resistor_ohms
+        self._uv_shift          = _fraction_bits(adc_max_reading, uv_per_count)
+        self._uv_mult           = int(uv_per_count * (1 << self._uv_shift) + 0.5)
+        self._ua_shift          = _fraction_bits(adc_max_reading, ua_per_count)
+        self._ua_mult           = int(ua_per_count * (1 << self._ua_shift) + 0.5)
+
+        # Calibration lookup tables (None = nominal scaling)
+        self.calibration        = None
+        self.lut_uV             = None
+        self.lut_uA             = None
+        self._lut_shift         = 0
+        self._lut_mask          = 0
+        if calibration:
+            self.set_calibration(calibration)
+
+    # Builds the calibration tables from measured (counts, volts) points. Floats are
+    # only used here; the tables hold integer microvolts and microamps.
+    def set_calibration(self, points):
+        if len(points) < 2:
+            print('Wrong calibration inputted %s' % (points,))
+            return
+        points = sorted(points)
+        self.calibration = points
+        self._lut_shift = (self.adc_max_reading + 1).bit_length() - 1 - LUT_SEGMENTS_LOG2
+        self._lut_mask  = (1 << self._lut_shift) - 1
+        n = (1 << LUT_SEGMENTS_LOG2) + 1
+        self.lut_uV = array('l', [0] * n)
+        self.lut_uA = array('l', [0] * n)
+        for k in range(n):
+            volts = _interpolate(points, k << self._lut_shift)
+            self.lut_uV[k] = int(round(volts * UV_PER_V))
+            self.lut_uA[k] = int(round(volts * UV_PER_V / self.load_resistor_ohms))
+
+    def clear_calibration(self):
+        self.calibration = self.lut_uV = self.lut_uA = None
+
+    def _lookup(self, lut, counts):
+        i = counts >> self._lut_shift
+        base = lut[i]
+        return base + (((lut[i + 1] - base) * (counts & self._lut_mask)) >> self._lut_shift)
+
+    # Voltage drop across the loop resistor in microvolts
+    def voltage_uV(self, counts):
+        if self.lut_uV is not None:
+            return self._lookup(self.lut_uV, counts)
+        return (counts * self._uv_mult) >> self._uv_shift
+
+    # Loop current in microamps
+    def current_uA(self, counts):
+        if self.lut_uA is not None:
+            return self._lookup(self.lut_uA, counts)
+        return (counts * self._ua_mult) >> self._ua_shift
+
+    # Prints the largest deviation of the fixed-point path from float math (call from the REPL)
+    def check(self, step=1):
+        worst_uv = worst_ua = 0
+        for counts in range(0, self.adc_max_reading + 1, step):
+            if self.calibration is not None:
+                uv = _interpolate(self.calibration, counts) * UV_PER_V
+            else:
+                uv = counts * self.adc_max_voltage * UV_PER_V / self.adc_max_reading
+            worst_uv = max(worst_uv, abs(self.voltage_uV(counts) - uv))
+            worst_ua = max(worst_ua, abs(self.current_uA(counts) - uv / self.load_resistor_ohms))
+        print('Max conversion error: %d uV, %d uA' % (worst_uv + 0.5, worst_ua + 0.5))